@@ -14,6 +14,8 @@ const lineHeight = document.getElementById('lineHeight');
 const contentWidth = document.getElementById('contentWidth');
 const themeSelect = document.getElementById('themeSelect');
 const languageSelect = document.getElementById('languageSelect');
+const searchInput = document.getElementById('searchInput');
+const searchResults = document.getElementById('searchResults');
 
 const SETTINGS_KEY = 'im_reader_settings_v1';
 const READ_KEY = 'im_reader_read_v1';
@@ -23,24 +25,40 @@ let currentIndex = 0;
 let readMap = {};
 let currentLanguage = 'en';
 let chaptersBasePath = '../';
+let bundle = null;
+const chapterCache = new Map();
+const CHAPTER_CACHE_SIZE = 8;
+let searchIndex = null;
+const SEARCH_RESULTS_SHOWN = 200;
 
 const LANGUAGES = {
   en: {
     label: 'English',
     chaptersFile: 'chapters.json',
     basePath: '../',
+    immutable: true,
+    htmlPath: 'html/en/',
+    bundleIndex: 'bundle/en.json',
+    searchPath: 'search/en/',
     chapterLabel: 'Chapter'
   },
   pl: {
     label: 'Polski',
     chaptersFile: 'chapters_pl.json',
     basePath: '../pl/',
+    htmlPath: 'html/pl/',
+    bundleIndex: 'bundle/pl.json',
+    searchPath: 'search/pl/',
     chapterLabel: 'Rozdział'
   },
   ko: {
     label: 'Korean',
     chaptersFile: 'chapters_ko.json',
     basePath: '../Infinity Mage Chapters 1-1277 original/',
+    immutable: true,
+    htmlPath: 'html/ko/',
+    bundleIndex: 'bundle/ko.json',
+    searchPath: 'search/ko/',
     chapterLabel: 'Chapter'
   }
 };
@@ -178,6 +196,240 @@ function formatText(raw) {
   return htmlLines.join('<br>');
 }
 
+// tools/chapter_bundle.py packs every chapter of a language into one file:
+// the raw text for the tools and the pre-rendered HTML, fetched here with
+// HTTP Range. Translations are rewritten while the reader is open, so their
+// index is revalidated (a 304 while nothing changed) before a chapter is
+// shown; the scraped languages never change.
+async function loadBundle(cfg) {
+  if (!cfg.bundleIndex) return null;
+  try {
+    const res = await fetch(cfg.bundleIndex, cfg.immutable ? {} : { cache: 'no-cache' });
+    if (!res.ok) return null;
+    const index = await res.json();
+    if (index.version !== 3) return null;
+    const [fileAt, offsetAt, lengthAt] = ['file', 'html_offset', 'html_length'].map(name => index.fields.indexOf(name));
+    const ranges = new Map();
+    for (const entry of index.chapters) ranges.set(entry[fileAt], [entry[offsetAt], entry[lengthAt]]);
+    const base = cfg.bundleIndex.slice(0, cfg.bundleIndex.lastIndexOf('/') + 1);
+    // Every rebuild appends (size grows) or starts a new generation (name).
+    return { url: base + index.bundle, version: `${index.bundle}:${index.size}`, ranges, rangeOk: true };
+  } catch {
+    return null;
+  }
+}
+
+let bundleCheck = null;
+
+function revalidateBundle() {
+  const cfg = getLanguageConfig(currentLanguage);
+  if (cfg.immutable || !bundle) return Promise.resolve();
+  if (!bundleCheck) {
+    const lang = currentLanguage;
+    bundleCheck = loadBundle(cfg).then(fresh => {
+      if (lang !== currentLanguage || !bundle) return;
+      if (!fresh || fresh.version !== bundle.version) {
+        // Chapters fetched (or prefetched) from the old index may be stale.
+        if (fresh) fresh.rangeOk = bundle.rangeOk;
+        bundle = fresh;
+        chapterCache.clear();
+      }
+    }).finally(() => {
+      bundleCheck = null;
+    });
+  }
+  return bundleCheck;
+}
+
+async function fetchFromBundle(ch) {
+  const entry = bundle && bundle.rangeOk ? bundle.ranges.get(ch.file) : null;
+  if (!entry || entry[1] === 0) return null;
+  const [offset, length] = entry;
+  try {
+    const res = await fetch(encodeURI(bundle.url), { headers: { Range: `bytes=${offset}-${offset + length - 1}` } });
+    if (res.status !== 206) {
+      // A server without Range support would send the whole bundle.
+      if (res.body) res.body.cancel();
+      if (res.ok) bundle.rangeOk = false;
+      return null;
+    }
+    return new TextDecoder('utf-8').decode(await res.arrayBuffer());
+  } catch {
+    return null;
+  }
+}
+
+// Order: pre-rendered HTML from the bundle, then the same HTML as a
+// fragment (tools/render_chapters.py), then the raw .txt formatted here.
+async function fetchChapterHtml(ch) {
+  const cfg = getLanguageConfig(currentLanguage);
+  const packed = await fetchFromBundle(ch);
+  if (packed !== null) return packed;
+  if (cfg.htmlPath) {
+    try {
+      const res = await fetch(encodeURI(cfg.htmlPath + ch.file.replace(/\.txt$/, '.html')));
+      if (res.ok) return await res.text();
+    } catch {
+      // fall back to the raw chapter
+    }
+  }
+  const res = await fetch(encodeURI(chaptersBasePath + ch.file));
+  if (!res.ok) throw new Error('HTTP ' + res.status);
+  const text = await res.text();
+  return formatText(text.trim());
+}
+
+function getChapterHtml(ch) {
+  const key = `${currentLanguage}:${ch.file}`;
+  let pending = chapterCache.get(key);
+  if (pending) {
+    chapterCache.delete(key);
+  } else {
+    pending = fetchChapterHtml(ch);
+    pending.catch(() => chapterCache.delete(key));
+  }
+  chapterCache.set(key, pending);
+  while (chapterCache.size > CHAPTER_CACHE_SIZE) chapterCache.delete(chapterCache.keys().next().value);
+  return pending;
+}
+
+function prefetchAdjacent(index) {
+  for (const i of [index + 1, index - 1]) {
+    if (i >= 0 && i < chapters.length) getChapterHtml(chapters[i]).catch(() => {});
+  }
+}
+
+// Index from tools/search_index.py: only docs.json and the shards holding
+// the query's tokens are fetched. Tokenizing and shard hashing mirror the
+// Python side (Hangul runs become character bigrams).
+function searchTokens(text) {
+  const tokens = [];
+  for (const m of text.matchAll(/[\uac00-\ud7a3]+|(?:(?![\uac00-\ud7a3])[\p{L}\p{N}])+/gu)) {
+    const word = m[0];
+    if (word[0] >= '\uac00' && word[0] <= '\ud7a3') {
+      if (word.length === 1) tokens.push(word);
+      for (let i = 0; i < word.length - 1; i++) tokens.push(word.slice(i, i + 2));
+    } else {
+      tokens.push(word.toLowerCase());
+    }
+  }
+  return tokens;
+}
+
+function shardOf(token, shards) {
+  let h = 0x811c9dc5;
+  for (const ch of token) {
+    h ^= ch.codePointAt(0);
+    h = Math.imul(h, 0x01000193);
+  }
+  return (h >>> 0) % shards;
+}
+
+function decodePostings(flat) {
+  const postings = new Map();
+  if (!flat) return postings;
+  for (let i = 0; i < flat.length; i += 2 + flat[i + 1]) {
+    const positions = [];
+    let pos = 0;
+    for (let j = 0; j < flat[i + 1]; j++) {
+      pos += flat[i + 2 + j];
+      positions.push(pos);
+    }
+    postings.set(flat[i], positions);
+  }
+  return postings;
+}
+
+async function loadSearchIndex() {
+  const cfg = getLanguageConfig(currentLanguage);
+  if (searchIndex && searchIndex.lang === currentLanguage) return searchIndex;
+  const res = await fetch(cfg.searchPath + 'docs.json', { cache: 'no-cache' });
+  if (!res.ok) throw new Error('brak indeksu wyszukiwania (tools/search_index.py build)');
+  const meta = await res.json();
+  searchIndex = { lang: currentLanguage, path: cfg.searchPath, docs: meta.docs, count: meta.shards, shards: new Map() };
+  return searchIndex;
+}
+
+function loadSearchShard(index, sid) {
+  let shard = index.shards.get(sid);
+  if (!shard) {
+    shard = fetch(`${index.path}${String(sid).padStart(2, '0')}.json`, { cache: 'no-cache' }).then(res => {
+      if (!res.ok) throw new Error('HTTP ' + res.status);
+      return res.json();
+    });
+    shard.catch(() => index.shards.delete(sid));
+    index.shards.set(sid, shard);
+  }
+  return shard;
+}
+
+async function searchChapters(query) {
+  const tokens = searchTokens(query);
+  if (!tokens.length) return [];
+  const index = await loadSearchIndex();
+  const shards = await Promise.all(tokens.map(t => loadSearchShard(index, shardOf(t, index.count))));
+  let matches = decodePostings(shards[0][tokens[0]]);
+  for (let k = 1; k < tokens.length && matches.size; k++) {
+    const following = decodePostings(shards[k][tokens[k]]);
+    const narrowed = new Map();
+    for (const [doc, positions] of matches) {
+      const later = following.get(doc);
+      if (!later) continue;
+      const laterSet = new Set(later);
+      const kept = positions.filter(pos => laterSet.has(pos + k));
+      if (kept.length) narrowed.set(doc, kept);
+    }
+    matches = narrowed;
+  }
+  const hits = [];
+  for (const [doc, positions] of matches) {
+    const entry = index.docs[doc];
+    if (entry) hits.push({ num: entry[0], file: entry[1], count: positions.length });
+  }
+  hits.sort((a, b) => a.num - b.num);
+  return hits;
+}
+
+async function runSearch() {
+  const query = searchInput.value.trim();
+  if (!query) {
+    searchResults.hidden = true;
+    return;
+  }
+  setStatus(`Szukanie: ${query}...`);
+  try {
+    const hits = await searchChapters(query);
+    const total = hits.reduce((sum, hit) => sum + hit.count, 0);
+    const chapterLabel = getLanguageConfig(currentLanguage).chapterLabel;
+    searchResults.innerHTML = '';
+    const summary = document.createElement('div');
+    summary.textContent = hits.length
+      ? `„${query}”: ${hits.length} rozdz., ${total} wystąpień (pierwsze: ${chapterLabel} ${hits[0].num})`
+      : `„${query}”: brak wyników`;
+    // Hangul words are indexed as syllable pairs, so a single syllable only
+    // matches where it stands alone.
+    if (/^[\uac00-\ud7a3]$/.test(query)) {
+      summary.textContent += ' (szukanie po koreańsku wymaga co najmniej 2 sylab)';
+    }
+    searchResults.appendChild(summary);
+    for (const hit of hits.slice(0, SEARCH_RESULTS_SHOWN)) {
+      const btn = document.createElement('button');
+      btn.className = 'btn';
+      btn.textContent = `${hit.num} (${hit.count}×)`;
+      btn.addEventListener('click', () => {
+        let idx = chapters.findIndex(c => c.file === hit.file);
+        if (idx < 0) idx = chapters.findIndex(c => c.num === hit.num);
+        if (idx >= 0) loadChapter(idx);
+      });
+      searchResults.appendChild(btn);
+    }
+    searchResults.hidden = false;
+    setStatus(`Znaleziono: ${hits.length}`);
+  } catch (err) {
+    setStatus('Błąd wyszukiwania: ' + err.message);
+  }
+}
+
 async function loadChapter(index, updateSelect = true) {
   if (index < 0 || index >= chapters.length) return;
   currentIndex = index;
@@ -186,15 +438,15 @@ async function loadChapter(index, updateSelect = true) {
   const chapterLabel = getLanguageConfig(currentLanguage).chapterLabel;
   setStatus(`Ładowanie: ${chapterLabel} ${ch.num}...`);
   try {
-    const res = await fetch(encodeURI(chaptersBasePath + ch.file));
-    if (!res.ok) throw new Error('HTTP ' + res.status);
-    const text = await res.text();
+    await revalidateBundle();
+    const html = await getChapterHtml(ch);
     chapterTitle.textContent = `${chapterLabel} ${ch.num}` + (ch.title ? ` - ${ch.title}` : '');
-    chapterText.innerHTML = formatText(text.trim());
+    chapterText.innerHTML = html;
     setStatus(`Gotowe: ${chapterLabel} ${ch.num}`);
     updateReadToggle();
     updateUrlHash();
     saveLastChapterForLanguage(ch.num);
+    prefetchAdjacent(index);
   } catch (err) {
     chapterTitle.textContent = 'Błąd ładowania';
     chapterText.textContent = 'Nie udało się wczytać pliku. Upewnij się, że uruchomiłeś lokalny serwer HTTP w katalogu z plikami.';
@@ -227,6 +479,15 @@ function wireControls() {
   nextBtn.addEventListener('click', () => loadChapter(currentIndex + 1));
   if (bottomPrev) bottomPrev.addEventListener('click', () => loadChapter(currentIndex - 1));
   if (bottomNext) bottomNext.addEventListener('click', () => loadChapter(currentIndex + 1));
+  if (searchInput) {
+    searchInput.addEventListener('keydown', (e) => {
+      if (e.key === 'Enter') runSearch();
+      if (e.key === 'Escape') {
+        searchInput.value = '';
+        searchResults.hidden = true;
+      }
+    });
+  }
   chapterSelect.addEventListener('change', (e) => loadChapter(parseInt(e.target.value, 10)));
   readToggle.addEventListener('change', () => {
     const ch = chapters[currentIndex];
@@ -328,9 +589,12 @@ async function loadLanguage(lang, keepChapter = true) {
   currentLanguage = lang;
   chaptersBasePath = cfg.basePath;
   setStatus('Wczytywanie listy rozdziałów...');
+  const bundlePromise = loadBundle(cfg);
   const res = await fetch(cfg.chaptersFile);
   if (!res.ok) throw new Error('HTTP ' + res.status);
   const nextChapters = await res.json();
+  bundle = await bundlePromise;
+  if (searchResults) searchResults.hidden = true;
   let targetNum = null;
   if (keepChapter) {
     const current = chapters[currentIndex];
@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+import sys
+
+from backends import create_backend, serve
+
+
+def main():
+    if len(sys.argv) > 2:
+        print("Uzycie: python3 tools/backend_worker.py [codex | stub[:opcje]]", file=sys.stderr)
+        sys.exit(1)
+    spec = sys.argv[1] if len(sys.argv) == 2 else "codex"
+    if spec.startswith("worker"):
+        print("Worker nie moze obslugiwac backendu worker.", file=sys.stderr)
+        sys.exit(1)
+    sys.stdin.reconfigure(encoding='utf-8')
+    sys.stdout.reconfigure(encoding='utf-8')
+    backend = create_backend(spec)
+    try:
+        serve(backend)
+    finally:
+        backend.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,547 @@
+import hashlib
+import json
+import os
+import queue
+import random
+import re
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+
+class BackendError(RuntimeError):
+    pass
+
+
+# Raised when the guard passed to complete() stops a generation midway; the
+# scheduler retries it like any other backend error, without backoff.
+class GenerationAborted(BackendError):
+    pass
+
+
+ABORTED_PREFIX = "Przerwano generowanie"
+
+
+def check_chunk(guard, chunk: str) -> None:
+    # guard.feed() sees the answer piece by piece and returns a reason to stop.
+    reason = guard.feed(chunk)
+    if reason:
+        raise GenerationAborted(f"{ABORTED_PREFIX}: {reason}")
+
+
+class Backend:
+    name = "base"
+
+    def settings(self) -> dict:
+        return {"backend": self.name}
+
+    def complete(self, prompt: str, guard=None) -> str:
+        # With a guard the answer is read incrementally and the request is
+        # killed as soon as guard.feed() objects.
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class CodexCliBackend(Backend):
+    # Streaming is opt-in ("codex:stream"): codex then runs with --json and
+    # only the agent-message text of its event stream reaches the guard, not
+    # its progress and log output. Without it the guard is not used and the
+    # answer is only checked once complete.
+    name = "codex"
+
+    def __init__(self, stream: bool = False):
+        self.stream = stream
+
+    def settings(self) -> dict:
+        # CODEX_CACHE_TAG lets a change of model or codex config start a fresh
+        # response cache without deleting the old one.
+        return {
+            "backend": "codex",
+            "args": ["exec", "-", "--skip-git-repo-check"],
+            "tag": os.environ.get('CODEX_CACHE_TAG', ''),
+        }
+
+    def command(self, out_path: str, events: bool = False) -> List[str]:
+        # Prefer explicit CODEX_PATH (e.g. codex.js) for Windows with blocked ps1
+        codex_path = os.environ.get('CODEX_PATH')
+        use_node = False
+        if codex_path:
+            codex_path = str(Path(codex_path))
+            if codex_path.lower().endswith('.js'):
+                use_node = True
+        else:
+            codex_path = shutil.which('codex') or shutil.which('codex.cmd')
+        if not codex_path:
+            raise FileNotFoundError(
+                "Nie znaleziono komendy 'codex' ani CODEX_PATH. "
+                "Ustaw CODEX_PATH na pełną ścieżkę do codex.js, "
+                "np. C:\\Users\\Lukasz\\AppData\\Roaming\\npm\\node_modules\\@openai\\codex\\dist\\codex.js"
+            )
+        prefix = ['node', codex_path] if use_node else [codex_path]
+        extra = ['--json'] if events else []
+        return prefix + ['exec', '-', '--output-last-message', out_path, '--skip-git-repo-check'] + extra
+
+    def complete(self, prompt: str, guard=None) -> str:
+        with tempfile.NamedTemporaryFile(delete=False) as tmp:
+            out_path = tmp.name
+        try:
+            if guard is None or not self.stream:
+                subprocess.run(
+                    self.command(out_path),
+                    input=prompt.encode('utf-8'),
+                    text=False,
+                    check=True
+                )
+            else:
+                self._stream(prompt, out_path, guard)
+            return Path(out_path).read_text(encoding='utf-8').strip()
+        finally:
+            try:
+                os.remove(out_path)
+            except OSError:
+                pass
+
+    def _stream(self, prompt: str, out_path: str, guard) -> None:
+        # The guard sees the answer text from the JSON events; the returned
+        # answer is still the one codex writes to --output-last-message.
+        command = self.command(out_path, events=True)
+        with subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE) as proc:
+            try:
+                proc.stdin.write(prompt.encode('utf-8'))
+                proc.stdin.close()
+            except BrokenPipeError:
+                pass
+            deltas = False
+            try:
+                for raw in proc.stdout:
+                    kind, text = answer_event(raw)
+                    # Deltas when codex sends them; else the whole message,
+                    # never both, or the guard would see the answer twice.
+                    if kind == "delta":
+                        deltas = True
+                    elif kind != "message" or deltas:
+                        continue
+                    if text:
+                        check_chunk(guard, text)
+            except GenerationAborted:
+                proc.kill()
+                raise
+        if proc.returncode:
+            raise subprocess.CalledProcessError(proc.returncode, command)
+
+
+def answer_event(raw: bytes) -> Tuple[Optional[str], str]:
+    # ("delta" | "message" | None, text) for one `codex exec --json` line.
+    # Older CLIs wrap events as {"msg": {"type": "agent_message_delta",
+    # "delta": ...}}, newer ones as {"type": "item.completed", "item":
+    # {"type": "agent_message", "text": ...}}; everything else is not answer.
+    try:
+        event = json.loads(raw.decode('utf-8', errors='replace'))
+    except ValueError:
+        return None, ""
+    if not isinstance(event, dict):
+        return None, ""
+    body = event.get("msg") or event.get("item") or event
+    if not isinstance(body, dict):
+        return None, ""
+    kind = str(body.get("type", ""))
+    if kind in ("agent_message_delta", "agent_message_content_delta"):
+        return "delta", str(body.get("delta", ""))
+    if kind == "agent_message":
+        return "message", str(body.get("text") or body.get("message") or "")
+    return None, ""
+
+
+class WorkerBackend(Backend):
+    # Long-lived worker processes speaking one JSON object per line:
+    # {"id": 1, "prompt": "..."} in, {"id": 1, "output": "..."} or
+    # {"id": 1, "error": "..."} out. One process per concurrent request.
+    # With "stream": true in the request the worker first sends the answer
+    # as {"id": 1, "chunk": "..."} lines; an aborted request kills its worker.
+    name = "worker"
+
+    def __init__(self, command: str, size: int = 1):
+        self.command = command
+        self.size = max(1, size)
+        self._idle: "queue.Queue[subprocess.Popen]" = queue.Queue()
+        # Workers handed out to a request, so close() can stop them too.
+        self._busy: set = set()
+        self._started = 0
+        self._lock = threading.Lock()
+        # Signalled when a worker goes back to idle or a slot is freed.
+        self._available = threading.Condition(self._lock)
+        self._next_id = 0
+
+    def settings(self) -> dict:
+        return {"backend": self.name, "command": self.command, "tag": os.environ.get('CODEX_CACHE_TAG', '')}
+
+    def _spawn(self) -> subprocess.Popen:
+        return subprocess.Popen(
+            shlex.split(self.command, posix=os.name != "nt"),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            encoding='utf-8',
+            bufsize=1,
+        )
+
+    def _acquire(self) -> subprocess.Popen:
+        # Waiting on the condition, not on the queue: a discarded worker
+        # frees its slot, and the waiter spawns a replacement.
+        with self._available:
+            while True:
+                try:
+                    proc = self._idle.get_nowait()
+                    self._busy.add(proc)
+                    return proc
+                except queue.Empty:
+                    pass
+                if self._started < self.size:
+                    self._started += 1
+                    break
+                self._available.wait()
+        try:
+            proc = self._spawn()
+        except BaseException:
+            self._free_slot()
+            raise
+        with self._lock:
+            self._busy.add(proc)
+        return proc
+
+    def _release(self, proc: subprocess.Popen) -> None:
+        with self._available:
+            self._busy.discard(proc)
+            self._idle.put(proc)
+            self._available.notify()
+
+    def _free_slot(self) -> None:
+        with self._available:
+            self._started -= 1
+            self._available.notify()
+
+    def _discard(self, proc: subprocess.Popen) -> None:
+        try:
+            proc.kill()
+        except OSError:
+            pass
+        with self._lock:
+            self._busy.discard(proc)
+        self._free_slot()
+
+    def _read_reply(self, proc: subprocess.Popen, request_id: int) -> dict:
+        try:
+            line = proc.stdout.readline()
+        except OSError as exc:
+            self._discard(proc)
+            raise BackendError(f"worker przerwal polaczenie: {exc}") from exc
+        if not line:
+            code = proc.poll()
+            self._discard(proc)
+            raise BackendError(f"worker zakonczyl sie (kod {code}).")
+        try:
+            reply = json.loads(line)
+        except ValueError as exc:
+            self._discard(proc)
+            raise BackendError("worker zwrocil niepoprawny JSON.") from exc
+        # A reply to another request means the worker is out of step; any
+        # later line from it would go to the wrong caller.
+        if not isinstance(reply, dict) or reply.get("id") != request_id:
+            self._discard(proc)
+            raise BackendError("worker zwrocil odpowiedz na inne zapytanie.")
+        return reply
+
+    def complete(self, prompt: str, guard=None) -> str:
+        with self._lock:
+            self._next_id += 1
+            request_id = self._next_id
+        request = {"id": request_id, "prompt": prompt}
+        if guard is not None:
+            request["stream"] = True
+        proc = self._acquire()
+        try:
+            proc.stdin.write(json.dumps(request, ensure_ascii=False) + "\n")
+            proc.stdin.flush()
+        except OSError as exc:
+            self._discard(proc)
+            raise BackendError(f"worker przerwal polaczenie: {exc}") from exc
+        reply = self._read_reply(proc, request_id)
+        while "chunk" in reply:
+            if guard is not None:
+                try:
+                    check_chunk(guard, str(reply["chunk"]))
+                except GenerationAborted:
+                    self._discard(proc)
+                    raise
+            reply = self._read_reply(proc, request_id)
+        self._release(proc)
+        if "error" in reply:
+            raise BackendError(str(reply["error"]))
+        return str(reply.get("output", "")).strip()
+
+    def close(self) -> None:
+        while True:
+            try:
+                proc = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                proc.stdin.close()
+                proc.wait(timeout=5)
+            except (OSError, subprocess.TimeoutExpired):
+                proc.kill()
+        # Workers still answering: their callers get a BackendError.
+        with self._lock:
+            busy = list(self._busy)
+            self._busy.clear()
+        for proc in busy:
+            try:
+                proc.terminate()
+                proc.wait(timeout=5)
+            except (OSError, subprocess.TimeoutExpired):
+                proc.kill()
+
+
+HANGUL_RUN_RE = re.compile(r"[가-힣]+")
+STUB_SYLLABLES = ["ka", "ri", "so", "ne", "mi", "ra", "to", "ha", "śa", "ło", "dę", "uń"]
+
+
+def _latinize(match) -> str:
+    out = []
+    for ch in match.group(0):
+        out.append(STUB_SYLLABLES[ord(ch) % len(STUB_SYLLABLES)])
+    return "".join(out)
+
+
+class StubBackend(Backend):
+    # Deterministic offline backend: echoes the source (Hangul replaced by
+    # pseudo-latin syllables) with optional latency and injected defects.
+    # Defect rates are per first-pass request; repairs come back clean.
+    # "fail" is the share of calls (of any kind) that raise a rate-limit
+    # style BackendError; unlike defects it is not tied to the prompt, so a
+    # retry of the same request can succeed. "runaway" is the share of
+    # first-pass answers that fall into a loop, repeating a block of lines
+    # up to RUNAWAY_LENGTH times the normal answer; also drawn per call.
+    # Latency is per normal-length answer and, when streamed, spread over
+    # its chunks, so a longer answer takes proportionally longer.
+    name = "stub"
+    DEFECTS = ("hangul", "gender", "header", "short", "quotes")
+    RUNAWAY_LENGTH = 4
+    CHUNK_CHARS = 400
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, seed: int = 0, fail: float = 0.0,
+                 runaway: float = 0.0, **defects: float):
+        self.latency = latency
+        self.jitter = jitter
+        self.seed = seed
+        self.fail = fail
+        self.runaway = runaway
+        self._fail_rng = random.Random(seed)
+        unknown = set(defects) - set(self.DEFECTS)
+        if unknown:
+            raise ValueError(f"Nieznane defekty stuba: {', '.join(sorted(unknown))}")
+        self.defects = {name: float(defects.get(name, 0.0)) for name in self.DEFECTS}
+        self.calls: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def settings(self) -> dict:
+        return {"backend": self.name, "seed": self.seed, "defects": self.defects}
+
+    def _rng(self, prompt: str) -> random.Random:
+        digest = hashlib.sha256(f"{self.seed}\0{prompt}".encode('utf-8')).digest()
+        return random.Random(int.from_bytes(digest[:8], "big"))
+
+    def _count(self, kind: str) -> None:
+        with self._lock:
+            self.calls[kind] = self.calls.get(kind, 0) + 1
+
+    def complete(self, prompt: str, guard=None) -> str:
+        rng = self._rng(prompt)
+        delay = 0.0
+        if self.latency or self.jitter:
+            delay = max(0.0, self.latency + rng.uniform(-self.jitter, self.jitter))
+        if self.fail:
+            with self._lock:
+                failed = self._fail_rng.random() < self.fail
+            if failed:
+                time.sleep(delay)
+                self._count("failed")
+                raise BackendError("stub: rate limit exceeded (429)")
+        kind, output = self._answer(prompt, rng)
+        expected = max(1, len(output))
+        if self.runaway and kind in ("translate", "batch"):
+            with self._lock:
+                looped = self._fail_rng.random() < self.runaway
+            if looped:
+                self._count("runaway")
+                output = self._loop(output)
+        if guard is None:
+            time.sleep(delay * len(output) / expected)
+            return output
+        chunk = ""
+        for line in output.splitlines(keepends=True):
+            chunk += line
+            if len(chunk) >= self.CHUNK_CHARS:
+                time.sleep(delay * len(chunk) / expected)
+                check_chunk(guard, chunk)
+                chunk = ""
+        if chunk:
+            time.sleep(delay * len(chunk) / expected)
+            check_chunk(guard, chunk)
+        return output
+
+    def _answer(self, prompt: str, rng: random.Random):
+        if "=== AKAPITY DO POPRAWY ===" in prompt:
+            self._count("paragraph_repair")
+            return "paragraph_repair", self._paragraph_repair(prompt)
+        if "=== BIEZACE TLUMACZENIE DO POPRAWY ===" in prompt:
+            self._count("repair")
+            return "repair", self._clean(self._original(prompt))
+        if "=== ORYGINAL ROZDZIAL " in prompt:
+            self._count("batch")
+            return "batch", self._batch(prompt, rng)
+        self._count("translate")
+        return "translate", self._inject(self._original(prompt), rng)
+
+    def _loop(self, text: str) -> str:
+        lines = text.splitlines()
+        cut = len(lines) // 3
+        block = lines[cut:cut + 4] or lines
+        out = lines[:cut + len(block)]
+        limit = len(text) * self.RUNAWAY_LENGTH
+        size = len(text)
+        while size < limit:
+            out.extend(block)
+            size += sum(len(line) + 1 for line in block)
+        return "\n".join(out)
+
+    def _original(self, prompt: str) -> str:
+        block = prompt.split("=== ORYGINAL ===\n", 1)[1]
+        block = block.split("\n\n=== BIEZACE TLUMACZENIE DO POPRAWY ===", 1)[0]
+        num_match = re.search(r"^\[NUM\] (\d+)", block, re.M)
+        num = num_match.group(1) if num_match else "0"
+        fragment = re.search(r"^\[FRAGMENT\] (\d+)/", block, re.M)
+        body = block.split("\n\n", 1)[1] if "\n\n" in block else ""
+        lines = body.rstrip("\n").splitlines()
+        # The source repeats "[num] title" as its first line; replace it.
+        first = next((idx for idx, line in enumerate(lines) if line.strip()), None)
+        if first is not None and re.match(r"^\[\d+\]", lines[first].strip()):
+            lines.pop(first)
+        if fragment is None or fragment.group(1) == "1":
+            lines.insert(0, f"[{num}] Rozdzial {num}")
+        return "\n".join(lines).strip()
+
+    def _batch(self, prompt: str, rng: random.Random) -> str:
+        out = []
+        blocks = re.split(r"^=== ORYGINAL ROZDZIAL (\d+) ===\n", prompt, flags=re.M)
+        for idx in range(1, len(blocks) - 1, 2):
+            single = self._original("=== ORYGINAL ===\n" + blocks[idx + 1])
+            out.append(f"<<<ROZDZIAL {blocks[idx]}>>>\n{self._inject(single, rng)}")
+        return "\n\n".join(out)
+
+    def _clean(self, text: str) -> str:
+        return HANGUL_RUN_RE.sub(_latinize, text)
+
+    def _inject(self, text: str, rng: random.Random) -> str:
+        text = self._clean(text)
+        lines = text.splitlines()
+        body = [idx for idx, line in enumerate(lines) if line.strip() and not line.startswith("[")]
+        if body and rng.random() < self.defects["hangul"]:
+            idx = rng.choice(body)
+            lines[idx] = f"{lines[idx]} 마법"
+        if body and rng.random() < self.defects["gender"]:
+            idx = rng.choice(body)
+            lines[idx] = f"{lines[idx]} Amy powiedział to cicho."
+        if body and rng.random() < self.defects["quotes"]:
+            idx = rng.choice(body)
+            lines[idx] = f"{lines[idx]} \u201ecytat\u201d"
+        if lines and rng.random() < self.defects["header"]:
+            lines = lines[1:]
+        if rng.random() < self.defects["short"]:
+            lines = lines[: max(1, len(lines) * 2 // 5)]
+        return "\n".join(lines)
+
+    def _paragraph_repair(self, prompt: str) -> str:
+        body = prompt.split("=== AKAPITY DO POPRAWY ===\n", 1)[1]
+        out = []
+        for marker, current in re.findall(r"\[\[(A\d+)\]\]\n.*?\nTLUMACZENIE:\n(.*?)\n(?=\[\[A\d+\]\]|\Z)", body, re.S):
+            current = HANGUL_RUN_RE.sub("", current)
+            current = current.replace(" Amy powiedział to cicho.", "").replace(" \u201ecytat\u201d", "")
+            out.append(f"[[{marker}]] {current.strip()}")
+        return "\n".join(out)
+
+
+def parse_stub_spec(spec: str) -> StubBackend:
+    options = {}
+    for part in filter(None, spec.split(",")):
+        key, _, value = part.partition("=")
+        options[key.strip()] = value.strip()
+    latency = float(options.pop("latency", 0.0))
+    jitter = float(options.pop("jitter", 0.0))
+    seed = int(options.pop("seed", 0))
+    fail = float(options.pop("fail", 0.0))
+    runaway = float(options.pop("runaway", 0.0))
+    return StubBackend(
+        latency=latency, jitter=jitter, seed=seed, fail=fail, runaway=runaway,
+        **{k: float(v) for k, v in options.items()}
+    )
+
+
+def create_backend(spec: Optional[str], size: int = 1) -> Backend:
+    # "codex[:stream]", "worker:<command>" or "stub[:latency=0.5,hangul=0.2,...]".
+    spec = spec or "codex"
+    kind, _, rest = spec.partition(":")
+    if kind == "codex":
+        if rest not in ("", "stream"):
+            raise ValueError(f"Nieznana opcja backendu codex: {rest}")
+        return CodexCliBackend(stream=rest == "stream")
+    if kind == "worker":
+        if not rest:
+            raise ValueError("Backend worker wymaga komendy, np. worker:python3 tools/backend_worker.py stub")
+        return WorkerBackend(rest, size=size)
+    if kind == "stub":
+        return parse_stub_spec(rest)
+    raise ValueError(f"Nieznany backend: {spec}")
+
+
+class _ChunkWriter:
+    # Forwards a streamed answer to the worker's client, which runs the
+    # real guard and kills the worker to stop it.
+    def __init__(self, stdout, request_id):
+        self.stdout = stdout
+        self.request_id = request_id
+
+    def feed(self, chunk: str) -> Optional[str]:
+        self.stdout.write(json.dumps({"id": self.request_id, "chunk": chunk}, ensure_ascii=False) + "\n")
+        self.stdout.flush()
+        return None
+
+
+def serve(backend: Backend, stdin=None, stdout=None) -> None:
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    for line in stdin:
+        if not line.strip():
+            continue
+        try:
+            request = json.loads(line)
+        except ValueError:
+            stdout.write(json.dumps({"id": None, "error": "niepoprawny JSON"}) + "\n")
+            stdout.flush()
+            continue
+        reply = {"id": request.get("id")}
+        guard = _ChunkWriter(stdout, reply["id"]) if request.get("stream") else None
+        try:
+            reply["output"] = backend.complete(str(request.get("prompt", "")), guard)
+        except (BackendError, FileNotFoundError, subprocess.CalledProcessError) as exc:
+            reply["error"] = str(exc)
+        stdout.write(json.dumps(reply, ensure_ascii=False) + "\n")
+        stdout.flush()
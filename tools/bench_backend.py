@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+import contextlib
+import io
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import translate_with_codex as tw
+from backends import create_backend
+from progress_journal import ProgressJournal
+from run_metrics import MetricsLog
+
+
+def prompt_kind(prompt: str) -> str:
+    if "=== AKAPITY DO POPRAWY ===" in prompt:
+        return "naprawa akapitow"
+    if "=== BIEZACE TLUMACZENIE DO POPRAWY ===" in prompt:
+        return "naprawa"
+    if "=== ORYGINAL ROZDZIAL " in prompt:
+        return "partia"
+    if "[FRAGMENT]" in prompt:
+        return "fragment"
+    return "tlumaczenie"
+
+
+def main():
+    args = sys.argv[1:]
+    spec = tw.pop_option(args, "--backend", "stub:latency=0.2,jitter=0.1,hangul=0.2,gender=0.2,short=0.05")
+    jobs = int(tw.pop_option(args, "--jobs", "1"))
+    tw.SEGMENT_MAX_CHARS = int(tw.pop_option(args, "--segment", "0"))
+    tw.BATCH_MAX_CHARS = int(tw.pop_option(args, "--batch", "0"))
+    if "--stream" in args:
+        args.remove("--stream")
+        tw.STREAM_GUARD = True
+    if len(args) != 2:
+        print(
+            "Uzycie: python3 tools/bench_backend.py <start> <end> [--backend SPEC] [--jobs N] "
+            "[--segment N] [--batch N] [--stream]"
+        )
+        sys.exit(1)
+    start, end = int(args[0]), int(args[1])
+
+    glossary = tw.load_text(tw.GLOSSARY) if tw.GLOSSARY.exists() else ""
+    guidelines = tw.load_text(tw.GUIDELINES) if tw.GUIDELINES.exists() else ""
+    tw.GLOSSARY_CANONICAL_MAP = tw.parse_glossary_canonical_map(glossary)
+    tw.RESPONSE_CACHE.enabled = False
+    tw.set_backend(create_backend(spec, size=jobs * (tw.SEGMENT_JOBS if tw.SEGMENT_MAX_CHARS else 1)))
+
+    calls = {}
+    backend_time = [0.0]
+    lock = threading.Lock()
+    complete = tw.run_codex
+
+    def counted(prompt: str, guard=None) -> str:
+        began = time.perf_counter()
+        try:
+            return complete(prompt, guard)
+        finally:
+            with lock:
+                kind = prompt_kind(prompt)
+                calls[kind] = calls.get(kind, 0) + 1
+                backend_time[0] += time.perf_counter() - began
+
+    tw.run_codex = counted
+    log = io.StringIO()
+    with tempfile.TemporaryDirectory() as tmp:
+        tw.OUT_DIR = Path(tmp) / 'pl'
+        tw.PROGRESS_JOURNAL = ProgressJournal(Path(tmp) / 'chapters_pl.json')
+        tw.METRICS = MetricsLog(None)
+        began = time.perf_counter()
+        try:
+            with contextlib.redirect_stdout(log):
+                tw.translate_range(list(range(start, end + 1)), glossary, guidelines, jobs)
+        finally:
+            tw.set_backend(None)
+        wall = time.perf_counter() - began
+        saved = len(tw.PROGRESS_JOURNAL.entries())
+
+    total = end - start + 1
+    requests = sum(calls.values())
+    print(f"Backend: {spec}, watki: {jobs}, rozdzialy: {total}, zapisane: {saved}")
+    print(f"Czas: {wall:.2f} s ({total / wall:.2f} rozdz/s), czas w backendzie: {backend_time[0]:.2f} s")
+    print(f"Zapytania: {requests} ({requests / total:.2f} na rozdzial), przerwane w trakcie: {tw.SCHEDULER.aborted}")
+    for kind in sorted(calls):
+        print(f"  {kind}: {calls[kind]}")
+    skipped = [line for line in log.getvalue().splitlines() if line.startswith("Blad")]
+    if skipped:
+        print(f"Odrzucone rozdzialy: {len(skipped)}, np.: {skipped[0][:160]}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+import re
+import sys
+import time
+from pathlib import Path
+
+import translate_with_codex as tw
+
+
+def legacy_canonicalize_terms(text: str) -> str:
+    for pattern, replacement in tw.REGEX_CANONICAL_RULES:
+        text = re.sub(pattern, replacement, text, flags=re.IGNORECASE)
+    unified = {**tw.GLOSSARY_CANONICAL_MAP, **tw.TERM_CANONICAL_MAP}
+    for src in sorted(unified.keys(), key=len, reverse=True):
+        dst = unified[src]
+        text = re.sub(rf"(?<!\w){re.escape(src)}(?!\w)", dst, text, flags=re.IGNORECASE)
+    return text
+
+
+def load_corpus(directory: Path):
+    return [(path.name, path.read_text(encoding='utf-8')) for path in sorted(directory.glob("Chapter - *.txt"))]
+
+
+def time_pass(fn, corpus, rounds: int):
+    best = None
+    outputs = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        outputs = [fn(text) for _, text in corpus]
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, outputs
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    glossary = tw.load_text(tw.GLOSSARY) if tw.GLOSSARY.exists() else ""
+    tw.GLOSSARY_CANONICAL_MAP = tw.parse_glossary_canonical_map(glossary)
+    corpus = load_corpus(tw.OUT_DIR)
+    if not corpus:
+        print(f"Brak plikow w {tw.OUT_DIR}")
+        sys.exit(1)
+    size_mb = sum(len(text.encode('utf-8')) for _, text in corpus) / 1e6
+
+    start = time.perf_counter()
+    tw.get_canonicalizer()
+    build = time.perf_counter() - start
+
+    legacy_time, legacy_out = time_pass(legacy_canonicalize_terms, corpus, rounds)
+    new_time, new_out = time_pass(tw.canonicalize_terms, corpus, rounds)
+
+    diffs = [name for (name, _), a, b in zip(corpus, legacy_out, new_out) if a != b]
+    aliases = len({**tw.GLOSSARY_CANONICAL_MAP, **tw.TERM_CANONICAL_MAP})
+    print(f"Rozdzialy: {len(corpus)} ({size_mb:.2f} MB), aliasy: {aliases}, reguly regex: {len(tw.REGEX_CANONICAL_RULES)}")
+    print(f"Budowa matchera: {build * 1000:.2f} ms")
+    print(f"Stara wersja:    {legacy_time:.3f} s ({size_mb / legacy_time:.2f} MB/s)")
+    print(f"Nowa wersja:     {new_time:.3f} s ({size_mb / new_time:.2f} MB/s)")
+    print(f"Przyspieszenie:  {legacy_time / new_time:.2f}x")
+    if diffs:
+        print(f"ROZNICE w {len(diffs)} plikach, np.: {', '.join(diffs[:5])}")
+        sys.exit(1)
+    print("Wynik identyczny bajt w bajt dla wszystkich plikow.")
+
+
+if __name__ == '__main__':
+    main()
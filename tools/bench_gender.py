@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+import re
+import sys
+import time
+from typing import List
+
+import translate_with_codex as tw
+
+
+def legacy_detect_gender_mismatches(text: str, genders: dict) -> List[str]:
+    issues: List[str] = []
+    lines = text.splitlines()
+    max_issues = 8
+
+    feminine_group = "|".join(re.escape(marker) for marker in sorted(tw.FEMININE_MARKERS))
+    masculine_group = "|".join(re.escape(marker) for marker in sorted(tw.MASCULINE_MARKERS))
+
+    for idx, line in enumerate(lines, start=1):
+        stripped = line.strip()
+        if not stripped:
+            continue
+        for name, gender in genders.items():
+            if name not in stripped:
+                continue
+            if gender == "M":
+                pattern = rf"\b{re.escape(name)}\b[^\n.?!]{{0,80}}\b(?:{feminine_group})\b"
+            else:
+                pattern = rf"\b{re.escape(name)}\b[^\n.?!]{{0,80}}\b(?:{masculine_group})\b"
+            if re.search(pattern, stripped, flags=re.IGNORECASE):
+                excerpt = stripped if len(stripped) <= 140 else stripped[:137] + "..."
+                issues.append(f"Podejrzenie blednej plci dla {name} (linia {idx}: {excerpt})")
+                break
+        if len(issues) >= max_issues:
+            break
+    return issues
+
+
+def extended_cast(size: int) -> dict:
+    # Pad the real cast with capitalised names from the glossary so the
+    # benchmark shows how both versions scale with the number of characters.
+    glossary = tw.load_text(tw.GLOSSARY) if tw.GLOSSARY.exists() else ""
+    cast = dict(tw.CHARACTER_GENDER)
+    for raw in glossary.splitlines():
+        line = raw.strip()
+        if not line.startswith("- ") or "->" not in line:
+            continue
+        name = line.split("->", 1)[1].strip()
+        if len(cast) >= size:
+            break
+        if name[:1].isupper() and name not in cast:
+            cast[name] = "F" if len(cast) % 2 else "M"
+    idx = 0
+    while len(cast) < size:
+        cast[f"Postac{idx}"] = "F" if idx % 2 else "M"
+        idx += 1
+    return cast
+
+
+def run(corpus, genders: dict):
+    start = time.perf_counter()
+    legacy = [legacy_detect_gender_mismatches(text, genders) for text in corpus]
+    legacy_time = time.perf_counter() - start
+
+    detector = tw.GenderMismatchDetector(genders)
+    start = time.perf_counter()
+    new = [detector(text) for text in corpus]
+    new_time = time.perf_counter() - start
+
+    same = legacy == new
+    issues = sum(len(found) for found in new)
+    print(
+        f"Postacie: {len(genders):4d}  stara: {legacy_time:7.3f} s  nowa: {new_time:6.3f} s  "
+        f"przyspieszenie: {legacy_time / new_time:6.2f}x  problemy: {issues}  "
+        f"{'identyczne' if same else 'ROZNICE'}"
+    )
+    return same
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [len(tw.CHARACTER_GENDER), 100, 300, 1000]
+    corpus = [path.read_text(encoding='utf-8') for path in sorted(tw.OUT_DIR.glob("Chapter - *.txt"))]
+    if not corpus:
+        print(f"Brak plikow w {tw.OUT_DIR}")
+        sys.exit(1)
+    print(f"Rozdzialy: {len(corpus)}")
+    ok = True
+    for size in sizes:
+        ok = run(corpus, extended_cast(size)) and ok
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+import hashlib
+import json
+import re
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import translate_with_codex as tw
+from progress_journal import write_json_atomic
+
+GOLDEN = Path(__file__).resolve().parent / 'golden' / 'postprocess.json'
+
+
+def line_ratio(text: str, src_text: str) -> str:
+    src_lines = tw.count_non_empty_lines(src_text)
+    out_lines = tw.count_non_empty_lines(text)
+    return f"{out_lines}/{src_lines}"
+
+
+# (name, function(state) -> output, whether the output feeds the next stage).
+# The postprocessing stages run in the same order as postprocess_translation().
+STAGES = [
+    ("replace_hangul", lambda c: tw.replace_hangul(c["text"]), True),
+    ("canonicalize_terms", lambda c: tw.canonicalize_terms(c["text"]), True),
+    ("normalize_spacing", lambda c: tw.normalize_spacing(c["src"], c["text"]), True),
+    ("clean_headers", lambda c: tw.clean_headers(c["text"], c["num"], c["title"]), True),
+    ("normalize_quotes", lambda c: tw.normalize_quotes(c["text"]), True),
+    ("detect_gender_mismatches", lambda c: "\n".join(tw.detect_gender_mismatches(c["text"])), False),
+    ("line_ratio", lambda c: line_ratio(c["text"], c["src"]), False),
+    ("validate_translation", lambda c: "\n".join(tw.validate_translation(c["text"], c["src"], c["num"])), False),
+    ("split_issues", lambda c: json.dumps(tw.split_issues(c["issues"]), ensure_ascii=False), False),
+]
+
+
+def load_pairs(start=None, end=None):
+    pairs = []
+    for path in sorted(tw.OUT_DIR.glob("Chapter - *.txt")):
+        m = re.match(r"^Chapter - (\d+) -", path.name)
+        if not m:
+            continue
+        num = int(m.group(1))
+        if (start is not None and num < start) or (end is not None and num > end):
+            continue
+        src = tw.find_src_file(num)
+        if src is None:
+            continue
+        text = tw.load_text(path)
+        title = tw.parse_title(text, num, f"Rozdzial {num}")
+        pairs.append({"num": num, "text": text, "src": tw.load_source(src), "title": title})
+    pairs.sort(key=lambda c: c["num"])
+    return pairs
+
+
+def digest(value: str) -> str:
+    return hashlib.sha256(value.encode('utf-8')).hexdigest()[:16]
+
+
+def run_stages(pairs, measure_memory: bool):
+    stats = {name: {"time": 0.0, "bytes": 0, "peak": 0} for name, _, _ in STAGES}
+    outputs = {}
+    for pair in pairs:
+        state = dict(pair)
+        chapter_out = {}
+        for name, fn, feeds in STAGES:
+            if name == "split_issues":
+                state["issues"] = tw.validate_translation(state["text"], state["src"], state["num"])
+            stats[name]["bytes"] += len(state["text"].encode('utf-8'))
+            if measure_memory:
+                tracemalloc.start()
+                result = fn(state)
+                stats[name]["peak"] = max(stats[name]["peak"], tracemalloc.get_traced_memory()[1])
+                tracemalloc.stop()
+            else:
+                began = time.perf_counter()
+                result = fn(state)
+                stats[name]["time"] += time.perf_counter() - began
+            chapter_out[name] = digest(result)
+            if feeds:
+                state["text"] = result
+        outputs[str(pair["num"])] = chapter_out
+    return stats, outputs
+
+
+def compare_golden(outputs: dict):
+    if not GOLDEN.exists():
+        return None
+    golden = json.loads(GOLDEN.read_text(encoding='utf-8'))
+    changed = []
+    new = 0
+    for num, stages in outputs.items():
+        expected = golden.get("chapters", {}).get(num)
+        if expected is None:
+            new += 1
+            continue
+        for name, value in stages.items():
+            if name in expected and expected[name] != value:
+                changed.append((int(num), name))
+    return changed, new
+
+
+def main():
+    args = sys.argv[1:]
+    update = "--update-golden" in args
+    if update:
+        args.remove("--update-golden")
+    rounds = int(tw.pop_option(args, "--rounds", "3"))
+    if len(args) not in (0, 2):
+        print("Uzycie: python3 tools/bench_postprocess.py [<start> <end>] [--rounds N] [--update-golden]")
+        sys.exit(1)
+    start, end = (int(args[0]), int(args[1])) if args else (None, None)
+
+    glossary = tw.load_text(tw.GLOSSARY) if tw.GLOSSARY.exists() else ""
+    tw.GLOSSARY_CANONICAL_MAP = tw.parse_glossary_canonical_map(glossary)
+    pairs = load_pairs(start, end)
+    if not pairs:
+        print("Brak par tlumaczenie/oryginal w zakresie.")
+        sys.exit(1)
+    # Warm-up builds the compiled matchers so they are not charged to a stage.
+    run_stages(pairs[:1], measure_memory=False)
+
+    best = None
+    outputs = None
+    for _ in range(rounds):
+        stats, outputs = run_stages(pairs, measure_memory=False)
+        if best is None:
+            best = stats
+        else:
+            for name in best:
+                best[name]["time"] = min(best[name]["time"], stats[name]["time"])
+    memory, _ = run_stages(pairs, measure_memory=True)
+
+    count = len(pairs)
+    print(f"Pary rozdzialow: {count} ({pairs[0]['num']}-{pairs[-1]['num']}), najlepszy z {rounds} przebiegow")
+    print(f"{'etap':<26} {'czas [ms]':>10} {'rozdz/s':>10} {'MB/s':>8} {'szczyt pamieci [KB]':>20}")
+    total = 0.0
+    for name, _, _ in STAGES:
+        stage = best[name]
+        elapsed = stage["time"]
+        total += elapsed
+        rate = count / elapsed if elapsed else float("inf")
+        mbps = stage["bytes"] / 1e6 / elapsed if elapsed else float("inf")
+        print(f"{name:<26} {elapsed * 1000:10.1f} {rate:10.1f} {mbps:8.2f} {memory[name]['peak'] / 1024:20.1f}")
+    print(f"{'razem':<26} {total * 1000:10.1f} {count / total:10.1f}")
+
+    if update:
+        write_json_atomic(GOLDEN, {"chapters": outputs})
+        print(f"Zapisano wzorzec: {GOLDEN}")
+        return
+    result = compare_golden(outputs)
+    if result is None:
+        print("Brak zapisanego wzorca; uruchom z --update-golden.")
+        return
+    changed, new = result
+    if new:
+        print(f"Rozdzialy bez wzorca: {new}")
+    if changed:
+        print(f"ZMIANA WYNIKU wzgledem wzorca w {len(changed)} miejscach:")
+        for num, name in changed[:20]:
+            print(f"  {num}: {name}")
+        sys.exit(1)
+    print("Wynik identyczny ze wzorcem.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+import json
+import mmap
+import os
+import sys
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from chapter_index import CHAPTER_RE, LANGUAGE_DIRS, READER_DIR
+from progress_journal import write_json_atomic
+from render_chapters import RENDER_VERSION, decode_chapter, format_text
+
+# Each language's chapter files concatenated into reader/bundle/<lang>-<gen>.bin,
+# described by reader/bundle/<lang>.json:
+#   {"version": 3, "render": R, "bundle": "<lang>-<gen>.bin", "size": N,
+#    "fields": [...FIELDS], "chapters": [[...], ...]}
+# Every chapter is stored twice: the raw file (offset/length, read by the
+# tools through mmap) followed by its pre-rendered HTML (html_offset/
+# html_length, the same markup as render_chapters.py fragments, fetched by
+# the reader with HTTP Range). key is the file's [mtime_ns, size].
+# Changed chapters are appended to the current bundle and re-pointed in the
+# index, so offsets of everything else stay valid for readers holding the old
+# index. Once stale bytes exceed GARBAGE_SHARE the bundle is rewritten under
+# the next generation number.
+BUNDLE_DIR = READER_DIR / 'bundle'
+BUNDLE_VERSION = 3
+FIELDS = ["num", "title", "offset", "length", "file", "key", "html_offset", "html_length"]
+GARBAGE_SHARE = 0.25
+
+
+def index_path(lang: str) -> Path:
+    return BUNDLE_DIR / f"{lang}.json"
+
+
+def build_state_path(lang: str) -> Path:
+    return BUNDLE_DIR / f".{lang}.build.json"
+
+
+def _load_json(path: Path) -> dict:
+    try:
+        data = json.loads(path.read_text(encoding='utf-8'))
+    except (FileNotFoundError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def chapter_sources(lang: str) -> List[Tuple[int, str, str, list]]:
+    directory = LANGUAGE_DIRS[lang]
+    found = []
+    if not directory.is_dir():
+        return found
+    with os.scandir(directory) as it:
+        for item in it:
+            m = CHAPTER_RE.match(item.name)
+            if not m or not item.is_file():
+                continue
+            st = item.stat()
+            found.append((int(m.group(1)), m.group(2), item.name, [st.st_mtime_ns, st.st_size]))
+    found.sort(key=lambda s: (s[0], s[2]))
+    return found
+
+
+def _pack(out, directory: Path, source: tuple, offset: int) -> Tuple[list, int]:
+    # Writes one chapter's raw bytes and rendered HTML; returns its index
+    # entry and the offset after it.
+    num, title, file_name, key = source
+    data = (directory / file_name).read_bytes()
+    html = format_text(decode_chapter(data)).encode('utf-8')
+    out.write(data)
+    out.write(html)
+    entry = [num, title, offset, len(data), file_name, key, offset + len(data), len(html)]
+    return entry, offset + len(data) + len(html)
+
+
+def _packed_size(entry: list) -> int:
+    return entry[3] + entry[7]
+
+
+def _write_full(lang: str, sources, generation: int) -> Tuple[dict, dict]:
+    directory = LANGUAGE_DIRS[lang]
+    name = f"{lang}-{generation}.bin"
+    target = BUNDLE_DIR / name
+    tmp = target.with_suffix(".bin.tmp")
+    chapters = []
+    stats = {}
+    offset = 0
+    with open(tmp, "wb") as out:
+        for source in sources:
+            entry, offset = _pack(out, directory, source, offset)
+            chapters.append(entry)
+            stats[source[2]] = source[3]
+        out.flush()
+        os.fsync(out.fileno())
+    os.replace(tmp, target)
+    index = {
+        "version": BUNDLE_VERSION, "render": RENDER_VERSION, "bundle": name, "size": offset,
+        "fields": FIELDS, "chapters": chapters,
+    }
+    state = {"generation": generation, "garbage": 0, "files": stats}
+    return index, state
+
+
+def build_bundle(lang: str, force: bool = False) -> Dict[str, int]:
+    BUNDLE_DIR.mkdir(parents=True, exist_ok=True)
+    sources = chapter_sources(lang)
+    index = _load_json(index_path(lang))
+    state = _load_json(build_state_path(lang))
+    bundle = BUNDLE_DIR / str(index.get("bundle", ""))
+    generation = int(state.get("generation", 0))
+    usable = (
+        not force
+        and index.get("version") == BUNDLE_VERSION
+        and index.get("render") == RENDER_VERSION
+        and bundle.is_file()
+        and bundle.stat().st_size == index.get("size")
+        and isinstance(state.get("files"), dict)
+    )
+    result = {"added": 0, "removed": 0, "unchanged": 0, "rewritten": 0}
+
+    if usable:
+        entries = {entry[4]: entry for entry in index["chapters"]}
+        known = state["files"]
+        current = {file_name for _, _, file_name, _ in sources}
+        changed = [s for s in sources if known.get(s[2]) != s[3] or s[2] not in entries]
+        removed = [name for name in entries if name not in current]
+        result["unchanged"] = len(sources) - len(changed)
+        if not changed and not removed:
+            return result
+        garbage = int(state.get("garbage", 0))
+        garbage += sum(_packed_size(entries[s[2]]) for s in changed if s[2] in entries)
+        garbage += sum(_packed_size(entries[name]) for name in removed)
+        # The rendered HTML is about as large as the text it comes from.
+        grown = index["size"] + 2 * sum(s[3][1] for s in changed)
+        if garbage <= grown * GARBAGE_SHARE:
+            directory = LANGUAGE_DIRS[lang]
+            offset = index["size"]
+            with open(bundle, "ab") as out:
+                for source in changed:
+                    entries[source[2]], offset = _pack(out, directory, source, offset)
+                    known[source[2]] = source[3]
+                out.flush()
+                os.fsync(out.fileno())
+            for name in removed:
+                del entries[name]
+                known.pop(name, None)
+            index["chapters"] = sorted(entries.values(), key=lambda e: (e[0], e[4]))
+            index["size"] = offset
+            state["garbage"] = garbage
+            # Bytes first, then the index: a crash in between leaves the old
+            # index pointing at still-valid data.
+            write_json_atomic(index_path(lang), index, indent=None)
+            write_json_atomic(build_state_path(lang), state, indent=None)
+            result["added"] = len(changed)
+            result["removed"] = len(removed)
+            return result
+
+    old_bundle = bundle if bundle.is_file() else None
+    index, state = _write_full(lang, sources, generation + 1)
+    write_json_atomic(index_path(lang), index, indent=None)
+    write_json_atomic(build_state_path(lang), state, indent=None)
+    if old_bundle is not None and old_bundle.name != index["bundle"]:
+        try:
+            old_bundle.unlink()
+        except OSError:
+            pass
+    result["unchanged"] = 0
+    result["rewritten"] = len(sources)
+    return result
+
+
+def refresh_bundle(lang: str, directory: Path) -> None:
+    # Called after chapters are rewritten; only when the language is bundled
+    # and the directory is its real one (not a benchmark's temp copy).
+    if directory == LANGUAGE_DIRS[lang] and index_path(lang).is_file():
+        build_bundle(lang)
+
+
+class ChapterBundle:
+    # Read-only access through mmap; data() returns memoryview slices of the
+    # mapping, so nothing is copied until the caller decodes.
+    def __init__(self, lang: str, directory: Optional[Path] = None):
+        directory = directory or BUNDLE_DIR
+        index = _load_json(directory / f"{lang}.json")
+        if index.get("version") != BUNDLE_VERSION:
+            raise FileNotFoundError(f"Brak paczki rozdzialow dla {lang}; uruchom tools/chapter_bundle.py {lang}")
+        self.lang = lang
+        self.entries = [tuple(entry) for entry in index["chapters"]]
+        self._by_num: Dict[int, List[tuple]] = {}
+        for entry in self.entries:
+            self._by_num.setdefault(entry[0], []).append(entry)
+        self._fh = open(directory / index["bundle"], "rb")
+        size = index["size"]
+        if size:
+            self._map = mmap.mmap(self._fh.fileno(), size, access=mmap.ACCESS_READ)
+            self._view = memoryview(self._map)
+        else:
+            self._map = None
+            self._view = memoryview(b"")
+
+    def nums(self) -> List[int]:
+        return sorted(self._by_num)
+
+    def files(self, num: int) -> List[str]:
+        return [entry[4] for entry in self._by_num.get(num, [])]
+
+    def data(self, num: int, file_name: Optional[str] = None) -> Optional[memoryview]:
+        for entry in self._by_num.get(num, []):
+            if file_name is None or entry[4] == file_name:
+                return self._view[entry[2]:entry[2] + entry[3]]
+        return None
+
+    def text(self, num: int, file_name: Optional[str] = None) -> Optional[str]:
+        # Same result as load_text() on the chapter file.
+        data = self.data(num, file_name)
+        return None if data is None else str(data, 'utf-8')
+
+    def title(self, num: int) -> Optional[str]:
+        entries = self._by_num.get(num)
+        return entries[0][1] if entries else None
+
+    def __iter__(self) -> Iterator[Tuple[int, str, memoryview]]:
+        for num, title, offset, length, *_ in self.entries:
+            yield num, title, self._view[offset:offset + length]
+
+    def close(self) -> None:
+        self._view.release()
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                # Callers still hold slices; the mapping goes with them.
+                pass
+        self._fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_bundle(lang: str) -> Optional[ChapterBundle]:
+    # The bundle if it exists and is up to date with the chapter directory.
+    try:
+        bundle = ChapterBundle(lang)
+    except (FileNotFoundError, KeyError):
+        return None
+    known = _load_json(build_state_path(lang)).get("files", {})
+    current = {file_name: key for _, _, file_name, key in chapter_sources(lang)}
+    if current != known:
+        bundle.close()
+        return None
+    return bundle
+
+
+def main():
+    args = sys.argv[1:]
+    force = "--force" in args
+    if force:
+        args.remove("--force")
+    unknown = [lang for lang in args if lang not in LANGUAGE_DIRS]
+    if unknown:
+        print("Uzycie:")
+        print(f"  python3 tools/chapter_bundle.py [{'|'.join(LANGUAGE_DIRS)} ...] [--force]")
+        sys.exit(1)
+    for lang in args or list(LANGUAGE_DIRS):
+        stats = build_bundle(lang, force)
+        index = _load_json(index_path(lang))
+        print(
+            f"{lang}: {index.get('bundle')} ({index.get('size', 0) / 1e6:.1f} MB, {len(index.get('chapters', []))} plikow); "
+            f"przepisano {stats['rewritten']}, dopisano {stats['added']}, usunieto {stats['removed']}, "
+            f"bez zmian {stats['unchanged']}"
+        )
+
+
+if __name__ == '__main__':
+    main()
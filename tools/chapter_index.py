@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+import json
+import os
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from progress_journal import write_json_atomic
+
+BASE = Path(__file__).resolve().parents[1]
+CACHE_DIR = BASE / '.cache' / 'chapter_index'
+READER_DIR = BASE / 'reader'
+
+LANGUAGE_DIRS = {
+    "en": BASE,
+    "ko": BASE / 'Infinity Mage Chapters 1-1277 original',
+    "pl": BASE / 'pl',
+}
+
+# The Polish manifest is owned by the translator (see progress_journal.py);
+# only the scraped languages are regenerated from their directories.
+MANIFESTS = {
+    "en": READER_DIR / 'chapters.json',
+    "ko": READER_DIR / 'chapters_ko.json',
+}
+
+CHAPTER_RE = re.compile(r"^Chapter - (\d+) -\s*(.*)\.txt$")
+
+# Directory mtimes have coarse resolution on some filesystems; a scan taken
+# within this window of the last change is not trusted on the next run.
+RACY_WINDOW_NS = 2_000_000_000
+
+
+def scan_directory(directory: Path) -> List[dict]:
+    entries = []
+    with os.scandir(directory) as it:
+        for item in it:
+            m = CHAPTER_RE.match(item.name)
+            if not m or not item.is_file():
+                continue
+            entries.append({"num": int(m.group(1)), "file": item.name, "title": m.group(2)})
+    entries.sort(key=lambda e: (e["num"], e["file"]))
+    return entries
+
+
+class ChapterIndex:
+    def __init__(self, directory: Path, cache_path: Optional[Path] = None):
+        self.directory = directory
+        self.cache_path = cache_path
+        self._mtime_ns = None
+        self._entries: List[dict] = []
+        self._by_num: Dict[int, List[str]] = {}
+
+    def _load_cache(self, mtime_ns: int) -> bool:
+        if self.cache_path is None or not self.cache_path.exists():
+            return False
+        try:
+            data = json.loads(self.cache_path.read_text(encoding='utf-8'))
+        except Exception:
+            return False
+        if data.get("dir") != str(self.directory) or data.get("mtime_ns") != mtime_ns:
+            return False
+        if data.get("scanned_ns", 0) - mtime_ns < RACY_WINDOW_NS:
+            return False
+        entries = data.get("entries")
+        if not isinstance(entries, list):
+            return False
+        self._set_entries(entries)
+        return True
+
+    def _save_cache(self, mtime_ns: int) -> None:
+        if self.cache_path is None:
+            return
+        data = {
+            "dir": str(self.directory),
+            "mtime_ns": mtime_ns,
+            "scanned_ns": time.time_ns(),
+            "entries": self._entries,
+        }
+        try:
+            write_json_atomic(self.cache_path, data)
+        except OSError:
+            pass
+
+    def _set_entries(self, entries: List[dict]) -> None:
+        self._entries = entries
+        by_num: Dict[int, List[str]] = {}
+        for entry in entries:
+            by_num.setdefault(entry["num"], []).append(entry["file"])
+        self._by_num = by_num
+
+    def refresh(self) -> None:
+        try:
+            mtime_ns = self.directory.stat().st_mtime_ns
+        except FileNotFoundError:
+            self._mtime_ns = None
+            self._set_entries([])
+            return
+        if mtime_ns == self._mtime_ns:
+            return
+        if not self._load_cache(mtime_ns):
+            self._set_entries(scan_directory(self.directory))
+            self._save_cache(mtime_ns)
+        self._mtime_ns = mtime_ns
+
+    def entries(self) -> List[dict]:
+        self.refresh()
+        return [dict(entry) for entry in self._entries]
+
+    def nums(self) -> List[int]:
+        self.refresh()
+        return sorted(self._by_num)
+
+    def files(self, num: int) -> List[str]:
+        self.refresh()
+        return list(self._by_num.get(num, ()))
+
+    def find(self, num: int) -> Optional[Path]:
+        self.refresh()
+        files = self._by_num.get(num)
+        return self.directory / files[0] if files else None
+
+
+_INDEXES: Dict[str, ChapterIndex] = {}
+
+
+def get_index(lang: str) -> ChapterIndex:
+    index = _INDEXES.get(lang)
+    if index is None:
+        index = ChapterIndex(LANGUAGE_DIRS[lang], CACHE_DIR / f"{lang}.json")
+        _INDEXES[lang] = index
+    return index
+
+
+def build_manifest(lang: str) -> Path:
+    path = MANIFESTS[lang]
+    write_json_atomic(path, get_index(lang).entries())
+    return path
+
+
+def main():
+    args = sys.argv[1:]
+    if not args or args[0] not in ("manifest", "stats"):
+        print("Uzycie:")
+        print("  python3 tools/chapter_index.py manifest [en|ko ...]")
+        print("  python3 tools/chapter_index.py stats")
+        sys.exit(1)
+
+    if args[0] == "stats":
+        for lang in LANGUAGE_DIRS:
+            index = get_index(lang)
+            nums = index.nums()
+            duplicates = [num for num in nums if len(index.files(num)) > 1]
+            missing = sorted(set(range(nums[0], nums[-1] + 1)) - set(nums)) if nums else []
+            print(
+                f"{lang}: {len(nums)} rozdzialow"
+                + (f" ({nums[0]}-{nums[-1]})" if nums else "")
+                + (f", duplikaty: {duplicates}" if duplicates else "")
+                + (f", brakujace: {missing}" if missing else "")
+            )
+        return
+
+    langs = args[1:] or list(MANIFESTS)
+    for lang in langs:
+        if lang not in MANIFESTS:
+            print(f"Nieznany jezyk manifestu: {lang}")
+            sys.exit(1)
+        print(f"Zapisano {build_manifest(lang)}")
+
+
+if __name__ == '__main__':
+    main()
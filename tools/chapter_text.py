@@ -0,0 +1,85 @@
+import re
+from functools import cached_property, lru_cache
+from typing import List, Optional, Tuple
+
+SEPARATOR_RE = re.compile(r"^\s*\*\s*\*\s*\*\s*$")
+HANGUL_CHAR_RE = re.compile(r"[가-힣]")
+# Markers validate_translation() looks for, found in one scan of the text.
+MARKER_RE = re.compile(r"(?m)^\[(TITLE|NUM)\]|\n{3,}")
+
+
+# A chapter text split once into lines, with the derived facts the
+# postprocessing and validation stages ask for. Everything is computed on
+# first use, so a stage only pays for what it reads.
+class ParsedChapter:
+    def __init__(self, text: str):
+        self.text = text
+        self.lines: List[str] = text.splitlines()
+
+    @cached_property
+    def paragraphs(self) -> List[int]:
+        # 0-based indices of the non-empty lines; a paragraph is one line.
+        return [idx for idx, line in enumerate(self.lines) if line.strip()]
+
+    @cached_property
+    def non_empty(self) -> List[str]:
+        return [self.lines[idx].strip() for idx in self.paragraphs]
+
+    @property
+    def non_empty_count(self) -> int:
+        return len(self.paragraphs)
+
+    @property
+    def blank_count(self) -> int:
+        return len(self.lines) - len(self.paragraphs)
+
+    @cached_property
+    def double_spaced(self) -> bool:
+        if not self.lines:
+            return False
+        return self.blank_count >= len(self.lines) * 0.4
+
+    @property
+    def header(self) -> Optional[Tuple[int, str]]:
+        # (line index, stripped text) of the first non-empty line.
+        if not self.paragraphs:
+            return None
+        return self.paragraphs[0], self.non_empty[0]
+
+    @cached_property
+    def separators(self) -> List[int]:
+        return [idx for idx, line in enumerate(self.lines) if SEPARATOR_RE.match(line)]
+
+    @cached_property
+    def markers(self) -> set:
+        found = set()
+        for match in MARKER_RE.finditer(self.text):
+            found.add(match.group(1) or "blank_run")
+            if len(found) == 3:
+                break
+        return found
+
+    @cached_property
+    def hangul_lines(self) -> List[int]:
+        # 1-based, like the line numbers carried by validation issues.
+        if not HANGUL_CHAR_RE.search(self.text):
+            return []
+        return [idx for idx, line in enumerate(self.lines, start=1) if HANGUL_CHAR_RE.search(line)]
+
+    @cached_property
+    def unbalanced_quote_lines(self) -> List[int]:
+        # Lines whose opening quotes (“ or Polish „) do not match their ”, or
+        # with an odd number of ASCII ones, 1-based.
+        if not any(ch in self.text for ch in '„“”"'):
+            return []
+        return [
+            idx for idx, line in enumerate(self.lines, start=1)
+            if line.count("“") + line.count("„") != line.count("”") or line.count('"') % 2
+        ]
+
+
+@lru_cache(maxsize=16)
+def parse_chapter(text: str) -> ParsedChapter:
+    # The same translation and source are looked at by several stages (and
+    # again on every repair attempt), so recent parses are kept.
+    return ParsedChapter(text)
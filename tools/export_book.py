@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+import json
+import os
+import re
+import sys
+import time
+import uuid
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterator, List, NamedTuple, Optional, Tuple
+
+from chapter_index import BASE, LANGUAGE_DIRS, MANIFESTS, READER_DIR
+from chapter_text import SEPARATOR_RE
+from render_chapters import decode_chapter, escape_html, format_line
+from source_clean import clean_text
+
+# EPUB 3 and/or one plain .txt for a chapter range of any language, built
+# from the reader manifests. Chapters are cleaned of scraper noise, marked up
+# with the reader's quote/escaping rules (render_chapters.format_line) on a
+# process pool and written into the zip in order as they come back; at most
+# PENDING_PER_JOB chapters per worker are in flight, so memory does not grow
+# with the range.
+EXPORT_DIR = BASE / 'export'
+MANIFEST_FILES = {**MANIFESTS, "pl": READER_DIR / 'chapters_pl.json'}
+BOOK_TITLES = {"en": "Infinity Mage", "ko": "무한의 마법사", "pl": "Infinity Mage"}
+FORMATS = ("epub", "txt")
+PENDING_PER_JOB = 8
+# Zip entries get a fixed timestamp so the same chapters give the same file.
+ZIP_DATE = (1980, 1, 1, 0, 0, 0)
+
+# Header lines the scrapes and the translator put above the text
+# ("Chapter 50", "[500] Rozpacz (3)"); the export prints its own heading.
+HEADER_RE = re.compile(r"^(?:\[\d+\]|Chapter\s*\d+\b)")
+HEADER_LINES = 3
+# Characters XML 1.0 does not allow.
+XML_INVALID_RE = re.compile("[\\x00-\\x08\\x0b\\x0c\\x0e-\\x1f\\ufffe\\uffff]")
+
+STYLE = """body { font-family: serif; line-height: 1.5; }
+h2 { text-align: center; margin: 1em 0 1.5em; }
+p { margin: 0 0 0.6em; text-indent: 1.2em; }
+p.separator { text-align: center; text-indent: 0; }
+strong.quote { font-weight: 600; }
+"""
+CONTAINER = """<?xml version="1.0" encoding="UTF-8"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+  <rootfiles>
+    <rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>
+  </rootfiles>
+</container>
+"""
+XHTML = """<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE html>
+<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops" lang="{lang}" xml:lang="{lang}">
+<head>
+<meta charset="UTF-8"/>
+<title>{title}</title>
+<link rel="stylesheet" type="text/css" href="{css}"/>
+</head>
+<body>
+{body}
+</body>
+</html>
+"""
+
+
+class Chapter(NamedTuple):
+    num: int
+    heading: str
+    path: Path
+    id: str
+
+
+def load_chapters(lang: str, start: Optional[int] = None, end: Optional[int] = None) -> Tuple[List[Chapter], List[str]]:
+    # Manifest entries in the range whose files exist, and the missing files.
+    entries = json.loads(MANIFEST_FILES[lang].read_text(encoding='utf-8'))
+    directory = LANGUAGE_DIRS[lang]
+    chapters: List[Chapter] = []
+    missing: List[str] = []
+    for entry in entries:
+        num = int(entry["num"])
+        if (start is not None and num < start) or (end is not None and num > end):
+            continue
+        path = directory / entry["file"]
+        if not path.is_file():
+            missing.append(entry["file"])
+            continue
+        title = str(entry.get("title") or "")
+        chapters.append(Chapter(num, f"{num}. {title}" if title else str(num), path, f"ch{len(chapters) + 1:05d}"))
+    return chapters, missing
+
+
+def chapter_lines(path: str) -> List[str]:
+    text, _ = clean_text(decode_chapter(Path(path).read_bytes()))
+    lines = [line.strip() for line in XML_INVALID_RE.sub("", text).split("\n")]
+    lines = [line for line in lines if line]
+    for idx, line in enumerate(lines[:HEADER_LINES]):
+        if HEADER_RE.match(line):
+            del lines[:idx + 1]
+            break
+    return lines
+
+
+def render_chapter(job: Tuple[str, str, str, Tuple[str, ...]]) -> Tuple[bytes, bytes]:
+    # (XHTML document, plain text block) for one chapter, each only if asked for.
+    lang, heading, path, formats = job
+    lines = chapter_lines(path)
+    xhtml = plain = b""
+    if "epub" in formats:
+        body = [f"<h2>{escape_html(heading)}</h2>"]
+        for line in lines:
+            if SEPARATOR_RE.match(line):
+                body.append(f'<p class="separator">{escape_html(line)}</p>')
+            else:
+                body.append(f"<p>{format_line(line)}</p>")
+        xhtml = XHTML.format(lang=lang, title=escape_html(heading), css="../style.css", body="\n".join(body)).encode('utf-8')
+    if "txt" in formats:
+        plain = (heading + "\n\n" + "\n\n".join(lines) + "\n\n\n").encode('utf-8')
+    return xhtml, plain
+
+
+def ordered_map(fn: Callable, jobs: list, workers: int) -> Iterator:
+    # pool.map() would queue every result; this keeps a bounded window in order.
+    if workers <= 1:
+        yield from map(fn, jobs)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending: deque = deque()
+        for job in jobs:
+            pending.append(pool.submit(fn, job))
+            if len(pending) >= workers * PENDING_PER_JOB:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _zip_write(book: zipfile.ZipFile, name: str, data, compress: int = zipfile.ZIP_DEFLATED) -> None:
+    info = zipfile.ZipInfo(name, ZIP_DATE)
+    info.compress_type = compress
+    book.writestr(info, data)
+
+
+def package_document(lang: str, title: str, chapters: List[Chapter], identifier: str) -> str:
+    items = "\n".join(
+        f'    <item id="{c.id}" href="text/{c.id}.xhtml" media-type="application/xhtml+xml"/>' for c in chapters
+    )
+    spine = "\n".join(f'    <itemref idref="{c.id}"/>' for c in chapters)
+    # The newest chapter's mtime, not the export time, for reproducible output.
+    newest = max(c.path.stat().st_mtime for c in chapters)
+    modified = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(newest))
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="book-id" xml:lang="{lang}">
+  <metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
+    <dc:identifier id="book-id">{identifier}</dc:identifier>
+    <dc:title>{escape_html(title)}</dc:title>
+    <dc:language>{lang}</dc:language>
+    <meta property="dcterms:modified">{modified}</meta>
+  </metadata>
+  <manifest>
+    <item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>
+    <item id="style" href="style.css" media-type="text/css"/>
+{items}
+  </manifest>
+  <spine>
+{spine}
+  </spine>
+</package>
+"""
+
+
+def navigation(lang: str, title: str, chapters: List[Chapter]) -> str:
+    entries = "\n".join(f'<li><a href="text/{c.id}.xhtml">{escape_html(c.heading)}</a></li>' for c in chapters)
+    body = f'<nav epub:type="toc" id="toc">\n<h1>{escape_html(title)}</h1>\n<ol>\n{entries}\n</ol>\n</nav>'
+    return XHTML.format(lang=lang, title=escape_html(title), css="style.css", body=body)
+
+
+def export(lang: str, chapters: List[Chapter], out_stem: Path, formats: Tuple[str, ...], jobs: int) -> List[Path]:
+    first, last = chapters[0].num, chapters[-1].num
+    title = f"{BOOK_TITLES[lang]} {first}-{last}"
+    identifier = f"urn:uuid:{uuid.uuid5(uuid.NAMESPACE_URL, f'infinity-mage/{lang}/{first}-{last}')}"
+    out_stem.parent.mkdir(parents=True, exist_ok=True)
+    # Appended, not with_suffix(): "--out book.v2" must give book.v2.epub.
+    targets = {fmt: out_stem.with_name(f"{out_stem.name}.{fmt}") for fmt in formats}
+    tmps = {fmt: path.with_name(f"{path.name}.tmp") for fmt, path in targets.items()}
+
+    book = plain = None
+    done = False
+    try:
+        if "epub" in formats:
+            book = zipfile.ZipFile(tmps["epub"], "w", compression=zipfile.ZIP_DEFLATED)
+            # The mimetype entry must come first and uncompressed.
+            _zip_write(book, "mimetype", "application/epub+zip", zipfile.ZIP_STORED)
+            _zip_write(book, "META-INF/container.xml", CONTAINER)
+            _zip_write(book, "OEBPS/content.opf", package_document(lang, title, chapters, identifier))
+            _zip_write(book, "OEBPS/nav.xhtml", navigation(lang, title, chapters))
+            _zip_write(book, "OEBPS/style.css", STYLE)
+        if "txt" in formats:
+            plain = open(tmps["txt"], "wb")
+            plain.write(f"{title}\n\n\n".encode('utf-8'))
+        jobs_list = [(lang, c.heading, str(c.path), formats) for c in chapters]
+        for chapter, (xhtml, text) in zip(chapters, ordered_map(render_chapter, jobs_list, jobs)):
+            if book is not None:
+                _zip_write(book, f"OEBPS/text/{chapter.id}.xhtml", xhtml)
+            if plain is not None:
+                plain.write(text)
+        done = True
+    finally:
+        if book is not None:
+            book.close()
+        if plain is not None:
+            plain.close()
+        if not done:
+            for tmp in tmps.values():
+                try:
+                    tmp.unlink()
+                except FileNotFoundError:
+                    pass
+    for fmt, tmp in tmps.items():
+        os.replace(tmp, targets[fmt])
+    return list(targets.values())
+
+
+def main():
+    import translate_with_codex as tw
+
+    args = sys.argv[1:]
+    start = tw.pop_option(args, "--from")
+    end = tw.pop_option(args, "--to")
+    fmt = tw.pop_option(args, "--format", "epub")
+    out = tw.pop_option(args, "--out")
+    jobs = int(tw.pop_option(args, "--jobs", str(os.cpu_count() or 1)))
+    if len(args) != 1 or args[0] not in LANGUAGE_DIRS or fmt not in FORMATS + ("all",):
+        print("Uzycie:")
+        print(
+            f"  python3 tools/export_book.py <{'|'.join(LANGUAGE_DIRS)}> [--from N] [--to N] "
+            f"[--format {'|'.join(FORMATS)}|all] [--out SCIEZKA] [--jobs N]"
+        )
+        sys.exit(1)
+    lang = args[0]
+    formats = FORMATS if fmt == "all" else (fmt,)
+
+    chapters, missing = load_chapters(lang, int(start) if start else None, int(end) if end else None)
+    if missing:
+        print(f"Uwaga: brak {len(missing)} plikow z manifestu, np. {missing[0]}")
+    if not chapters:
+        print("Brak rozdzialow w podanym zakresie.")
+        sys.exit(1)
+    if out and Path(out).suffix in tuple(f".{fmt}" for fmt in FORMATS):
+        out = out[:-len(Path(out).suffix)]
+    stem = Path(out) if out else EXPORT_DIR / f"infinity-mage-{lang}-{chapters[0].num}-{chapters[-1].num}"
+
+    began = time.perf_counter()
+    written = export(lang, chapters, stem, formats, jobs)
+    elapsed = time.perf_counter() - began
+    for path in written:
+        print(f"Zapisano {path} ({path.stat().st_size / 1e6:.1f} MB)")
+    print(f"{len(chapters)} rozdzialow w {elapsed:.2f}s (watki: {jobs})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+import re
+import sys
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+HANGUL_RE = re.compile(r"[가-힣]+")
+WORD_RE = re.compile(r"\w+")
+QUALIFIER_RE = re.compile(r"\s*\(([^)]*)\)\s*")
+
+
+def entry_terms(alias: str, canonical: str) -> List[str]:
+    # "Cheonpok (천폭) -> Cheonpok" yields Cheonpok and 천폭; qualifiers such
+    # as "(spell)" are dropped.
+    terms = []
+    for qualifier in QUALIFIER_RE.findall(alias):
+        terms.extend(HANGUL_RE.findall(qualifier))
+    for term in (QUALIFIER_RE.sub(" ", alias).strip(), canonical.strip()):
+        if term and term not in terms:
+            terms.append(term)
+    return terms
+
+
+class TermIndex:
+    def __init__(self, glossary_text: str, genders: Optional[dict] = None):
+        self.lines = glossary_text.splitlines()
+        self.entry_terms: Dict[int, List[str]] = {}
+        for idx, raw_line in enumerate(self.lines):
+            line = raw_line.strip()
+            if not line.startswith("- ") or "->" not in line:
+                continue
+            left, right = line[2:].split("->", 1)
+            terms = entry_terms(left.strip(), right.strip())
+            if terms:
+                self.entry_terms[idx] = terms
+        self.genders = dict(genders or {})
+
+        self.latin_terms: Dict[str, Set[object]] = {}
+        self.hangul_terms: Dict[str, Set[object]] = {}
+        for idx, terms in self.entry_terms.items():
+            for term in terms:
+                self._add_term(term, idx)
+        for name in self.genders:
+            self._add_term(name, ("gender", name))
+
+        # Terms are looked up through their first word; multi-word or
+        # punctuated terms are then confirmed with their own pattern.
+        self.by_first_word: Dict[str, List[Tuple[str, object]]] = {}
+        for term in self.latin_terms:
+            words = WORD_RE.findall(term)
+            if not words:
+                continue
+            confirm = None
+            if words != [term]:
+                confirm = re.compile(rf"(?<!\w){re.escape(term)}(?!\w)", re.IGNORECASE)
+            self.by_first_word.setdefault(words[0], []).append((term, confirm))
+
+    def _add_term(self, term: str, key) -> None:
+        if HANGUL_RE.search(term):
+            self.hangul_terms.setdefault(term, set()).add(key)
+        else:
+            self.latin_terms.setdefault(term.lower(), set()).add(key)
+
+    def match(self, texts: Iterable[str]) -> Set[object]:
+        found: Set[object] = set()
+        for text in texts:
+            if not text:
+                continue
+            words = set(WORD_RE.findall(text.lower()))
+            for word in words.intersection(self.by_first_word):
+                for term, confirm in self.by_first_word[word]:
+                    if confirm is None or confirm.search(text):
+                        found.update(self.latin_terms[term])
+            for term, keys in self.hangul_terms.items():
+                if term in text:
+                    found.update(keys)
+        return found
+
+    def glossary_subset(self, found: Set[object]) -> str:
+        keep = [idx not in self.entry_terms or idx in found for idx in range(len(self.lines))]
+        # Drop "**Section**" headers whose entries were all filtered out.
+        header = None
+        has_entries = kept_content = False
+        for idx, line in enumerate(self.lines + ["**"]):
+            stripped = line.strip()
+            if stripped.startswith("**") and stripped.endswith("**"):
+                if header is not None and has_entries and not kept_content:
+                    keep[header] = False
+                header = idx
+                has_entries = kept_content = False
+            elif idx in self.entry_terms:
+                has_entries = True
+                kept_content = kept_content or keep[idx]
+            elif stripped:
+                kept_content = True
+
+        out: List[str] = []
+        for idx, line in enumerate(self.lines):
+            if not keep[idx]:
+                continue
+            if line.strip() == "" and (not out or out[-1].strip() == ""):
+                continue
+            out.append(line)
+        while out and out[-1].strip() == "":
+            out.pop()
+        return "\n".join(out)
+
+    def gender_subset(self, found: Set[object]) -> dict:
+        return {name: gender for name, gender in self.genders.items() if ("gender", name) in found}
+
+    def select(self, *texts: str) -> Tuple[str, dict]:
+        found = self.match(texts)
+        return self.glossary_subset(found), self.gender_subset(found)
+
+
+def main():
+    import translate_with_codex as tw
+    from chapter_index import get_index
+
+    args = sys.argv[1:]
+    if len(args) not in (0, 2):
+        print("Uzycie:")
+        print("  python3 tools/glossary_index.py [<start> <end>]")
+        sys.exit(1)
+    glossary = tw.load_text(tw.GLOSSARY) if tw.GLOSSARY.exists() else ""
+    guidelines = tw.load_text(tw.GUIDELINES) if tw.GUIDELINES.exists() else ""
+    index = get_index(tw.SRC_LANG)
+    nums = index.nums()
+    if args:
+        start, end = int(args[0]), int(args[1])
+        nums = [num for num in nums if start <= num <= end]
+
+    full_bytes = subset_bytes = full_tokens = subset_tokens = source_bytes = 0
+    fallbacks = 0
+    for num in nums:
+        src = index.find(num)
+        src_title = re.sub(r"^Chapter - \d+ -\s*", "", src.stem)
+        src_text = tw.load_text(src)
+        full = tw.build_prompt(num, src_title, src_text, glossary, guidelines)
+        context = tw.build_prompt_context(num, src_text, glossary)
+        if context is None:
+            fallbacks += 1
+            subset = full
+        else:
+            subset = tw.build_prompt(num, src_title, src_text, context[0], guidelines, context[1])
+        source_bytes += len(src_text.encode('utf-8'))
+        full_bytes += len(full.encode('utf-8'))
+        subset_bytes += len(subset.encode('utf-8'))
+        full_tokens += tw.estimate_tokens(full)
+        subset_tokens += tw.estimate_tokens(subset)
+
+    if not nums:
+        print("Brak rozdzialow w zakresie.")
+        return
+    saved_bytes = full_bytes - subset_bytes
+    saved_tokens = full_tokens - subset_tokens
+    print(f"Rozdzialy: {len(nums)} (bez odpowiednika EN, pelny glosariusz: {fallbacks})")
+    print(f"Prompt pelny:   {full_bytes / 1e6:.2f} MB, ~{full_tokens} tokenow")
+    print(f"Prompt wycinek: {subset_bytes / 1e6:.2f} MB, ~{subset_tokens} tokenow")
+    print(
+        f"Oszczednosc:    {saved_bytes / 1e6:.2f} MB ({saved_bytes / full_bytes:.1%}), "
+        f"~{saved_tokens} tokenow (~{saved_tokens // len(nums)} na rozdzial, "
+        "bez liczenia promptow naprawczych)"
+    )
+    full_overhead = full_bytes - source_bytes
+    subset_overhead = subset_bytes - source_bytes
+    print(
+        f"Narzut poza tekstem zrodla: {full_overhead // len(nums)} -> {subset_overhead // len(nums)} B "
+        f"na rozdzial ({1 - subset_overhead / full_overhead:.1%} mniej)"
+    )
+
+
+if __name__ == '__main__':
+    main()
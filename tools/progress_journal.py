@@ -0,0 +1,181 @@
+import json
+import os
+import stat
+import sys
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+if sys.platform == "win32":
+    import msvcrt
+else:
+    import fcntl
+
+# Entries are appended to the journal and folded into the reader manifest
+# (chapters_pl.json) by compact(). The manifest is always replaced atomically,
+# so the reader never sees a half-written file.
+COMPACT_EVERY = 25
+# mkstemp creates files as 0600; new files get the mode open() would give
+# them. Read once at import: os.umask() can only be read by setting it.
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+@contextmanager
+def file_lock(lock_path: Path):
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, "a+b") as fh:
+        if sys.platform == "win32":
+            fh.seek(0)
+            msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if sys.platform == "win32":
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+
+def write_json_atomic(path: Path, data, indent: Optional[int] = 2) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(prefix=path.name + ".", suffix=".tmp", dir=str(path.parent))
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            # Compact output (indent=None) goes through the C encoder only in
+            # json.dumps; json.dump streams it through the pure-Python one.
+            fh.write(json.dumps(data, ensure_ascii=False, indent=indent))
+            fh.flush()
+            os.fsync(fh.fileno())
+        # Keep a replaced file's mode, so the reader can still serve it.
+        try:
+            mode = stat.S_IMODE(os.stat(path).st_mode)
+        except FileNotFoundError:
+            mode = 0o666 & ~_UMASK
+        os.chmod(tmp_name, mode)
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.remove(tmp_name)
+        except OSError:
+            pass
+        raise
+
+
+def _stat_key(path: Path):
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class ProgressJournal:
+    def __init__(self, manifest: Path, journal: Optional[Path] = None, lock: Optional[Path] = None):
+        self.manifest = manifest
+        self.journal = journal or manifest.with_suffix(".journal.jsonl")
+        self.lock = lock or manifest.with_suffix(".lock")
+        self._manifest_key = None
+        self._manifest_entries: List[dict] = []
+        self._journal_offset = 0
+        self._journal_entries: Dict[int, dict] = {}
+        self._appended = 0
+
+    def _read_manifest(self) -> None:
+        key = _stat_key(self.manifest)
+        if key == self._manifest_key:
+            return
+        entries: List[dict] = []
+        if key is not None:
+            try:
+                data = json.loads(self.manifest.read_text(encoding="utf-8"))
+                if isinstance(data, list):
+                    entries = [d for d in data if isinstance(d, dict)]
+            except Exception:
+                entries = []
+        self._manifest_key = key
+        self._manifest_entries = entries
+        # A new manifest means the journal was compacted and truncated.
+        self._journal_offset = 0
+        self._journal_entries = {}
+
+    def _read_journal(self) -> None:
+        size = _stat_key(self.journal)
+        if size is None:
+            self._journal_offset = 0
+            self._journal_entries = {}
+            return
+        if size[1] < self._journal_offset:
+            self._journal_offset = 0
+            self._journal_entries = {}
+        if size[1] == self._journal_offset:
+            return
+        with open(self.journal, "rb") as fh:
+            fh.seek(self._journal_offset)
+            chunk = fh.read()
+        # Only consume complete lines; a torn last line from a killed writer
+        # is left for the next read (or dropped by compaction).
+        end = chunk.rfind(b"\n") + 1
+        for raw in chunk[:end].splitlines():
+            try:
+                entry = json.loads(raw.decode("utf-8"))
+            except (ValueError, UnicodeDecodeError):
+                continue
+            if isinstance(entry, dict) and isinstance(entry.get("num"), int):
+                self._journal_entries[entry["num"]] = entry
+        self._journal_offset += end
+
+    def refresh(self) -> None:
+        self._read_manifest()
+        self._read_journal()
+
+    def entries(self) -> List[dict]:
+        self.refresh()
+        if not self._journal_entries:
+            return list(self._manifest_entries)
+        merged = {
+            d.get("num"): d for d in self._manifest_entries if isinstance(d.get("num"), int)
+        }
+        merged.update(self._journal_entries)
+        extra = [d for d in self._manifest_entries if not isinstance(d.get("num"), int)]
+        return [merged[num] for num in sorted(merged)] + extra
+
+    def last_num(self) -> Optional[int]:
+        self.refresh()
+        nums = [d.get("num") for d in self._manifest_entries if isinstance(d.get("num"), int)]
+        nums.extend(self._journal_entries)
+        return max(nums) if nums else None
+
+    def append(self, entry: dict) -> None:
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        data = line.encode("utf-8")
+        with file_lock(self.lock):
+            with open(self.journal, "a+b") as fh:
+                # A writer killed mid-line leaves a torn tail; end it first, or
+                # this entry would be glued onto it and skipped by every read.
+                if fh.seek(0, os.SEEK_END):
+                    fh.seek(-1, os.SEEK_END)
+                    if fh.read(1) != b"\n":
+                        data = b"\n" + data
+                fh.write(data)
+                fh.flush()
+                os.fsync(fh.fileno())
+        self._appended += 1
+        if self._appended >= COMPACT_EVERY:
+            self.compact()
+
+    def compact(self) -> None:
+        with file_lock(self.lock):
+            self.refresh()
+            if self._journal_entries or not self.manifest.exists():
+                data = self.entries()
+                data.sort(key=lambda x: x["num"] if isinstance(x.get("num"), int) else sys.maxsize)
+                write_json_atomic(self.manifest, data)
+            if self.journal.exists():
+                os.remove(self.journal)
+            self._manifest_key = None
+            self._appended = 0
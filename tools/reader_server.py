@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+import gzip
+import hashlib
+import re
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional
+
+from chapter_index import BASE, CHAPTER_RE, LANGUAGE_DIRS, READER_DIR
+
+# Scraped originals never change under the same name; translations (pl/) are
+# rewritten by --repair-existing, so they are revalidated instead.
+IMMUTABLE_LANGS = ("en", "ko")
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "no-cache"
+
+COMPRESSIBLE = (".txt", ".json", ".js", ".css", ".html", ".svg", ".map")
+CONTENT_TYPES = {
+    ".txt": "text/plain; charset=utf-8",
+    ".json": "application/json; charset=utf-8",
+    ".js": "text/javascript; charset=utf-8",
+    ".css": "text/css; charset=utf-8",
+    ".html": "text/html; charset=utf-8",
+    ".bin": "application/octet-stream",
+}
+MIN_GZIP_BYTES = 256
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class StaticFile:
+    def __init__(self, path: Path, key: tuple, data: bytes):
+        self.key = key
+        self.data = data
+        digest = hashlib.sha256(data).hexdigest()[:32]
+        self.etag = f'"{digest}"'
+        self.gzip = None
+        self.gzip_etag = f'"{digest}-gz"'
+        if path.suffix.lower() in COMPRESSIBLE and len(data) >= MIN_GZIP_BYTES:
+            packed = gzip.compress(data, compresslevel=9, mtime=0)
+            if len(packed) < len(data):
+                self.gzip = packed
+
+    @property
+    def size(self) -> int:
+        return len(self.data) + (len(self.gzip) if self.gzip else 0)
+
+
+def _stat_key(path: Path):
+    st = path.stat()
+    return st.st_mtime_ns, st.st_size, st.st_ino
+
+
+# Raw bytes, gzip variant and ETag per file, rebuilt when the file's
+# mtime/size/inode changes; least recently used files go first when the
+# cache outgrows max_bytes.
+class FileCache:
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._files: "OrderedDict[Path, StaticFile]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, path: Path) -> StaticFile:
+        key = _stat_key(path)
+        with self._lock:
+            entry = self._files.get(path)
+            if entry is not None and entry.key == key:
+                self._files.move_to_end(path)
+                return entry
+        entry = StaticFile(path, key, path.read_bytes())
+        with self._lock:
+            old = self._files.pop(path, None)
+            if old is not None:
+                self._bytes -= old.size
+            self._files[path] = entry
+            self._bytes += entry.size
+            while self._bytes > self.max_bytes and len(self._files) > 1:
+                _, dropped = self._files.popitem(last=False)
+                self._bytes -= dropped.size
+        return entry
+
+
+def cache_control(path: Path) -> str:
+    if CHAPTER_RE.match(path.name):
+        for lang in IMMUTABLE_LANGS:
+            if path.parent == LANGUAGE_DIRS[lang]:
+                return IMMUTABLE_CACHE
+    return REVALIDATE_CACHE
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate == etag:
+            return True
+    return False
+
+
+def parse_range(header: Optional[str], size: int):
+    # (first, last) inclusive for a single "bytes=" range, False when it
+    # cannot be satisfied, None to ignore it and send the whole file
+    # (missing, malformed or multi-range headers).
+    if not header:
+        return None
+    m = RANGE_RE.match(header.strip())
+    if not m or (not m.group(1) and not m.group(2)):
+        return None
+    if m.group(1):
+        first = int(m.group(1))
+        last = min(int(m.group(2)), size - 1) if m.group(2) else size - 1
+        if m.group(2) and int(m.group(2)) < first:
+            return None
+    else:
+        suffix = int(m.group(2))
+        if suffix == 0:
+            return False
+        first, last = max(0, size - suffix), size - 1
+    if first >= size:
+        return False
+    return first, last
+
+
+class ReaderRequestHandler(SimpleHTTPRequestHandler):
+    # Keep-alive: every response, including the base class' errors and
+    # redirects, carries a Content-Length.
+    protocol_version = "HTTP/1.1"
+    cache: FileCache = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, directory=str(BASE), **kwargs)
+
+    def _resolve(self) -> Optional[Path]:
+        path = Path(self.translate_path(self.path))
+        if path.is_dir():
+            if not self.path.split("?", 1)[0].endswith("/"):
+                return None
+            path = path / "index.html"
+        return path if path.is_file() else None
+
+    def do_GET(self):
+        self._serve(head=False)
+
+    def do_HEAD(self):
+        self._serve(head=True)
+
+    def _serve(self, head: bool):
+        path = self._resolve()
+        if path is None:
+            # Redirects for directories without "/", listings and 404s.
+            if head:
+                super().do_HEAD()
+            else:
+                super().do_GET()
+            return
+        try:
+            entry = self.cache.get(path)
+        except OSError:
+            self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return
+
+        byte_range = parse_range(self.headers.get("Range"), len(entry.data))
+        if_range = self.headers.get("If-Range")
+        if byte_range is not None and (not if_range or if_range.strip() == entry.etag):
+            self._send_range(path, entry, byte_range, head)
+            return
+
+        accepts_gzip = "gzip" in self.headers.get("Accept-Encoding", "")
+        use_gzip = entry.gzip is not None and accepts_gzip
+        etag = entry.gzip_etag if use_gzip else entry.etag
+        if etag_matches(self.headers.get("If-None-Match"), etag):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self._common_headers(path, etag, entry)
+            self.end_headers()
+            return
+
+        body = entry.gzip if use_gzip else entry.data
+        self.send_response(HTTPStatus.OK)
+        self._common_headers(path, etag, entry)
+        self.send_header("Content-Type", CONTENT_TYPES.get(path.suffix.lower()) or self.guess_type(str(path)))
+        if use_gzip:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+    def _send_range(self, path: Path, entry: StaticFile, byte_range, head: bool):
+        # Ranges are always served from the identity encoding.
+        size = len(entry.data)
+        if byte_range is False:
+            self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+            self.send_header("Content-Range", f"bytes */{size}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        first, last = byte_range
+        self.send_response(HTTPStatus.PARTIAL_CONTENT)
+        self._common_headers(path, entry.etag, entry)
+        self.send_header("Content-Type", CONTENT_TYPES.get(path.suffix.lower()) or self.guess_type(str(path)))
+        self.send_header("Content-Range", f"bytes {first}-{last}/{size}")
+        self.send_header("Content-Length", str(last - first + 1))
+        self.end_headers()
+        if not head:
+            self.wfile.write(memoryview(entry.data)[first:last + 1])
+
+    def _common_headers(self, path: Path, etag: str, entry: StaticFile):
+        self.send_header("ETag", etag)
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Cache-Control", cache_control(path))
+        if entry.gzip is not None:
+            self.send_header("Vary", "Accept-Encoding")
+
+
+def warm_paths():
+    yield from sorted(READER_DIR.glob("*.*"))
+    yield from sorted(p for p in (READER_DIR / "bundle").glob("*.*") if not p.name.startswith("."))
+    for directory in LANGUAGE_DIRS.values():
+        if directory.is_dir():
+            yield from sorted(p for p in directory.iterdir() if CHAPTER_RE.match(p.name))
+
+
+def warm(cache: FileCache, jobs: int = 4) -> int:
+    # Builds the gzip variants up front so first requests do not pay for them.
+    count = 0
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        for _ in pool.map(cache.get, warm_paths()):
+            count += 1
+    return count
+
+
+def serve(bind: str = "127.0.0.1", port: int = 8000, warm_cache: bool = True) -> None:
+    cache = FileCache()
+    handler = type("Handler", (ReaderRequestHandler,), {"cache": cache})
+    server = ThreadingHTTPServer((bind, port), handler)
+    server.daemon_threads = True
+    if warm_cache:
+        def run_warm():
+            print(f"Przygotowano {warm(cache)} plikow (gzip, ETag).")
+        threading.Thread(target=run_warm, daemon=True).start()
+    print(f"Czytnik: http://{'localhost' if bind in ('', '0.0.0.0', '127.0.0.1') else bind}:{port}/reader/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    args = sys.argv[1:]
+    if not args or args[0] != "serve":
+        print("Uzycie:")
+        print("  python3 tools/reader_server.py serve [--port 8000] [--bind 127.0.0.1] [--no-warm]")
+        sys.exit(1)
+    args = args[1:]
+    warm_cache = "--no-warm" not in args
+    if not warm_cache:
+        args.remove("--no-warm")
+    port = 8000
+    bind = "127.0.0.1"
+    while args:
+        name = args.pop(0)
+        if name in ("--port", "--bind") and args:
+            value = args.pop(0)
+            if name == "--port":
+                port = int(value)
+            else:
+                bind = value
+        else:
+            print(f"Nieznana opcja: {name}")
+            sys.exit(1)
+    serve(bind, port, warm_cache)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+import json
+import re
+import sys
+from pathlib import Path
+from typing import Dict
+
+from chapter_index import CHAPTER_RE, LANGUAGE_DIRS, READER_DIR
+from progress_journal import write_json_atomic
+
+# Pre-rendered chapter fragments for the reader: reader/html/<lang>/<file>.html
+# holds exactly what formatText() in reader.js would produce for <file>.txt.
+HTML_DIR = READER_DIR / 'html'
+BUILD_FILE = '.build.json'
+# Bump when the markup below changes so every fragment is rebuilt.
+RENDER_VERSION = 1
+
+QUOTE_RE = re.compile(r"“[^”]+”|\"[^\"]+\"")
+# Characters String.prototype.trim() removes (Python's strip() set differs).
+JS_WHITESPACE = (
+    " \t\n\v\f\r\u00a0\u1680\u2000\u2001\u2002\u2003\u2004\u2005\u2006"
+    "\u2007\u2008\u2009\u200a\u2028\u2029\u202f\u205f\u3000\ufeff"
+)
+
+
+def escape_html(text: str) -> str:
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def format_line(line: str) -> str:
+    out = []
+    last = 0
+    for match in QUOTE_RE.finditer(line):
+        out.append(escape_html(line[last:match.start()]))
+        quote = match.group(0)
+        out.append(f'{quote[0]}<strong class="quote">{escape_html(quote[1:-1])}</strong>{quote[-1]}')
+        last = match.end()
+    out.append(escape_html(line[last:]))
+    return "".join(out)
+
+
+def format_text(raw: str) -> str:
+    # Same as formatText(text.trim()) in reader.js.
+    return "<br>".join(format_line(line) for line in raw.strip(JS_WHITESPACE).split("\n"))
+
+
+def decode_chapter(data: bytes) -> str:
+    # fetch().text() drops a UTF-8 BOM and replaces invalid bytes.
+    return data.decode("utf-8-sig", errors="replace")
+
+
+def fragment_path(lang: str, file_name: str) -> Path:
+    return HTML_DIR / lang / (Path(file_name).stem + ".html")
+
+
+def render_file(lang: str, path: Path) -> Path:
+    target = fragment_path(lang, path.name)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    target.write_text(format_text(decode_chapter(path.read_bytes())), encoding="utf-8")
+    return target
+
+
+def refresh_fragment(lang: str, path: Path) -> None:
+    # Called after a chapter is rewritten; only when fragments are in use and
+    # the file is the language's real chapter (not a benchmark's temp copy).
+    if path.parent == LANGUAGE_DIRS[lang] and (HTML_DIR / lang).is_dir():
+        render_file(lang, path)
+
+
+def build_language(lang: str, force: bool = False) -> Dict[str, int]:
+    directory = LANGUAGE_DIRS[lang]
+    out_dir = HTML_DIR / lang
+    build_path = out_dir / BUILD_FILE
+    try:
+        previous = json.loads(build_path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        previous = {}
+    if previous.get("version") != RENDER_VERSION:
+        previous = {}
+    seen: Dict[str, list] = previous.get("files", {}) if not force else {}
+
+    files: Dict[str, list] = {}
+    stats = {"rendered": 0, "unchanged": 0, "removed": 0}
+    sources = sorted(p for p in directory.iterdir() if CHAPTER_RE.match(p.name)) if directory.is_dir() else []
+    for path in sources:
+        st = path.stat()
+        key = [st.st_mtime_ns, st.st_size]
+        if seen.get(path.name) == key and fragment_path(lang, path.name).exists():
+            files[path.name] = key
+            stats["unchanged"] += 1
+            continue
+        render_file(lang, path)
+        files[path.name] = key
+        stats["rendered"] += 1
+
+    for name in set(seen) - set(files):
+        try:
+            fragment_path(lang, name).unlink()
+            stats["removed"] += 1
+        except FileNotFoundError:
+            pass
+    if files or seen:
+        write_json_atomic(build_path, {"version": RENDER_VERSION, "files": files})
+    return stats
+
+
+def main():
+    args = sys.argv[1:]
+    force = "--force" in args
+    if force:
+        args.remove("--force")
+    unknown = [lang for lang in args if lang not in LANGUAGE_DIRS]
+    if unknown:
+        print("Uzycie:")
+        print(f"  python3 tools/render_chapters.py [{'|'.join(LANGUAGE_DIRS)} ...] [--force]")
+        sys.exit(1)
+    for lang in args or list(LANGUAGE_DIRS):
+        stats = build_language(lang, force)
+        print(
+            f"{lang}: wyrenderowano {stats['rendered']}, bez zmian {stats['unchanged']}, "
+            f"usunieto {stats['removed']} -> {HTML_DIR / lang}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+import hashlib
+import json
+from pathlib import Path
+from typing import Dict
+
+from progress_journal import write_json_atomic
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+# Remembers, per chapter, the hashes of the source and of the translation as
+# left by the last --repair-existing run, together with the version of the
+# rules (glossary, maps, validation) that produced it. A chapter whose three
+# values still match would come out of the repair pass unchanged.
+class RepairManifest:
+    def __init__(self, path: Path):
+        self.path = path
+        self.entries: Dict[str, dict] = {}
+        self.dirty = False
+        try:
+            data = json.loads(path.read_text(encoding='utf-8'))
+        except (FileNotFoundError, ValueError):
+            data = {}
+        if isinstance(data, dict) and isinstance(data.get("chapters"), dict):
+            self.entries = data["chapters"]
+
+    def is_current(self, num: int, src_hash: str, text_hash: str, rules: str) -> bool:
+        entry = self.entries.get(str(num))
+        return entry == {"src": src_hash, "text": text_hash, "rules": rules}
+
+    def record(self, num: int, src_hash: str, text_hash: str, rules: str) -> None:
+        entry = {"src": src_hash, "text": text_hash, "rules": rules}
+        if self.entries.get(str(num)) != entry:
+            self.entries[str(num)] = entry
+            self.dirty = True
+
+    def forget(self, num: int) -> None:
+        if self.entries.pop(str(num), None) is not None:
+            self.dirty = True
+
+    def save(self) -> None:
+        if not self.dirty:
+            return
+        ordered = {key: self.entries[key] for key in sorted(self.entries, key=int)}
+        write_json_atomic(self.path, {"chapters": ordered})
+        self.dirty = False
@@ -0,0 +1,115 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Optional
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def cache_key(prompt: str, settings: dict) -> str:
+    payload = json.dumps({"settings": settings, "prompt": prompt}, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+# Backend answers stored under the hash of the exact prompt and settings.
+# Entries are plain text files; a hit bumps the file mtime, and once the cache
+# grows past max_bytes the least recently used files are removed.
+class ResponseCache:
+    def __init__(self, directory: Path, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.enabled = True
+        self.refresh = False
+        self.hits = 0
+        self.misses = 0
+        self._size = None
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.txt"
+
+    def get(self, prompt: str, settings: dict) -> Optional[str]:
+        if not self.enabled or self.refresh:
+            return None
+        path = self._path(cache_key(prompt, settings))
+        try:
+            text = path.read_text(encoding='utf-8')
+        except (FileNotFoundError, UnicodeDecodeError):
+            with self._lock:
+                self.misses += 1
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return text
+
+    def put(self, prompt: str, settings: dict, output: str) -> None:
+        if not self.enabled or not output:
+            return
+        path = self._path(cache_key(prompt, settings))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = output.encode('utf-8')
+        fd, tmp_name = tempfile.mkstemp(prefix=path.name + ".", suffix=".tmp", dir=str(path.parent))
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(data)
+            try:
+                old_size = path.stat().st_size
+            except FileNotFoundError:
+                old_size = 0
+            os.replace(tmp_name, path)
+        except BaseException:
+            try:
+                os.remove(tmp_name)
+            except OSError:
+                pass
+            raise
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += len(data) - old_size
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _files(self):
+        if not self.directory.exists():
+            return []
+        return list(self.directory.glob("??/*.txt"))
+
+    def _scan_size(self) -> int:
+        total = 0
+        for path in self._files():
+            try:
+                total += path.stat().st_size
+            except FileNotFoundError:
+                pass
+        return total
+
+    def _evict(self) -> None:
+        entries = []
+        for path in self._files():
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime_ns, st.st_size, path))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        # Evict down to 90% so a full cache does not rescan on every put.
+        target = self.max_bytes * 9 // 10
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+        self._size = total
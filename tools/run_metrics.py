@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+import json
+import math
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from backends import ABORTED_PREFIX
+
+# One JSON object per translated (or abandoned) chapter:
+#   {"run", "num", "status", "started", "total_s",
+#    "attempts": [{"stage", "prompt_bytes", "prompt_tokens", "seconds", "cached", "output_bytes", "error"?}],
+#    "repairs": [{"attempt", "kind", "categories"}],
+#    "timings": {"postprocess": s, "validate": s, "write": s}, ...}
+# Records are built up while the chapter is in flight and appended when it is
+# committed or dropped.
+
+
+class MetricsLog:
+    def __init__(self, path: Optional[Path]):
+        self.path = path
+        self.run = time.strftime("%Y%m%dT%H%M%S") + f"-{os.getpid()}"
+        self._records: Dict[int, dict] = {}
+        self._lock = threading.Lock()
+
+    def _record(self, num: int) -> dict:
+        record = self._records.get(num)
+        if record is None:
+            record = {
+                "run": self.run,
+                "num": num,
+                "started": time.time(),
+                "attempts": [],
+                "repairs": [],
+                "timings": {},
+            }
+            self._records[num] = record
+        return record
+
+    def start(self, num: int) -> None:
+        # A chapter that falls back from a batch keeps its batch record.
+        with self._lock:
+            self._record(num)
+
+    def attempt(self, num: int, stage: str, prompt_bytes: int, prompt_tokens: int,
+                seconds: float, cached: bool, output_bytes: int, error: Optional[str] = None) -> None:
+        entry = {
+            "stage": stage,
+            "prompt_bytes": prompt_bytes,
+            "prompt_tokens": prompt_tokens,
+            "seconds": round(seconds, 4),
+            "cached": cached,
+            "output_bytes": output_bytes,
+        }
+        if error is not None:
+            entry["error"] = error[:200]
+        with self._lock:
+            self._record(num)["attempts"].append(entry)
+
+    def repair(self, num: int, attempt: int, kind: str, categories: List[str],
+               measures: Optional[dict] = None) -> None:
+        entry = {"attempt": attempt, "kind": kind, "categories": categories}
+        if measures is not None:
+            # What the ratio checks saw; validation_thresholds.py replays these.
+            entry["measures"] = {name: round(value, 4) for name, value in measures.items()}
+        with self._lock:
+            self._record(num)["repairs"].append(entry)
+
+    def update(self, num: int, **fields) -> None:
+        with self._lock:
+            self._record(num).update(fields)
+
+    @contextmanager
+    def timer(self, num: int, name: str):
+        began = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - began
+            with self._lock:
+                timings = self._record(num)["timings"]
+                timings[name] = round(timings.get(name, 0.0) + elapsed, 4)
+
+    def finish(self, num: int, status: str) -> None:
+        with self._lock:
+            record = self._record(num)
+            del self._records[num]
+        record["status"] = status
+        record["total_s"] = round(time.time() - record["started"], 4)
+        if self.path is None:
+            return
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as fh:
+                fh.write(line)
+
+
+def load_records(path: Path) -> List[dict]:
+    records = []
+    try:
+        with open(path, encoding="utf-8") as fh:
+            for raw in fh:
+                try:
+                    record = json.loads(raw)
+                except ValueError:
+                    continue
+                if isinstance(record, dict) and isinstance(record.get("num"), int):
+                    records.append(record)
+    except FileNotFoundError:
+        pass
+    return records
+
+
+def percentile(values: List[float], share: float) -> float:
+    # Nearest-rank percentile; values must be sorted.
+    if not values:
+        return 0.0
+    rank = max(1, math.ceil(share * len(values)))
+    return values[rank - 1]
+
+
+def distribution(label: str, values: List[float], unit: str, digits: int = 2) -> str:
+    values = sorted(values)
+    if not values:
+        return f"{label:<30} brak danych"
+    parts = [f"p{int(share * 100)} {percentile(values, share):.{digits}f}" for share in (0.5, 0.9, 0.99)]
+    return f"{label:<30} " + ", ".join(parts) + f", max {values[-1]:.{digits}f} {unit} (n={len(values)})"
+
+
+def summarize(records: List[dict], slowest: int = 10) -> None:
+    runs = sorted({record.get("run") for record in records})
+    ok = [record for record in records if record.get("status") == "ok"]
+    print(f"Przebiegi: {len(runs)}, rozdzialy: {len(records)} (zapisane {len(ok)}, odrzucone {len(records) - len(ok)})")
+
+    attempts = [attempt for record in records for attempt in record.get("attempts", [])]
+    live = [attempt for attempt in attempts if not attempt.get("cached")]
+    translate_tokens = []
+    total_tokens = []
+    for record in records:
+        if not record.get("attempts"):
+            continue
+        # Segmented chapters send one translation prompt per fragment.
+        translate_tokens.append(sum(
+            a.get("prompt_tokens", 0) for a in record["attempts"]
+            if a.get("stage", "").startswith(("tlumaczenie", "fragment"))
+        ))
+        total_tokens.append(sum(a.get("prompt_tokens", 0) for a in record["attempts"]))
+    print(distribution("czas rozdzialu", [r.get("total_s", 0.0) for r in records], "s"))
+    print(distribution("czas backendu / zapytanie", [a.get("seconds", 0.0) for a in live], "s"))
+    print(distribution("tokeny tlumaczenia / rozdzial", translate_tokens, "tok", 0))
+    print(distribution("tokeny wszystkich zapytan", total_tokens, "tok", 0))
+    print(distribution("bajty promptu / zapytanie", [a.get("prompt_bytes", 0) for a in attempts], "B", 0))
+    for name in ("postprocess", "validate", "write"):
+        values = [r["timings"][name] for r in records if name in r.get("timings", {})]
+        print(distribution(f"czas {name}", values, "s", 4))
+    if attempts:
+        cached = len(attempts) - len(live)
+        errors = sum(1 for attempt in attempts if "error" in attempt)
+        aborted = sum(1 for attempt in attempts if attempt.get("error", "").startswith(ABORTED_PREFIX))
+        print(
+            f"Zapytania: {len(attempts)} ({len(attempts) / len(records):.2f} na rozdzial), "
+            f"z cache: {cached} ({cached / len(attempts):.1%}), bledy backendu: {errors} "
+            f"(przerwane przez straznika strumienia: {aborted})"
+        )
+
+    repaired = [record for record in records if record.get("repairs")]
+    if records:
+        print(f"Rozdzialy z naprawa: {len(repaired)} ({len(repaired) / len(records):.1%})")
+    kinds: Dict[str, int] = {}
+    categories: Dict[str, int] = {}
+    for record in repaired:
+        for repair in record["repairs"]:
+            kinds[repair.get("kind", "?")] = kinds.get(repair.get("kind", "?"), 0) + 1
+            for category in repair.get("categories", []):
+                categories[category] = categories.get(category, 0) + 1
+    if kinds:
+        print("  rodzaje napraw: " + ", ".join(f"{kind} {count}" for kind, count in sorted(kinds.items())))
+    if categories:
+        ordered = sorted(categories.items(), key=lambda item: (-item[1], item[0]))
+        print("  przyczyny: " + ", ".join(f"{category} {count}" for category, count in ordered))
+
+    print(f"Najwolniejsze rozdzialy (top {slowest}):")
+    for record in sorted(records, key=lambda r: r.get("total_s", 0.0), reverse=True)[:slowest]:
+        backend = sum(a.get("seconds", 0.0) for a in record.get("attempts", []))
+        print(
+            f"  {record['num']:>5} {record.get('total_s', 0.0):8.2f} s  backend {backend:7.2f} s  "
+            f"zapytania {len(record.get('attempts', []))}  naprawy {len(record.get('repairs', []))}  "
+            f"{record.get('status', '?')}  ({record.get('run')})"
+        )
+
+
+def main():
+    import translate_with_codex as tw
+
+    args = sys.argv[1:]
+    if not args or args[0] != "summary":
+        print("Uzycie:")
+        print("  python3 tools/run_metrics.py summary [--file PATH] [--run ID|last] [--top N]")
+        sys.exit(1)
+    args = args[1:]
+    path = Path(tw.pop_option(args, "--file", str(tw.METRICS_FILE)))
+    run = tw.pop_option(args, "--run")
+    top = int(tw.pop_option(args, "--top", "10"))
+    records = load_records(path)
+    if run == "last" and records:
+        run = max(record.get("run", "") for record in records)
+    if run:
+        records = [record for record in records if record.get("run") == run]
+    if not records:
+        print(f"Brak metryk w {path}.")
+        sys.exit(1)
+    summarize(records, top)
+
+
+if __name__ == '__main__':
+    main()
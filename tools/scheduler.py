@@ -0,0 +1,143 @@
+import random
+import re
+import subprocess
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+
+from backends import BackendError, GenerationAborted
+
+RATE_LIMIT_RE = re.compile(r"rate.?limit|too many requests|\b429\b|quota", re.IGNORECASE)
+WINDOW = 60.0
+
+
+class BudgetExceeded(BackendError):
+    pass
+
+
+# Sits between the pipeline and the backend: spaces requests to stay under
+# requests/tokens per minute, retries failures with jittered exponential
+# backoff and stops the run once the token budget is spent. A rate-limit
+# error pauses every thread, not only the one that saw it. A generation the
+# stream guard aborted is retried at once: the backend itself is fine.
+class RequestScheduler:
+    def __init__(
+        self,
+        retries: int = 3,
+        base_delay: float = 2.0,
+        max_delay: float = 60.0,
+        rpm: int = 0,
+        tpm: int = 0,
+        token_budget: int = 0,
+        sleep: Callable[[float], None] = time.sleep,
+        clock: Callable[[], float] = time.monotonic,
+        seed: Optional[int] = None,
+    ):
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rpm = rpm
+        self.tpm = tpm
+        self.token_budget = token_budget
+        self.sleep = sleep
+        self.clock = clock
+        self.tokens_used = 0
+        self.requests = 0
+        self.retried = 0
+        self.aborted = 0
+        self.exhausted = False
+        self.failed_nums = set()
+        self._window = deque()
+        self._paused_until = 0.0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens: int):
+        # Returns (0, booking) once the request may go, else (seconds to wait, None).
+        with self._lock:
+            if self.token_budget and self.tokens_used + tokens > self.token_budget:
+                self.exhausted = True
+                raise BudgetExceeded(
+                    f"budzet tokenow wyczerpany ({self.tokens_used}/{self.token_budget})."
+                )
+            now = self.clock()
+            if now < self._paused_until:
+                return self._paused_until - now, None
+            while self._window and self._window[0][0] <= now - WINDOW:
+                self._window.popleft()
+            wait = 0.0
+            if self.rpm and len(self._window) >= self.rpm:
+                wait = self._window[0][0] + WINDOW - now
+            if self.tpm and self._window:
+                used = sum(entry[1] for entry in self._window)
+                # A single request larger than the cap still goes once the
+                # window is empty.
+                if used + tokens > self.tpm:
+                    freed = 0
+                    for stamp, booked in self._window:
+                        freed += booked
+                        if used - freed + tokens <= self.tpm:
+                            wait = max(wait, stamp + WINDOW - now)
+                            break
+                    else:
+                        wait = max(wait, self._window[-1][0] + WINDOW - now)
+            if wait > 0:
+                return wait, None
+            booking = [now, tokens]
+            self._window.append(booking)
+            self.tokens_used += tokens
+            self.requests += 1
+            return 0.0, booking
+
+    def _charge(self, booking: list, tokens: int) -> None:
+        # Output tokens are only known afterwards; they count towards the
+        # budget and towards the request's place in the window.
+        with self._lock:
+            self.tokens_used += tokens
+            booking[1] += tokens
+
+    def backoff(self, attempt: int) -> float:
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return delay * self._rng.uniform(0.5, 1.5)
+
+    def call(self, fn: Callable[[], str], tokens: int, count_output: Callable[[str], int],
+             report: Optional[Callable[[float, str, Optional[str]], None]] = None) -> str:
+        attempt = 0
+        while True:
+            attempt += 1
+            while True:
+                wait, booking = self._reserve(tokens)
+                if booking is not None:
+                    break
+                self.sleep(min(wait, self.max_delay))
+            began = time.perf_counter()
+            try:
+                output = fn()
+                if output.strip().startswith("ERROR:"):
+                    raise BackendError(output.strip())
+            except (BackendError, subprocess.CalledProcessError) as exc:
+                if report:
+                    report(time.perf_counter() - began, "", str(exc) or type(exc).__name__)
+                aborted = isinstance(exc, GenerationAborted)
+                if aborted:
+                    with self._lock:
+                        self.aborted += 1
+                if attempt > self.retries:
+                    raise
+                if aborted:
+                    with self._lock:
+                        self.retried += 1
+                    continue
+                delay = self.backoff(attempt)
+                if RATE_LIMIT_RE.search(str(exc)):
+                    with self._lock:
+                        self._paused_until = max(self._paused_until, self.clock() + delay)
+                with self._lock:
+                    self.retried += 1
+                self.sleep(delay)
+                continue
+            self._charge(booking, count_output(output))
+            if report:
+                report(time.perf_counter() - began, output, None)
+            return output
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+import json
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from chapter_bundle import chapter_sources, open_bundle
+from chapter_index import LANGUAGE_DIRS, READER_DIR
+from progress_journal import write_json_atomic
+
+# Inverted index with positions per language under reader/search/<lang>/:
+#   docs.json       {"version": 1, "shards": 64, "docs": [[num, file] | null, ...]}
+#   <NN>.json       {token: [doc, count, pos, pos, ..., doc, count, ...], ...}
+# Positions are token ordinals, delta-encoded per document. Tokens are
+# lowercased words, except Hangul runs, which become overlapping character
+# bigrams so a word matches regardless of attached particles; a query needs
+# at least 2 syllables to match inside a longer word. A token lives
+# in shard fnv1a(token) % SHARDS (same hash in reader.js).
+SEARCH_DIR = READER_DIR / 'search'
+INDEX_VERSION = 1
+SHARDS = 64
+BUILD_FILE = '.build.json'
+
+HANGUL = "\uac00-\ud7a3"
+TOKEN_RE = re.compile(rf"[{HANGUL}]+|(?:(?![{HANGUL}])[^\W_])+")
+
+
+class Hit(NamedTuple):
+    num: int
+    file: str
+    positions: List[int]
+
+
+def tokenize(text: str) -> Iterator[Tuple[str, int]]:
+    # (token, character offset) in position order.
+    for m in TOKEN_RE.finditer(text):
+        word = m.group(0)
+        if "\uac00" <= word[0] <= "\ud7a3":
+            if len(word) == 1:
+                yield word, m.start()
+            for i in range(len(word) - 1):
+                yield word[i:i + 2], m.start() + i
+        else:
+            yield word.lower(), m.start()
+
+
+def shard_of(token: str) -> int:
+    h = 0x811C9DC5
+    for ch in token:
+        h ^= ord(ch)
+        h = (h * 0x01000193) & 0xFFFFFFFF
+    return h % SHARDS
+
+
+def index_text(text: str) -> Dict[str, List[int]]:
+    postings: Dict[str, List[int]] = {}
+    for pos, (token, _) in enumerate(tokenize(text)):
+        postings.setdefault(token, []).append(pos)
+    return postings
+
+
+def _index_file(path: str) -> Dict[str, List[int]]:
+    return index_text(Path(path).read_text(encoding='utf-8'))
+
+
+def _decode(flat: List[int]) -> Iterator[Tuple[int, List[int]]]:
+    i = 0
+    while i < len(flat):
+        doc, count = flat[i], flat[i + 1]
+        positions = []
+        pos = 0
+        for delta in flat[i + 2:i + 2 + count]:
+            pos += delta
+            positions.append(pos)
+        yield doc, positions
+        i += 2 + count
+
+
+def _encode(entries: List[Tuple[int, List[int]]]) -> List[int]:
+    flat: List[int] = []
+    for doc, positions in sorted(entries):
+        flat.append(doc)
+        flat.append(len(positions))
+        last = 0
+        for pos in positions:
+            flat.append(pos - last)
+            last = pos
+    return flat
+
+
+def _load_json(path: Path) -> dict:
+    try:
+        data = json.loads(path.read_text(encoding='utf-8'))
+    except (FileNotFoundError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def shard_path(lang: str, sid: int) -> Path:
+    return SEARCH_DIR / lang / f"{sid:02d}.json"
+
+
+def build_index(lang: str, force: bool = False, jobs: int = 1) -> Dict[str, int]:
+    out_dir = SEARCH_DIR / lang
+    state = {} if force else _load_json(out_dir / BUILD_FILE)
+    meta = {} if force else _load_json(out_dir / 'docs.json')
+    if state.get("version") != INDEX_VERSION or meta.get("shards") != SHARDS:
+        state, meta = {}, {}
+    docs: List[Optional[list]] = meta.get("docs", [])
+    known: Dict[str, dict] = state.get("files", {})
+
+    sources = chapter_sources(lang)
+    current = {file_name for _, _, file_name, _ in sources}
+    changed = [s for s in sources if known.get(s[2], {}).get("key") != s[3]]
+    removed = [name for name in known if name not in current]
+    stats = {"indexed": len(changed), "removed": len(removed), "unchanged": len(sources) - len(changed), "shards": 0}
+    if not changed and not removed and meta:
+        return stats
+
+    affected = set()
+    dropped = set()
+    for name in removed:
+        info = known.pop(name)
+        docs[info["doc"]] = None
+        dropped.add(info["doc"])
+        affected.update(info["shards"])
+    doc_ids = []
+    for num, _, file_name, _ in changed:
+        info = known.get(file_name)
+        if info is not None:
+            doc = info["doc"]
+            dropped.add(doc)
+            affected.update(info["shards"])
+        else:
+            doc = len(docs)
+            docs.append(None)
+        docs[doc] = [num, file_name]
+        doc_ids.append(doc)
+
+    directory = LANGUAGE_DIRS[lang]
+    paths = [str(directory / s[2]) for s in changed]
+    if jobs > 1 and len(paths) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            indexed = list(pool.map(_index_file, paths, chunksize=8))
+    else:
+        indexed = [_index_file(path) for path in paths]
+
+    additions: Dict[int, Dict[str, List[Tuple[int, List[int]]]]] = {}
+    shard_ids: Dict[str, int] = {}
+    for (_, _, file_name, key), doc, postings in zip(changed, doc_ids, indexed):
+        shards = set()
+        for token, positions in postings.items():
+            sid = shard_ids.get(token)
+            if sid is None:
+                sid = shard_ids[token] = shard_of(token)
+            shards.add(sid)
+            additions.setdefault(sid, {}).setdefault(token, []).append((doc, positions))
+        known[file_name] = {"doc": doc, "key": key, "shards": sorted(shards)}
+        affected.update(shards)
+
+    for sid in sorted(affected):
+        path = shard_path(lang, sid)
+        shard = _load_json(path) if meta else {}
+        added = additions.get(sid, {})
+        result = {}
+        for token in set(shard) | set(added):
+            entries = [(doc, positions) for doc, positions in _decode(shard.get(token, [])) if doc not in dropped]
+            entries.extend(added.get(token, []))
+            if entries:
+                result[token] = _encode(entries)
+        write_json_atomic(path, result, indent=None)
+    stats["shards"] = len(affected)
+
+    write_json_atomic(out_dir / 'docs.json', {"version": INDEX_VERSION, "shards": SHARDS, "docs": docs}, indent=None)
+    write_json_atomic(out_dir / BUILD_FILE, {"version": INDEX_VERSION, "files": known}, indent=None)
+    return stats
+
+
+def refresh_index(lang: str) -> Optional[Dict[str, int]]:
+    # Incremental update after chapters were written; only when an index
+    # for the language has been built before.
+    if not (SEARCH_DIR / lang / 'docs.json').exists():
+        return None
+    return build_index(lang)
+
+
+class SearchIndex:
+    def __init__(self, lang: str):
+        meta = _load_json(SEARCH_DIR / lang / 'docs.json')
+        if meta.get("version") != INDEX_VERSION:
+            raise FileNotFoundError(f"Brak indeksu wyszukiwania dla {lang}; uruchom tools/search_index.py build {lang}")
+        self.lang = lang
+        self.docs = meta["docs"]
+        self._shards: Dict[int, dict] = {}
+
+    def _shard(self, sid: int) -> dict:
+        shard = self._shards.get(sid)
+        if shard is None:
+            shard = self._shards[sid] = _load_json(shard_path(self.lang, sid))
+        return shard
+
+    def postings(self, token: str) -> Dict[int, List[int]]:
+        return dict(_decode(self._shard(shard_of(token)).get(token, [])))
+
+    def find(self, query: str) -> List[Hit]:
+        # Chapters containing the query as a phrase, in chapter order; the
+        # positions are where the phrase starts.
+        tokens = [token for token, _ in tokenize(query)]
+        if not tokens:
+            return []
+        matches = self.postings(tokens[0])
+        for offset, token in enumerate(tokens[1:], start=1):
+            following = self.postings(token)
+            narrowed = {}
+            for doc, positions in matches.items():
+                later = following.get(doc)
+                if later:
+                    later_set = set(later)
+                    kept = [pos for pos in positions if pos + offset in later_set]
+                    if kept:
+                        narrowed[doc] = kept
+            matches = narrowed
+            if not matches:
+                break
+        hits = [Hit(self.docs[doc][0], self.docs[doc][1], positions) for doc, positions in matches.items() if self.docs[doc]]
+        hits.sort(key=lambda hit: (hit.num, hit.file))
+        return hits
+
+    def first(self, query: str) -> Optional[Hit]:
+        hits = self.find(query)
+        return hits[0] if hits else None
+
+
+def _chapter_text(lang: str, file_name: str) -> str:
+    return (LANGUAGE_DIRS[lang] / file_name).read_text(encoding='utf-8')
+
+
+def line_at(text: str, position: int) -> Tuple[int, str]:
+    # (index among non-empty lines, line) of the token at a position; the
+    # index lines up with the translation, which keeps the paragraph layout.
+    offset = None
+    for pos, (_, start) in enumerate(tokenize(text)):
+        if pos == position:
+            offset = start
+            break
+    if offset is None:
+        return -1, ""
+    line_start = text.rfind("\n", 0, offset) + 1
+    line_end = text.find("\n", offset)
+    line = text[line_start:line_end if line_end >= 0 else len(text)]
+    index = sum(1 for prior in text[:line_start].split("\n") if prior.strip()) if line_start else 0
+    return index, line.strip()
+
+
+def renderings(term: str, source: str = 'ko', target: str = 'pl', before: Optional[int] = None,
+               limit: int = 5) -> List[Tuple[int, str, str]]:
+    # Earlier renderings of a term: for the first chapters (below `before`)
+    # whose source contains it, the source line and the matching line of
+    # the translation.
+    translated = {num: file_name for num, _, file_name, _ in chapter_sources(target)}
+    out = []
+    for hit in SearchIndex(source).find(term):
+        if before is not None and hit.num >= before:
+            break
+        if hit.num not in translated:
+            continue
+        index, line = line_at(_chapter_text(source, hit.file), hit.positions[0])
+        lines = [l.strip() for l in _chapter_text(target, translated[hit.num]).split("\n") if l.strip()]
+        out.append((hit.num, line, lines[index] if 0 <= index < len(lines) else ""))
+        if len(out) >= limit:
+            break
+    return out
+
+
+def usage():
+    print("Uzycie:")
+    print(f"  python3 tools/search_index.py build [{'|'.join(LANGUAGE_DIRS)} ...] [--force] [--jobs N]")
+    print("  python3 tools/search_index.py query <jezyk> <fraza...> [--limit N] [--in JEZYK]")
+    print("  (koreanskie zapytanie: co najmniej 2 sylaby; pojedyncza sylaba trafia tylko samodzielne slowa)")
+    sys.exit(1)
+
+
+def main():
+    import translate_with_codex as tw
+
+    args = sys.argv[1:]
+    if not args or args[0] not in ("build", "query"):
+        usage()
+    command = args.pop(0)
+    if command == "build":
+        jobs = int(tw.pop_option(args, "--jobs", str(os.cpu_count() or 1)))
+        force = "--force" in args
+        if force:
+            args.remove("--force")
+        if any(lang not in LANGUAGE_DIRS for lang in args):
+            usage()
+        for lang in args or list(LANGUAGE_DIRS):
+            stats = build_index(lang, force, jobs)
+            print(
+                f"{lang}: zindeksowano {stats['indexed']}, usunieto {stats['removed']}, "
+                f"bez zmian {stats['unchanged']}, zapisano {stats['shards']} shardow"
+            )
+        return
+
+    limit = int(tw.pop_option(args, "--limit", "10"))
+    target = tw.pop_option(args, "--in")
+    if len(args) < 2 or args[0] not in LANGUAGE_DIRS or (target and target not in LANGUAGE_DIRS):
+        usage()
+    lang, query = args[0], " ".join(args[1:])
+    if target:
+        for num, line, rendered in renderings(query, lang, target, limit=limit):
+            print(f"{num}: {line}\n      -> {rendered}")
+        return
+    hits = SearchIndex(lang).find(query)
+    if not hits:
+        print("Brak wynikow.")
+        if re.fullmatch(rf"[{HANGUL}]", query.strip()):
+            print("Koreanskie slowa sa indeksowane parami sylab; podaj co najmniej 2 sylaby.")
+        return
+    total = sum(len(hit.positions) for hit in hits)
+    print(f"{len(hits)} rozdzialow, {total} wystapien; pierwszy {hits[0].num}, ostatni {hits[-1].num}")
+    bundle = open_bundle(lang)
+    for hit in hits[:limit]:
+        text = bundle.text(hit.num, hit.file) if bundle else _chapter_text(lang, hit.file)
+        print(f"{hit.num} ({len(hit.positions)}x): {line_at(text, hit.positions[0])[1][:160]}")
+    if bundle:
+        bundle.close()
+
+
+if __name__ == '__main__':
+    main()
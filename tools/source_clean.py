@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+import html
+import os
+import re
+import sys
+import tempfile
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Tuple, Union
+
+from chapter_index import BASE, CHAPTER_RE, LANGUAGE_DIRS
+from repair_manifest import content_hash
+
+# Scraper noise removed from source chapters before they reach prompts and
+# validation. Rules run in order; each is a regex with a replacement string
+# or function. Bump CLEAN_VERSION when a rule changes so cached cleaned
+# texts are rebuilt.
+CLEAN_DIR = BASE / '.cache' / 'clean'
+CLEAN_VERSION = 1
+
+
+class NoiseRule(NamedTuple):
+    name: str
+    pattern: "re.Pattern[str]"
+    replacement: Union[str, Callable[["re.Match[str]"], str]]
+
+
+NOISE_RULES: List[NoiseRule] = []
+
+
+def add_rule(name: str, pattern: str, replacement: Union[str, Callable] = "", flags: int = re.MULTILINE) -> None:
+    NOISE_RULES.append(NoiseRule(name, re.compile(pattern, flags), replacement))
+
+
+# Ad-blocker banner left inline by the English scrape.
+add_rule("javascript", r"^[ \t]*Please enable JavaScript[ \t]*\n?")
+# Entities the Korean scrape kept escaped ("&nbsp;" at line ends, "&lt;스피릿&gt;").
+add_rule(
+    "entities",
+    r"&(?:nbsp|lt|gt|amp|quot|#\d+|#x[0-9a-fA-F]+);",
+    lambda m: html.unescape(m.group(0)).replace("\u00a0", " "),
+)
+add_rule("trailing_space", r"[ \t\u00a0]+$")
+# "무한의 마법사 - 김치우" plus its rule before the first chapter.
+add_rule("book_banner", r"\A[^\n\[]+ - [^\n]+\n\s*-{10,}[ \t]*\n\s*", flags=0)
+add_rule("dash_rule", r"^-{10,}[ \t]*(?:\n|\Z)")
+# The same header line repeated ("Chapter 5" / "Chapter 5").
+add_rule("duplicate_header", r"\A(?P<head>[^\n]+)\n(?:[ \t]*\n)*(?P=head)[ \t]*\n", r"\g<head>\n", flags=0)
+# Blank lines left at the end once a trailing rule is gone.
+add_rule("trailing_blank", r"\n{2,}\Z", "\n", flags=0)
+
+
+def clean_text(text: str) -> Tuple[str, Dict[str, int]]:
+    # Cleaned text and the UTF-8 bytes each rule removed.
+    removed: Dict[str, int] = {}
+    for rule in NOISE_RULES:
+        cleaned = rule.pattern.sub(rule.replacement, text)
+        if cleaned != text:
+            removed[rule.name] = len(text.encode('utf-8')) - len(cleaned.encode('utf-8'))
+            text = cleaned
+    return text, removed
+
+
+def _cache_path(raw: str) -> Path:
+    digest = content_hash(f"{CLEAN_VERSION}\n{raw}")
+    return CLEAN_DIR / digest[:2] / f"{digest}.txt"
+
+
+def load_source(path: Path, cache: bool = True) -> str:
+    # Cleaned source text, cached under .cache/clean by hash of the raw text;
+    # with cache=False an existing entry is still read, but none is written.
+    raw = path.read_text(encoding='utf-8')
+    cached = _cache_path(raw)
+    try:
+        return cached.read_text(encoding='utf-8')
+    except FileNotFoundError:
+        pass
+    cleaned, _ = clean_text(raw)
+    if not cache:
+        return cleaned
+    cached.parent.mkdir(parents=True, exist_ok=True)
+    # A private temp name: pool workers may clean the same source at once.
+    fd, tmp_name = tempfile.mkstemp(prefix=cached.name + ".", suffix=".tmp", dir=str(cached.parent))
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            fh.write(cleaned)
+        os.replace(tmp_name, cached)
+    except BaseException:
+        try:
+            os.remove(tmp_name)
+        except OSError:
+            pass
+        raise
+    return cleaned
+
+
+def report(lang: str, top: int) -> None:
+    directory = LANGUAGE_DIRS[lang]
+    files = [p for p in directory.iterdir() if CHAPTER_RE.match(p.name)]
+    files.sort(key=lambda p: int(CHAPTER_RE.match(p.name).group(1)))
+    per_chapter = []
+    per_rule: Dict[str, int] = {}
+    total_before = 0
+    for path in files:
+        raw = path.read_text(encoding='utf-8')
+        _, removed = clean_text(raw)
+        total_before += len(raw.encode('utf-8'))
+        for name, count in removed.items():
+            per_rule[name] = per_rule.get(name, 0) + count
+        per_chapter.append((sum(removed.values()), int(CHAPTER_RE.match(path.name).group(1)), removed))
+
+    total = sum(per_rule.values())
+    touched = sum(1 for removed, _, _ in per_chapter if removed)
+    share = 100.0 * total / total_before if total_before else 0.0
+    print(f"{lang}: {len(files)} rozdzialow, usunieto {total} B z {total_before} B ({share:.2f}%) w {touched} rozdzialach")
+    for name, count in sorted(per_rule.items(), key=lambda item: -item[1]):
+        print(f"  {name:<18} {count:>9} B")
+    if top:
+        print(f"Najwiecej usunieto (top {top}):")
+        for removed, num, rules in sorted(per_chapter, key=lambda item: (-item[0], item[1]))[:top]:
+            if not removed:
+                break
+            detail = ", ".join(f"{name} {count}" for name, count in sorted(rules.items()))
+            print(f"  {num:>5}: {removed:>6} B ({detail})")
+
+
+def main():
+    import translate_with_codex as tw
+
+    args = sys.argv[1:]
+    top = int(tw.pop_option(args, "--top", "10"))
+    if len(args) != 2 or args[0] != "report" or args[1] not in LANGUAGE_DIRS:
+        print("Uzycie:")
+        print(f"  python3 tools/source_clean.py report <{'|'.join(LANGUAGE_DIRS)}> [--top N]")
+        sys.exit(1)
+    report(args[1], top)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+from typing import Optional
+
+from validation_thresholds import bounds_for
+
+# Cheap checks run on a backend answer while it streams in, so a runaway
+# generation is cut off long before validate_translation() would see it.
+# feed() returns the reason to stop, or None while the output still looks
+# like a translation. Limits sit well past anything an accepted chapter
+# reaches: the guard only stops output that validation would reject anyway.
+
+# A verbatim stretch this long already written earlier in the answer is a
+# generation loop (Rabin-Karp hash over WINDOW characters).
+WINDOW = 48
+REPEAT_CHARS = 600
+HASH_BASE = 257
+HASH_MOD = (1 << 61) - 1
+# Hangul share of letters once MIN_LETTERS have arrived.
+MAX_HANGUL_SHARE = 0.05
+MIN_LETTERS = 400
+# Polish diacritics over the last LATIN_WINDOW letters; accepted chapters
+# never drop below 5% in any window, English has none.
+LATIN_WINDOW = 1500
+MIN_DIACRITIC_SHARE = 0.01
+DIACRITICS = frozenset("ąćęłńóśźżĄĆĘŁŃÓŚŹŻ")
+# Non-space characters allowed per source character: the calibrated upper
+# char_ratio times LENGTH_SLACK, or DEFAULT_LENGTH_RATIO without a calibration.
+LENGTH_SLACK = 1.3
+DEFAULT_LENGTH_RATIO = 3.0
+MIN_BUDGET = 2000
+
+
+def length_budget(source: str) -> int:
+    lines = [line for line in source.splitlines() if line.strip()]
+    src_chars = sum(len(line) - line.count(" ") for line in lines)
+    bounds = bounds_for(len(lines), names=("char_ratio",))
+    ratio = bounds["char_ratio"][1] * LENGTH_SLACK if "char_ratio" in bounds else DEFAULT_LENGTH_RATIO
+    return max(MIN_BUDGET, int(src_chars * ratio))
+
+
+class StreamGuard:
+    def __init__(self, source: str, budget: Optional[int] = None):
+        self.budget = length_budget(source) if budget is None else budget
+        self.chars = 0
+        self.letters = 0
+        self.hangul = 0
+        self.reason: Optional[str] = None
+        self._text: list = []
+        self._hash = 0
+        self._drop = pow(HASH_BASE, WINDOW, HASH_MOD)
+        self._seen: dict = {}
+        self._period = 0
+        self._run = 0
+        self._recent: list = []
+        self._recent_diacritics = 0
+
+    def feed(self, chunk: str) -> Optional[str]:
+        if self.reason is not None:
+            return self.reason
+        text = self._text
+        seen = self._seen
+        for ch in chunk:
+            pos = len(text)
+            text.append(ch)
+            self._hash = (self._hash * HASH_BASE + ord(ch)) % HASH_MOD
+            if pos >= WINDOW:
+                self._hash = (self._hash - ord(text[pos - WINDOW]) * self._drop) % HASH_MOD
+            if pos >= WINDOW - 1:
+                self._repeat(seen, pos)
+                if self.reason is not None:
+                    return self.reason
+            if ch.isspace():
+                continue
+            self.chars += 1
+            if ch.isalpha():
+                self._letter(ch)
+        if self.reason is None:
+            self.reason = self._check()
+        return self.reason
+
+    def _repeat(self, seen: dict, pos: int) -> None:
+        # Consecutive windows each matching the window one period back form a
+        # copied stretch; its length is the run.
+        earlier = seen.get(self._hash)
+        seen[self._hash] = pos
+        if earlier is None:
+            self._run = 0
+            return
+        period = pos - earlier
+        self._run = self._run + 1 if period == self._period else 1
+        self._period = period
+        if self._run + WINDOW >= REPEAT_CHARS and self.reason is None:
+            self.reason = f"powtorzony fragment ({self._run + WINDOW} znakow co {period})"
+
+    def _letter(self, ch: str) -> None:
+        self.letters += 1
+        if "\uac00" <= ch <= "\ud7a3":
+            self.hangul += 1
+        recent = self._recent
+        recent.append(ch in DIACRITICS)
+        self._recent_diacritics += recent[-1]
+        if len(recent) > LATIN_WINDOW:
+            self._recent_diacritics -= recent[-LATIN_WINDOW - 1]
+            if len(recent) > 2 * LATIN_WINDOW:
+                del recent[:-LATIN_WINDOW]
+
+    def _check(self) -> Optional[str]:
+        if self.chars > self.budget:
+            return f"przekroczony limit dlugosci ({self.chars} > {self.budget} znakow)"
+        if self.letters >= MIN_LETTERS and self.hangul > self.letters * MAX_HANGUL_SHARE:
+            return f"za duzo Hangul ({self.hangul / self.letters:.0%} liter)"
+        if len(self._recent) >= LATIN_WINDOW:
+            share = self._recent_diacritics / LATIN_WINDOW
+            if share < MIN_DIACRITIC_SHARE:
+                return f"tekst nie wyglada na polski ({share:.1%} polskich znakow w ostatnich {LATIN_WINDOW} literach)"
+        return None
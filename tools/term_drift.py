@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+import os
+import re
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+import translate_with_codex as tw
+from chapter_bundle import open_bundle
+
+# Capitalised words (names, spells, places) and every lowercase word; a
+# near-miss that also occurs lowercase is an ordinary Polish word
+# ("Armia" vs "Armin"), not a misspelt name.
+CAPITAL_RE = re.compile(r"\b[A-ZĄĆĘŁŃÓŚŹŻ][a-ząćęłńóśźż]+(?:-[A-ZĄĆĘŁŃÓŚŹŻ][a-ząćęłńóśźż]+)?\b")
+LOWER_RE = re.compile(r"\b[a-ząćęłńóśźż]+\b")
+# Polish case endings stripped before comparing ("Kariela" -> "Kariel").
+ENDINGS = sorted(
+    [
+        "a", "e", "ę", "i", "y", "u", "o", "ą", "m",
+        "em", "ie", "om", "ów", "ach", "ami", "owi", "owie", "iem", "ego", "emu",
+        # Alternation before the ending: "Gaold" -> "Gaoldzie", "Jonner" -> "Jonnerze".
+        "zie", "ze", "zy", "cie",
+    ],
+    key=len,
+    reverse=True,
+)
+MIN_LENGTH = 4
+# Shorter names have too many one-letter neighbours to compare against.
+MIN_COMPARED = 5
+
+
+class Drift(NamedTuple):
+    variant: str
+    canonical: str
+    distance: int
+    count: int
+    chapters: int
+    first: int
+    last: int
+    known: bool
+    # (surface form, canonical spelling with the same ending, already an alias),
+    # most frequent first.
+    forms: Tuple[Tuple[str, str, bool], ...]
+
+
+def max_distance(word: str) -> int:
+    return 1 if len(word) <= 7 else 2
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    # Levenshtein, giving up (limit + 1) as soon as every cell of a row exceeds limit.
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, start=1):
+        current = [i]
+        for j, cb in enumerate(b, start=1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def stems(word: str) -> List[str]:
+    out = [word]
+    for ending in ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_LENGTH - 1:
+            out.append(word[: -len(ending)])
+    # "Sirone'a" style endings after an apostrophe.
+    if "'" in word:
+        out.append(word.split("'", 1)[0])
+    return out
+
+
+def term_forms(term: str) -> List[str]:
+    # Feminine/neuter names drop their vowel when declined ("Ataraksja" -> "Ataraksji").
+    if term[-1] in "aeoy" and len(term) >= MIN_COMPARED:
+        return [term, term[:-1]]
+    return [term]
+
+
+def scan_text(text: str) -> Tuple[Counter, Set[str]]:
+    return Counter(CAPITAL_RE.findall(text)), set(LOWER_RE.findall(text))
+
+
+def scan_chapter(path: str) -> Tuple[Counter, Set[str]]:
+    return scan_text(tw.load_text(tw.Path(path)))
+
+
+def canonical_terms(glossary: str) -> Dict[str, Set[str]]:
+    # Single capitalised words of every canonical name -> aliases already
+    # mapped onto it.
+    aliases = {**tw.parse_glossary_canonical_map(glossary), **tw.TERM_CANONICAL_MAP}
+    targets = set(aliases.values()) | set(tw.HANGUL_MAP.values()) | set(tw.CHARACTER_GENDER)
+    for raw in glossary.splitlines():
+        line = raw.strip()
+        if line.startswith("- ") and "->" in line:
+            targets.add(line.split("->", 1)[1].strip())
+    terms: Dict[str, Set[str]] = {}
+    for target in targets:
+        for word in CAPITAL_RE.findall(target):
+            if len(word) >= MIN_LENGTH:
+                terms.setdefault(word, set())
+    for alias, canonical in aliases.items():
+        for a, c in zip(CAPITAL_RE.findall(alias), CAPITAL_RE.findall(canonical)):
+            if a != c and c in terms:
+                terms[c].add(a)
+    return terms
+
+
+def scan(nums: Optional[List[int]] = None, jobs: int = 1, glossary: Optional[str] = None):
+    if glossary is None:
+        glossary = tw.load_text(tw.GLOSSARY) if tw.GLOSSARY.exists() else ""
+    terms = canonical_terms(glossary)
+    index = tw.get_index('pl')
+    nums = sorted(index.nums()) if nums is None else [n for n in nums if index.find(n)]
+    paths = [str(index.find(num)) for num in nums]
+    if jobs > 1 and len(paths) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(scan_chapter, paths, chunksize=16))
+    else:
+        # In-process: read through the mmap bundle when it is current.
+        bundle = open_bundle('pl')
+        try:
+            results = [
+                scan_text(bundle.text(num, tw.Path(path).name)) if bundle else scan_chapter(path)
+                for num, path in zip(nums, paths)
+            ]
+        finally:
+            if bundle:
+                bundle.close()
+
+    per_word: Dict[str, List[Tuple[int, int]]] = {}
+    lowercase: Set[str] = set()
+    for num, (capitals, lower) in zip(nums, results):
+        lowercase |= lower
+        for word, count in capitals.items():
+            per_word.setdefault(word, []).append((num, count))
+
+    forms: Dict[str, str] = {}
+    by_first: Dict[str, List[Tuple[str, str]]] = {}
+    # Sorted: terms sharing a form, and equally near candidates, then resolve
+    # the same way on every run instead of by set hash order.
+    for term in sorted(terms):
+        for form in term_forms(term):
+            forms.setdefault(form, term)
+            if len(term) >= MIN_COMPARED:
+                by_first.setdefault(form[0], []).append((form, term))
+    # Term usage, keyed by canonical name.
+    usage: Dict[str, List[Tuple[int, int]]] = {term: [] for term in terms}
+    drift: Dict[Tuple[str, str], dict] = {}
+    for word, seen in per_word.items():
+        candidates = stems(word)
+        exact = next((forms[c] for c in candidates if c in forms), None)
+        if exact is not None:
+            usage[exact].extend(seen)
+            continue
+        if any(c.lower() in lowercase for c in candidates) or len(word) < MIN_LENGTH:
+            continue
+        best = None
+        for stem in candidates:
+            for form, term in by_first.get(stem[0], ()):
+                limit = max_distance(term)
+                distance = edit_distance(stem, form, limit)
+                if distance <= limit and (best is None or distance < best[0]):
+                    best = (distance, stem, form, term)
+        if best is None:
+            continue
+        distance, stem, form, term = best
+        entry = drift.setdefault((stem, term), {"distance": distance, "seen": [], "forms": Counter(), "fixed": {}})
+        entry["seen"].extend(seen)
+        entry["forms"][word] += sum(count for _, count in seen)
+        entry["fixed"][word] = form + word[len(stem):]
+
+    report = []
+    for (stem, term), entry in drift.items():
+        chapters = sorted({num for num, _ in entry["seen"]})
+        forms = tuple(
+            (word, entry["fixed"][word], word in terms[term]) for word, _ in entry["forms"].most_common()
+        )
+        report.append(Drift(
+            forms[0][0], term, entry["distance"], sum(entry["forms"].values()), len(chapters),
+            chapters[0], chapters[-1], all(known for _, _, known in forms), forms,
+        ))
+    report.sort(key=lambda d: (-d.chapters, -d.count, d.variant))
+    return report, usage
+
+
+def alias_lines(report: List[Drift]) -> List[str]:
+    # Aliases are replaced as whole words, so every declined form needs its own line.
+    lines = []
+    for d in report:
+        for word, fixed, known in d.forms:
+            if not known and word != fixed:
+                lines.append(f"- {word} -> {fixed}")
+    return lines
+
+
+def main():
+    args = sys.argv[1:]
+    jobs = int(tw.pop_option(args, "--jobs", str(os.cpu_count() or 1)))
+    top = int(tw.pop_option(args, "--top", "30"))
+    start = tw.pop_option(args, "--from")
+    end = tw.pop_option(args, "--to")
+    if args:
+        print("Uzycie:")
+        print("  python3 tools/term_drift.py [--from N] [--to N] [--jobs N] [--top N]")
+        sys.exit(1)
+    nums = None
+    if start is not None or end is not None:
+        nums = list(range(int(start or 1), int(end or 10 ** 6) + 1))
+
+    began = time.perf_counter()
+    report, usage = scan(nums, jobs)
+    elapsed = time.perf_counter() - began
+    used = sum(1 for seen in usage.values() if seen)
+    print(f"Przeskanowano pl w {elapsed:.2f}s; terminy z glosariusza w uzyciu: {used}/{len(usage)}")
+    if not report:
+        print("Nie znaleziono rozbieznych zapisow.")
+        return
+    print(f"{'wariant':<22} {'kanon':<18} {'odl':>3} {'wyst':>5} {'rozdz':>5}  pierwszy-ostatni")
+    for d in report[:top]:
+        flag = "  (alias juz w mapie)" if d.known else ""
+        others = f"  +{len(d.forms) - 1} form" if len(d.forms) > 1 else ""
+        print(
+            f"{d.variant:<22} {d.canonical:<18} {d.distance:>3} {d.count:>5} {d.chapters:>5}  "
+            f"{d.first}-{d.last}{others}{flag}"
+        )
+    lines = alias_lines(report[:top])
+    if lines:
+        print("\nDo wklejenia w translation_glossary.md (sprawdz przed dodaniem):")
+        print("\n".join(lines))
+
+
+if __name__ == '__main__':
+    main()
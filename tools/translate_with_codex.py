@@ -1,20 +1,51 @@
 #!/usr/bin/env python3
+import difflib
 import json
 import os
 import re
 import subprocess
 import sys
-import tempfile
-import shutil
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from typing import List
+from typing import List, Optional, Tuple
+
+from backends import BackendError, create_backend
+from chapter_bundle import refresh_bundle
+from chapter_index import LANGUAGE_DIRS, ChapterIndex, get_index
+from chapter_text import SEPARATOR_RE, parse_chapter
+from glossary_index import TermIndex
+from progress_journal import ProgressJournal
+from render_chapters import refresh_fragment
+from repair_manifest import RepairManifest, content_hash
+from response_cache import ResponseCache
+from run_metrics import MetricsLog
+from scheduler import BudgetExceeded, RequestScheduler
+from search_index import refresh_index
+from source_clean import load_source
+from stream_guard import StreamGuard
+from validation_thresholds import DEFAULT_BOUNDS as DEFAULT_RATIO_BOUNDS
+from validation_thresholds import load_thresholds, measure as measure_chapter, violations as threshold_violations
 
 BASE = Path(__file__).resolve().parents[1]
-SRC_DIR = BASE / 'Infinity Mage Chapters 1-1277 original'
-OUT_DIR = BASE / 'pl'
+# Translation source is the Korean original, not the English scrape.
+SRC_LANG = 'ko'
+SRC_DIR = LANGUAGE_DIRS[SRC_LANG]
+OUT_DIR = LANGUAGE_DIRS['pl']
 PROGRESS = BASE / 'reader' / 'chapters_pl.json'
 GLOSSARY = BASE / 'translation_glossary.md'
 GUIDELINES = BASE / 'translation_guidelines.md'
+PROGRESS_JOURNAL = ProgressJournal(PROGRESS)
+# Hashes of sources/outputs seen by --repair-existing, to skip unchanged chapters.
+REPAIR_MANIFEST = BASE / '.cache' / 'repair_manifest.json'
+# Per-chapter timing/token records; summarised by tools/run_metrics.py.
+METRICS_FILE = Path(os.environ.get('CODEX_METRICS', str(BASE / '.cache' / 'metrics.jsonl')))
+METRICS = MetricsLog(METRICS_FILE)
+RESPONSE_CACHE = ResponseCache(
+    BASE / '.cache' / 'responses',
+    int(os.environ.get('CODEX_CACHE_MAX_MB', '512')) * 1024 * 1024,
+)
 
 HANGUL_MAP = {
     "천폭": "Cheonpok",
@@ -54,6 +85,43 @@ REGEX_CANONICAL_RULES = [
 ]
 
 MAX_REPAIR_ATTEMPTS = 2
+# Part of the --repair-existing ruleset version; bump it when postprocessing
+# or validation code changes so every chapter is checked again.
+REPAIR_RULESET = 3
+# Line-local issues are repaired paragraph by paragraph unless they touch more
+# than this share of the chapter's paragraphs.
+PARAGRAPH_REPAIR_MAX_SHARE = 0.3
+PARAGRAPH_SOURCE_CONTEXT = 2
+
+# With --segment N, sources longer than N characters are translated in
+# segments of at most N characters, several requests at a time.
+SEGMENT_MAX_CHARS = 0
+SEGMENT_JOBS = 4
+SEGMENT_ATTEMPTS = 3
+
+# With --batch N, consecutive chapters whose sources are at most N characters
+# long are packed (up to N characters and BATCH_MAX_CHAPTERS chapters) into
+# one request, so the glossary and guidelines are sent once per batch.
+BATCH_MAX_CHARS = 0
+BATCH_MAX_CHAPTERS = 4
+BATCH_MARKER_RE = re.compile(r"(?m)^[ \t]*<<<ROZDZIAL (\d+)>>>[ \t]*$")
+
+# Backend requests go through SCHEDULER: failed requests are retried with
+# jittered exponential backoff; --rpm/--tpm/--token-budget set its limits.
+# Chapters lost to backend errors are retried this many times at the end.
+BACKEND_RETRIES = 3
+SKIPPED_RETRY_ROUNDS = 1
+SCHEDULER = RequestScheduler(retries=BACKEND_RETRIES)
+# With --stream answers are read as they are generated and checked by
+# StreamGuard (loops, Hangul, non-Polish text, length far past the source);
+# a degenerate one is killed and retried instead of waiting for the end.
+STREAM_GUARD = False
+
+# Send only the glossary entries and characters that occur in the chapter.
+PROMPT_SUBSET = True
+# Glossary terms are English/romanised, so they are matched against the
+# parallel English chapter (and Hangul terms against the Korean source).
+REFERENCE_LANG = 'en'
 
 CHARACTER_GENDER = {
     "Sirone": "M",
@@ -85,20 +153,22 @@ MASCULINE_MARKERS = {
     "miał", "zrobił", "sam", "zmęczony", "zaskoczony",
 }
 
+class Issue(str):
+    # A validation message that also remembers the 1-based translation lines
+    # it refers to; plain str issues concern the chapter as a whole.
+    def __new__(cls, text: str, lines=()):
+        issue = super().__new__(cls, text)
+        issue.lines = tuple(lines)
+        return issue
+
+
 def get_last_translated_num():
-    if not PROGRESS.exists():
-        return 299
-    try:
-        data = json.loads(PROGRESS.read_text(encoding='utf-8'))
-    except Exception:
-        return 299
-    nums = [d.get('num') for d in data if isinstance(d, dict) and isinstance(d.get('num'), int)]
-    return max(nums) if nums else 299
+    last = PROGRESS_JOURNAL.last_num()
+    return last if last is not None else 299
 
 
 def find_src_file(num: int):
-    matches = list(SRC_DIR.glob(f"Chapter - {num} - *.txt"))
-    return matches[0] if matches else None
+    return get_index(SRC_LANG).find(num)
 
 
 def load_text(path: Path):
@@ -124,17 +194,55 @@ def parse_glossary_canonical_map(glossary_text: str) -> dict:
     return mapping
 
 
-def build_gender_rules_text() -> str:
+def build_gender_rules_text(genders: Optional[dict] = None) -> str:
     labels = {"M": "mezczyzna", "F": "kobieta"}
+    genders = CHARACTER_GENDER if genders is None else genders
     lines = []
-    for name in sorted(CHARACTER_GENDER):
-        gender = CHARACTER_GENDER[name]
+    for name in sorted(genders):
+        gender = genders[name]
         lines.append(f"- {name}: {labels.get(gender, gender)}")
     return "\n".join(lines)
 
 
-def build_prompt(num: int, src_title: str, src_text: str, glossary: str, guidelines: str):
-    gender_rules = build_gender_rules_text()
+_TERM_INDEX = None
+_TERM_INDEX_KEY = None
+
+
+def get_term_index(glossary: str) -> TermIndex:
+    global _TERM_INDEX, _TERM_INDEX_KEY
+    key = (glossary, tuple(CHARACTER_GENDER.items()))
+    if _TERM_INDEX is None or key != _TERM_INDEX_KEY:
+        _TERM_INDEX = TermIndex(glossary, CHARACTER_GENDER)
+        _TERM_INDEX_KEY = key
+    return _TERM_INDEX
+
+
+def build_prompt_context(num: int, src_text: str, glossary: str):
+    # Returns (glossary subset, gender subset), or None to use the full text.
+    if not PROMPT_SUBSET:
+        return None
+    reference = get_index(REFERENCE_LANG).find(num)
+    if reference is None:
+        return None
+    return get_term_index(glossary).select(src_text, load_text(reference))
+
+
+def estimate_tokens(text: str) -> int:
+    # Rough count: Hangul syllables are about one token each, other text
+    # about four UTF-8 bytes per token.
+    hangul = len(re.findall(r"[가-힣]", text))
+    return hangul + (len(text.encode('utf-8')) - hangul * 3 + 3) // 4
+
+
+def build_prompt(
+    num: int,
+    src_title: str,
+    src_text: str,
+    glossary: str,
+    guidelines: str,
+    genders: Optional[dict] = None,
+):
+    gender_rules = build_gender_rules_text(genders)
     return (
         "Przetlumacz rozdzial na jezyk polski.\n"
         "Zasady:\n"
@@ -164,6 +272,99 @@ def build_prompt(num: int, src_title: str, src_text: str, glossary: str, guideli
     )
 
 
+def build_segment_prompt(
+    num: int,
+    src_title: str,
+    segment: str,
+    index: int,
+    total: int,
+    glossary: str,
+    guidelines: str,
+    genders: Optional[dict] = None,
+):
+    gender_rules = build_gender_rules_text(genders)
+    if index == 1:
+        header_rule = (
+            "- PIERWSZA LINIA MA MIEC DOKLADNIE FORME: [NUM] POLSKI_TYTUL\n"
+            "- Tytul w pierwszej linii ma byc po polsku i odpowiadac tresci rozdzialu.\n"
+        )
+    else:
+        header_rule = "- To srodek rozdzialu: NIE dodawaj naglowka [NUM] ani tytulu.\n"
+    return (
+        f"Przetlumacz fragment {index}/{total} rozdzialu na jezyk polski.\n"
+        "Pozostale fragmenty tlumaczone sa osobno i zostana sklejone z Twoim.\n"
+        "Zasady:\n"
+        "- Zwracaj TYLKO przetlumaczony fragment, bez komentarzy i bez formatowania Markdown.\n"
+        "- Tlumacz bezposrednio z koreanskiego na polski, bez tlumaczenia przez angielski.\n"
+        "- Zachowaj sens i ton sceny, ale skladnia ma byc naturalna po polsku.\n"
+        "- Nie stosuj kalek i nienaturalnego szyku.\n"
+        "- Zachowaj podzial akapitow i separatorow scen; nie dopisuj niczego spoza fragmentu.\n"
+        "- Nie dodawaj pustej linii po kazdej linijce. Uzywaj tylko logicznych przerw akapitowych.\n"
+        "- Zachowaj znaczniki typu * * *.\n"
+        "- Uzywaj cudzyslowow angielskich: \u201c...\u201d.\n"
+        f"{header_rule}"
+        "- Nie wypisuj linii [TITLE] ani [NUM] jako osobnych metadanych.\n"
+        "- Stosuj terminologie z glosariusza.\n"
+        "- Nie uzywaj znakow koreanskich (Hangul). Jesli pojawiaja sie w oryginale, zapisz je lacina zgodnie z glosariuszem.\n\n"
+        "=== GLOSARIUSZ ===\n"
+        f"{glossary}\n\n"
+        "=== WSKAZOWKI ===\n"
+        f"{guidelines}\n\n"
+        "=== PLEC_POSTACI ===\n"
+        f"{gender_rules}\n\n"
+        "=== ORYGINAL ===\n"
+        f"[NUM] {num}\n"
+        f"[TITLE] {src_title}\n"
+        f"[FRAGMENT] {index}/{total}\n\n"
+        f"{segment}\n"
+    )
+
+
+def build_batch_prompt(
+    chapters: List[tuple],
+    glossary: str,
+    guidelines: str,
+    genders: Optional[dict] = None,
+):
+    # chapters: (num, src_title, src_text) in order.
+    gender_rules = build_gender_rules_text(genders)
+    originals = "".join(
+        f"=== ORYGINAL ROZDZIAL {num} ===\n"
+        f"[NUM] {num}\n"
+        f"[TITLE] {src_title}\n\n"
+        f"{src_text}\n\n"
+        for num, src_title, src_text in chapters
+    )
+    nums = ", ".join(str(num) for num, _, _ in chapters)
+    return (
+        f"Przetlumacz kolejne rozdzialy ({nums}) na jezyk polski.\n"
+        "Zasady:\n"
+        "- Zwracaj TYLKO przetlumaczony tekst, bez komentarzy i bez formatowania Markdown.\n"
+        "- Kazdy rozdzial poprzedz osobna linia zawierajaca tylko znacznik <<<ROZDZIAL NUM>>>, "
+        f"np. <<<ROZDZIAL {chapters[0][0]}>>>, w tej samej kolejnosci co w oryginale.\n"
+        "- Tlumacz kazdy rozdzial w calosci; nie lacz ani nie skracaj rozdzialow.\n"
+        "- Tlumacz bezposrednio z koreanskiego na polski, bez tlumaczenia przez angielski.\n"
+        "- Zachowaj sens i ton sceny, ale skladnia ma byc naturalna po polsku.\n"
+        "- Nie stosuj kalek i nienaturalnego szyku.\n"
+        "- Zachowaj podzial akapitow i separatorow scen.\n"
+        "- Nie dodawaj pustej linii po kazdej linijce. Uzywaj tylko logicznych przerw akapitowych.\n"
+        "- Zachowaj znaczniki typu * * * oraz linie z numerem [num].\n"
+        "- Uzywaj cudzyslowow angielskich: \u201c...\u201d.\n"
+        "- PIERWSZA LINIA KAZDEGO ROZDZIALU (pod znacznikiem) MA MIEC DOKLADNIE FORME: [NUM] POLSKI_TYTUL\n"
+        "- Nie wypisuj linii [TITLE] ani [NUM] jako osobnych metadanych.\n"
+        "- Tytul ma byc po polsku i odpowiadac tresci rozdzialu.\n"
+        "- Stosuj terminologie z glosariusza.\n\n"
+        "- Nie uzywaj znakow koreanskich (Hangul). Jesli pojawiaja sie w oryginale, zapisz je lacina zgodnie z glosariuszem.\n\n"
+        "=== GLOSARIUSZ ===\n"
+        f"{glossary}\n\n"
+        "=== WSKAZOWKI ===\n"
+        f"{guidelines}\n\n"
+        "=== PLEC_POSTACI ===\n"
+        f"{gender_rules}\n\n"
+        f"{originals}"
+    )
+
+
 def build_repair_prompt(
     num: int,
     src_title: str,
@@ -172,8 +373,9 @@ def build_repair_prompt(
     glossary: str,
     guidelines: str,
     issues: List[str],
+    genders: Optional[dict] = None,
 ):
-    gender_rules = build_gender_rules_text()
+    gender_rules = build_gender_rules_text(genders)
     issues_text = "\n".join(f"- {issue}" for issue in issues)
     return (
         "Popraw ponizsze tlumaczenie rozdzialu na jezyk polski.\n"
@@ -202,62 +404,201 @@ def build_repair_prompt(
     )
 
 
-def run_codex(prompt: str) -> str:
-    # Prefer explicit CODEX_PATH (e.g. codex.js) for Windows with blocked ps1
-    codex_path = os.environ.get('CODEX_PATH')
-    use_node = False
-    if codex_path:
-        codex_path = str(Path(codex_path))
-        if codex_path.lower().endswith('.js'):
-            use_node = True
-    else:
-        codex_path = shutil.which('codex') or shutil.which('codex.cmd')
-    if not codex_path:
-        raise FileNotFoundError(
-            "Nie znaleziono komendy 'codex' ani CODEX_PATH. "
-            "Ustaw CODEX_PATH na pełną ścieżkę do codex.js, "
-            "np. C:\\Users\\Lukasz\\AppData\\Roaming\\npm\\node_modules\\@openai\\codex\\dist\\codex.js"
+def build_paragraph_repair_prompt(
+    num: int,
+    items: List[tuple],
+    glossary: str,
+    guidelines: str,
+    issues: List[str],
+    genders: Optional[dict] = None,
+):
+    gender_rules = build_gender_rules_text(genders)
+    issues_text = "\n".join(f"- {issue}" for issue in issues)
+    blocks = []
+    for marker, src_fragment, current in items:
+        blocks.append(
+            f"[[{marker}]]\n"
+            "ORYGINAL (fragment):\n"
+            f"{src_fragment}\n"
+            "TLUMACZENIE:\n"
+            f"{current}\n"
         )
-    with tempfile.NamedTemporaryFile(delete=False) as tmp:
-        out_path = tmp.name
+    return (
+        f"Popraw wskazane akapity tlumaczenia rozdzialu {num} na jezyk polski.\n"
+        "Masz naprawic tylko wykryte problemy, bez zmiany sensu tresci.\n"
+        "Zasady:\n"
+        "- Zwroc TYLKO poprawione akapity, kazdy w nowej linii poprzedzony swoim znacznikiem, np. [[A1]].\n"
+        "- Zachowaj wszystkie znaczniki i ich kolejnosc; nie dodawaj komentarzy ani oryginalu.\n"
+        "- Kazdy akapit ma pozostac jednym akapitem.\n"
+        "- Uzywaj cudzyslowow angielskich: \u201c...\u201d.\n"
+        "- Usun znaki Hangul i stosuj nazwy z glosariusza.\n"
+        "- Pilnuj plci postaci zgodnie z tabela.\n\n"
+        "=== WYKRYTE PROBLEMY ===\n"
+        f"{issues_text}\n\n"
+        "=== GLOSARIUSZ ===\n"
+        f"{glossary}\n\n"
+        "=== WSKAZOWKI ===\n"
+        f"{guidelines}\n\n"
+        "=== PLEC_POSTACI ===\n"
+        f"{gender_rules}\n\n"
+        "=== AKAPITY DO POPRAWY ===\n"
+        + "\n".join(blocks)
+    )
 
-    try:
-        if use_node:
-            cmd = [
-                'node', codex_path, 'exec', '-',
-                '--output-last-message', out_path,
-                '--skip-git-repo-check'
-            ]
-        else:
-            cmd = [
-                codex_path, 'exec', '-',
-                '--output-last-message', out_path,
-                '--skip-git-repo-check'
-            ]
-        subprocess.run(
-            cmd,
-            input=prompt.encode('utf-8'),
-            text=False,
-            check=True
-        )
-        output = Path(out_path).read_text(encoding='utf-8').strip()
-        return output
-    finally:
-        try:
-            os.remove(out_path)
-        except OSError:
-            pass
+
+def local_issue_lines(issues: List[str]):
+    # Line numbers touched by the issues, or None if any issue is structural.
+    found = set()
+    for issue in issues:
+        lines = getattr(issue, "lines", ())
+        if not lines:
+            return None
+        found.update(lines)
+    return sorted(found)
+
+
+def aligned_source_window(ordinal: int, out_count: int, src_count: int) -> Tuple[int, int]:
+    # Source paragraphs [lo, hi) around the one at the same relative position.
+    scale = (src_count - 1) / (out_count - 1) if out_count > 1 else 0.0
+    center = round(ordinal * scale)
+    return max(0, center - PARAGRAPH_SOURCE_CONTEXT), min(src_count, center + PARAGRAPH_SOURCE_CONTEXT + 1)
+
+
+def plan_paragraph_repair(translated: str, src_text: str, issue_lines: List[int]):
+    doc = parse_chapter(translated)
+    lines = doc.lines
+    out_paragraphs = [idx + 1 for idx in doc.paragraphs]
+    src_paragraphs = parse_chapter(src_text).non_empty
+    if len(out_paragraphs) < 2 or not src_paragraphs:
+        return None
+    ordinal = {line_no: k for k, line_no in enumerate(out_paragraphs)}
+    targets = [line_no for line_no in issue_lines if line_no in ordinal]
+    # The header line and widespread problems go through a full repair.
+    if not targets or out_paragraphs[0] in targets:
+        return None
+    if len(targets) > len(out_paragraphs) * PARAGRAPH_REPAIR_MAX_SHARE:
+        return None
+    items = []
+    for idx, line_no in enumerate(targets, start=1):
+        lo, hi = aligned_source_window(ordinal[line_no], len(out_paragraphs), len(src_paragraphs))
+        items.append((f"A{idx}", line_no, "\n".join(src_paragraphs[lo:hi]), lines[line_no - 1].strip()))
+    return items
+
+
+def parse_paragraph_repair(output: str, markers: List[str]):
+    parts = re.split(r"(?m)^\s*\[\[(A\d+)\]\][ \t]*", output)
+    found = {}
+    for idx in range(1, len(parts) - 1, 2):
+        body = "\n".join(line.strip() for line in parts[idx + 1].splitlines() if line.strip())
+        if body:
+            found[parts[idx]] = body
+    if any(marker not in found for marker in markers):
+        return None
+    return found
+
+
+def splice_paragraphs(translated: str, items: List[tuple], repaired: dict) -> str:
+    lines = translated.splitlines()
+    for marker, line_no, _, _ in items:
+        text = repaired[marker]
+        text = replace_hangul(text)
+        text = canonicalize_terms(text)
+        text = normalize_quotes(text)
+        lines[line_no - 1] = text
+    return "\n".join(lines)
 
 
-def run_codex_checked(prompt: str, num: int, stage: str) -> str:
+def repair_paragraphs(num, translated, src_text, issues, glossary, guidelines, genders):
+    # Returns the spliced translation, or None if a full repair is needed.
+    issue_lines = local_issue_lines(issues)
+    if issue_lines is None:
+        return None
+    items = plan_paragraph_repair(translated, src_text, issue_lines)
+    if items is None:
+        return None
+    prompt = build_paragraph_repair_prompt(
+        num=num,
+        items=[(marker, src_fragment, current) for marker, _, src_fragment, current in items],
+        glossary=glossary,
+        guidelines=guidelines,
+        issues=issues,
+        genders=genders,
+    )
+    source = "\n".join(src_fragment for _, _, src_fragment, _ in items)
+    output = run_codex_checked(prompt, num, "naprawa akapitow", source=source)
+    if not output:
+        return None
+    repaired = parse_paragraph_repair(output, [item[0] for item in items])
+    if repaired is None:
+        print(f"Uwaga {num}: niepelna odpowiedz przy naprawie akapitow; naprawiam caly rozdzial.")
+        return None
+    return splice_paragraphs(translated, items, repaired)
+
+
+_BACKEND = None
+_BACKEND_LOCK = threading.Lock()
+
+
+def get_backend():
+    global _BACKEND
+    with _BACKEND_LOCK:
+        if _BACKEND is None:
+            _BACKEND = create_backend(os.environ.get('CODEX_BACKEND'))
+        return _BACKEND
+
+
+def set_backend(backend) -> None:
+    global _BACKEND
+    with _BACKEND_LOCK:
+        if _BACKEND is not None:
+            _BACKEND.close()
+        _BACKEND = backend
+
+
+def run_codex(prompt: str, guard: Optional[StreamGuard] = None) -> str:
+    return get_backend().complete(prompt, guard)
+
+
+def backend_settings() -> dict:
+    # Part of the response cache key.
+    return get_backend().settings()
+
+
+def run_codex_checked(prompt: str, num: int, stage: str, refresh: bool = False, source: Optional[str] = None) -> str:
+    settings = backend_settings()
+    prompt_bytes = len(prompt.encode('utf-8'))
+    cached = None if refresh else RESPONSE_CACHE.get(prompt, settings)
+    if cached is not None:
+        METRICS.attempt(num, stage, prompt_bytes, estimate_tokens(prompt), 0.0, True, len(cached.encode('utf-8')))
+        return cached
+    tokens = estimate_tokens(prompt)
+
+    def report(seconds: float, output: str, error: Optional[str]) -> None:
+        METRICS.attempt(num, stage, prompt_bytes, tokens, seconds, False, len(output.encode('utf-8')), error)
+
+    def request() -> str:
+        # A fresh guard per attempt; the source sets its length budget.
+        return run_codex(prompt, StreamGuard(source) if STREAM_GUARD and source else None)
+
     try:
-        return run_codex(prompt)
+        output = SCHEDULER.call(request, tokens, estimate_tokens, report)
     except FileNotFoundError as exc:
         print(f"Blad {num} ({stage}): {exc}")
         return ""
+    except BudgetExceeded as exc:
+        print(f"Blad {num} ({stage}): {exc}")
+        return ""
     except subprocess.CalledProcessError as exc:
+        SCHEDULER.failed_nums.add(num)
         print(f"Blad {num} ({stage}): codex zakonczyl sie kodem {exc.returncode}.")
         return ""
+    except BackendError as exc:
+        SCHEDULER.failed_nums.add(num)
+        print(f"Blad {num} ({stage}): {exc}")
+        return ""
+    if output and not output.strip().startswith(("ERROR:", "Warning:")):
+        RESPONSE_CACHE.put(prompt, settings, output)
+    return output
 
 
 def replace_hangul(text: str) -> str:
@@ -266,15 +607,109 @@ def replace_hangul(text: str) -> str:
     return text
 
 
+def _fold(text: str) -> str:
+    # casefold() plus the dotted/dotless i that re.IGNORECASE also treats as "i".
+    return text.casefold().replace("\u0307", "").replace("\u0131", "i")
+
+
+def _literal_prefix(pattern: str):
+    # Letters every match must start with, so a rule can be skipped cheaply
+    # when they do not occur in the text at all.
+    depth = 0
+    escaped = in_class = False
+    for ch in pattern:
+        if escaped:
+            escaped = False
+        elif ch == "\\":
+            escaped = True
+        elif in_class:
+            in_class = ch != "]"
+        elif ch == "[":
+            in_class = True
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == "|" and depth == 0:
+            return None
+    lead = re.match(r"(?:\\b)?([^\W\d_]+)(?![?*{])", pattern)
+    return _fold(lead.group(1)) if lead else None
+
+
+class TermCanonicalizer:
+    def __init__(self, aliases: dict, regex_rules=REGEX_CANONICAL_RULES):
+        self.rules = []
+        for pattern, replacement in regex_rules:
+            needle = _literal_prefix(pattern)
+            self.rules.append((re.compile(pattern, re.IGNORECASE), replacement, needle))
+
+        # Longer aliases first so they win over their own prefixes.
+        ordered = sorted(aliases, key=len, reverse=True)
+        self.ordered = ordered
+        self.folded = [(src, _fold(src)) for src in ordered]
+        self.replacements = {}
+        for idx, src in enumerate(ordered):
+            key = src.lower()
+            if key in self.replacements:
+                continue
+            # Aliases used to be applied one re.sub at a time, so a replacement
+            # could itself be rewritten by any shorter alias. Resolve that
+            # chain up front to keep the output identical.
+            dst = aliases[src]
+            for later in ordered[idx + 1:]:
+                dst = re.sub(rf"(?<!\w){re.escape(later)}(?!\w)", aliases[later], dst, flags=re.IGNORECASE)
+            self.replacements[key] = dst
+        self._patterns = {}
+
+    def _pattern_for(self, active: tuple):
+        pattern = self._patterns.get(active)
+        if pattern is None:
+            alternation = "|".join(re.escape(src) for src in active)
+            pattern = re.compile(rf"(?<!\w)(?:{alternation})(?!\w)", re.IGNORECASE)
+            self._patterns[active] = pattern
+        return pattern
+
+    def _replace(self, match) -> str:
+        found = match.group(0)
+        dst = self.replacements.get(found.lower())
+        if dst is None:
+            # IGNORECASE can match case variants that str.lower() does not fold.
+            for src in self.ordered:
+                if re.fullmatch(re.escape(src), found, flags=re.IGNORECASE):
+                    return self.replacements[src.lower()]
+            return found
+        return dst
+
+    def __call__(self, text: str) -> str:
+        folded = _fold(text)
+        for pattern, replacement, needle in self.rules:
+            if needle is not None and needle not in folded:
+                continue
+            text, count = pattern.subn(replacement, text)
+            if count:
+                folded = _fold(text)
+        # One scan with only the aliases that can occur in this text; the
+        # alternation keeps the longest-first order of the full list.
+        active = tuple(src for src, key in self.folded if key in folded)
+        if active:
+            text = self._pattern_for(active).sub(self._replace, text)
+        return text
+
+
+_CANONICALIZER = None
+_CANONICALIZER_SOURCE = None
+
+
+def get_canonicalizer() -> TermCanonicalizer:
+    global _CANONICALIZER, _CANONICALIZER_SOURCE
+    if _CANONICALIZER is None or _CANONICALIZER_SOURCE is not GLOSSARY_CANONICAL_MAP:
+        _CANONICALIZER = TermCanonicalizer({**GLOSSARY_CANONICAL_MAP, **TERM_CANONICAL_MAP})
+        _CANONICALIZER_SOURCE = GLOSSARY_CANONICAL_MAP
+    return _CANONICALIZER
+
+
 def canonicalize_terms(text: str) -> str:
-    for pattern, replacement in REGEX_CANONICAL_RULES:
-        text = re.sub(pattern, replacement, text, flags=re.IGNORECASE)
-    unified = {**GLOSSARY_CANONICAL_MAP, **TERM_CANONICAL_MAP}
-    # Replace longer aliases first to avoid partial overlaps.
-    for src in sorted(unified.keys(), key=len, reverse=True):
-        dst = unified[src]
-        text = re.sub(rf"(?<!\w){re.escape(src)}(?!\w)", dst, text, flags=re.IGNORECASE)
-    return text
+    return get_canonicalizer()(text)
 
 
 def sanitize_title_for_filename(title: str) -> str:
@@ -284,20 +719,17 @@ def sanitize_title_for_filename(title: str) -> str:
 
 
 def count_non_empty_lines(text: str) -> int:
-    return len([line for line in text.splitlines() if line.strip() != ""])
+    return parse_chapter(text).non_empty_count
 
 
 def _is_double_spaced(text: str) -> bool:
-    lines = text.splitlines()
-    if not lines:
-        return False
-    empty = sum(1 for line in lines if line.strip() == "")
-    return empty >= len(lines) * 0.4
+    return parse_chapter(text).double_spaced
 
 
 def normalize_spacing(src_text: str, translated: str) -> str:
+    doc = parse_chapter(translated)
     if _is_double_spaced(src_text):
-        compact = [line.rstrip() for line in translated.splitlines() if line.strip() != ""]
+        compact = [doc.lines[idx].rstrip() for idx in doc.paragraphs]
         out = []
         for line in compact:
             if line.strip() == "* * *":
@@ -311,16 +743,13 @@ def normalize_spacing(src_text: str, translated: str) -> str:
             out.pop()
         return "\n".join(out).strip()
 
-    lines = [line.rstrip() for line in translated.splitlines()]
     out = []
     prev_empty = False
-    for line in lines:
-        is_empty = line.strip() == ""
-        if is_empty:
+    for line in doc.lines:
+        line = line.rstrip()
+        if line.strip() == "":
             if prev_empty:
                 continue
-            if _is_double_spaced(src_text):
-                continue
             out.append("")
             prev_empty = True
             continue
@@ -330,8 +759,10 @@ def normalize_spacing(src_text: str, translated: str) -> str:
 
 
 def clean_headers(translated: str, num: int, title: str) -> str:
-    lines = [line for line in translated.splitlines() if not line.lstrip().startswith("[TITLE]")]
-    lines = [line for line in lines if not line.lstrip().startswith("[NUM]")]
+    lines = [
+        line for line in parse_chapter(translated).lines
+        if not line.lstrip().startswith(("[TITLE]", "[NUM]"))
+    ]
     non_empty = [i for i, line in enumerate(lines) if line.strip() != ""]
     if non_empty:
         first_idx = non_empty[0]
@@ -380,64 +811,176 @@ def postprocess_translation(text: str, src_text: str, num: int, title: str) -> s
     return text
 
 
-def detect_gender_mismatches(text: str) -> List[str]:
-    issues: List[str] = []
-    lines = text.splitlines()
-    max_issues = 8
-
-    feminine_group = "|".join(re.escape(marker) for marker in sorted(FEMININE_MARKERS))
-    masculine_group = "|".join(re.escape(marker) for marker in sorted(MASCULINE_MARKERS))
+WORD_RE = re.compile(r"\w+")
+STOP_RE = re.compile(r"[\n.?!]")
+
+
+class GenderMismatchDetector:
+    # Up to this many names a plain substring check per name is cheaper than
+    # splitting every line into words.
+    SUBSTRING_SCAN_LIMIT = 40
+
+    def __init__(self, genders: dict, feminine=FEMININE_MARKERS, masculine=MASCULINE_MARKERS):
+        feminine_group = "|".join(re.escape(marker) for marker in sorted(feminine))
+        masculine_group = "|".join(re.escape(marker) for marker in sorted(masculine))
+        feminine_re = re.compile(rf"\b(?:{feminine_group})\b", re.IGNORECASE)
+        masculine_re = re.compile(rf"\b(?:{masculine_group})\b", re.IGNORECASE)
+        self.feminine_re = feminine_re
+        self.masculine_re = masculine_re
+        self.feminine_words = {_fold(marker) for marker in feminine}
+        self.masculine_words = {_fold(marker) for marker in masculine}
+        self.entries = []
+        self.by_first_word = {}
+        for order, (name, gender) in enumerate(genders.items()):
+            opposite = feminine_re if gender == "M" else masculine_re
+            name_re = re.compile(rf"\b{re.escape(name)}\b", re.IGNORECASE)
+            entry = (order, name, name_re, opposite)
+            self.entries.append(entry)
+            lead = WORD_RE.match(_fold(name))
+            first = lead.group(0) if lead else _fold(name)
+            self.by_first_word.setdefault(first, []).append(entry)
+
+    @staticmethod
+    def _mismatch(line: str, name_re, opposite) -> bool:
+        for found in name_re.finditer(line):
+            end = found.end()
+            stop = STOP_RE.search(line, end)
+            marker = opposite.search(line, end, stop.start() if stop else len(line))
+            if marker and marker.start() - end <= 80:
+                return True
+        return False
 
-    for idx, line in enumerate(lines, start=1):
-        stripped = line.strip()
-        if not stripped:
-            continue
-        for name, gender in CHARACTER_GENDER.items():
-            if name not in stripped:
+    def _candidates(self, line: str, present, folded):
+        if present is not None:
+            return [entry for entry in present if entry[1] in line]
+        words = set(WORD_RE.findall(_fold(line) if folded is None else folded))
+        # A mismatch needs a marker of the opposite gender somewhere in the line.
+        opposite = set()
+        if not words.isdisjoint(self.feminine_words):
+            opposite.add(self.feminine_re)
+        if not words.isdisjoint(self.masculine_words):
+            opposite.add(self.masculine_re)
+        if not opposite:
+            return []
+        found = []
+        for word in words.intersection(self.by_first_word):
+            found.extend(
+                entry for entry in self.by_first_word[word] if entry[3] in opposite and entry[1] in line
+            )
+        found.sort()
+        return found
+
+    def line_mismatch(self, line: str, present=None, folded=None):
+        for _, name, name_re, opposite in self._candidates(line, present, folded):
+            if self._mismatch(line, name_re, opposite):
+                return name
+        return None
+
+    def __call__(self, text: str, max_issues: int = 8) -> List[str]:
+        issues: List[str] = []
+        lines = parse_chapter(text).lines
+        present = None
+        folded_lines = [None] * len(lines)
+        if len(self.entries) <= self.SUBSTRING_SCAN_LIMIT:
+            present = [entry for entry in self.entries if entry[1] in text]
+            if not present:
+                return issues
+        else:
+            folded = _fold(text).splitlines()
+            if len(folded) == len(lines):
+                folded_lines = folded
+        for idx, (line, folded) in enumerate(zip(lines, folded_lines), start=1):
+            stripped = line.strip()
+            if not stripped:
                 continue
-            if gender == "M":
-                pattern = rf"\b{re.escape(name)}\b[^\n.?!]{{0,80}}\b(?:{feminine_group})\b"
-            else:
-                pattern = rf"\b{re.escape(name)}\b[^\n.?!]{{0,80}}\b(?:{masculine_group})\b"
-            if re.search(pattern, stripped, flags=re.IGNORECASE):
+            name = self.line_mismatch(stripped, present, folded)
+            if name is not None:
                 excerpt = stripped if len(stripped) <= 140 else stripped[:137] + "..."
-                issues.append(f"Podejrzenie blednej plci dla {name} (linia {idx}: {excerpt})")
+                issues.append(Issue(f"Podejrzenie blednej plci dla {name} (linia {idx}: {excerpt})", (idx,)))
+            if len(issues) >= max_issues:
                 break
-        if len(issues) >= max_issues:
-            break
-    return issues
+        return issues
+
+
+_GENDER_DETECTOR = None
+_GENDER_DETECTOR_KEY = None
+
+
+def get_gender_detector() -> GenderMismatchDetector:
+    global _GENDER_DETECTOR, _GENDER_DETECTOR_KEY
+    key = (tuple(CHARACTER_GENDER.items()), frozenset(FEMININE_MARKERS), frozenset(MASCULINE_MARKERS))
+    if _GENDER_DETECTOR is None or key != _GENDER_DETECTOR_KEY:
+        _GENDER_DETECTOR = GenderMismatchDetector(CHARACTER_GENDER, FEMININE_MARKERS, MASCULINE_MARKERS)
+        _GENDER_DETECTOR_KEY = key
+    return _GENDER_DETECTOR
+
+
+def detect_gender_mismatches(text: str) -> List[str]:
+    return get_gender_detector()(text)
+
+
+def unmatched_quote_lines(doc, src) -> List[int]:
+    # Unbalanced quote lines whose aligned source paragraphs are balanced:
+    # Korean dialogue often spans several lines and the translation keeps
+    # that, so only an imbalance the source does not have is an error.
+    lines = doc.unbalanced_quote_lines
+    if not lines or not src.paragraphs:
+        return []
+    ordinal = {idx + 1: k for k, idx in enumerate(doc.paragraphs)}
+    src_ordinal = {idx + 1: k for k, idx in enumerate(src.paragraphs)}
+    src_unbalanced = {src_ordinal[line_no] for line_no in src.unbalanced_quote_lines if line_no in src_ordinal}
+    found = []
+    for line_no in lines:
+        lo, hi = aligned_source_window(ordinal[line_no], len(doc.paragraphs), len(src.paragraphs))
+        if not src_unbalanced.intersection(range(lo, hi)):
+            found.append(line_no)
+    return found
 
 
 def validate_translation(text: str, src_text: str, num: int) -> List[str]:
     issues: List[str] = []
-    lines = text.splitlines()
-    if not lines:
+    doc = parse_chapter(text)
+    if not doc.lines:
         issues.append("Pusty wynik tlumaczenia.")
         return issues
 
-    first_non_empty = next((line.strip() for line in lines if line.strip() != ""), "")
-    if not re.match(rf"^\[{num}\]\s+.+$", first_non_empty):
+    header = doc.header
+    if not re.match(rf"^\[{num}\]\s+.+$", header[1] if header else ""):
         issues.append(f"Brak poprawnego naglowka [{num}] POLSKI_TYTUL.")
 
-    if re.search(r"(?m)^\[TITLE\]", text):
+    markers = doc.markers
+    if "TITLE" in markers:
         issues.append("Wynik zawiera linie [TITLE].")
-    if re.search(r"(?m)^\[NUM\]", text):
+    if "NUM" in markers:
         issues.append("Wynik zawiera linie [NUM].")
-    if re.search(r"[가-힣]", text):
-        issues.append("Wynik zawiera znaki Hangul.")
-
-    src_lines = count_non_empty_lines(src_text)
-    out_lines = count_non_empty_lines(text)
-    if src_lines > 0:
-        ratio = out_lines / src_lines
-        if ratio < 0.55:
-            issues.append(f"Za malo tresci po tlumaczeniu (ratio linii {ratio:.2f}).")
-        if ratio > 1.70:
-            issues.append(f"Za duzo tresci po tlumaczeniu (ratio linii {ratio:.2f}).")
-
-    if re.search(r"\n{3,}", text):
+    hangul_lines = doc.hangul_lines
+    if hangul_lines:
+        issues.append(Issue("Wynik zawiera znaki Hangul.", hangul_lines))
+
+    # Bounds come from translation_thresholds.json (validation_thresholds.py
+    # calibrate) when present, else the fixed line-ratio range. Lines are
+    # critical; the character ratio only warns (and so gets a repair).
+    measures = measure_chapter(text, src_text)
+    if measures["src_lines"] > 0:
+        for name, direction in threshold_violations(measures):
+            value = measures[name]
+            if name != "line_ratio":
+                side = "za krotki" if direction < 0 else "za dlugi"
+                issues.append(f"Podejrzana dlugosc tekstu ({side}, ratio znakow {value:.2f}).")
+            elif direction < 0:
+                issues.append(f"Za malo tresci po tlumaczeniu (ratio linii {value:.2f}).")
+            else:
+                issues.append(f"Za duzo tresci po tlumaczeniu (ratio linii {value:.2f}).")
+
+    if "blank_run" in markers:
         issues.append("Wykryto nadmiarowe puste linie.")
 
+    quote_lines = unmatched_quote_lines(doc, parse_chapter(src_text))
+    if quote_lines:
+        shown = ", ".join(str(idx) for idx in quote_lines[:10])
+        more = "..." if len(quote_lines) > 10 else ""
+        issues.append(Issue(f"Niepoprawne cudzyslowy (linie {shown}{more}).", quote_lines))
+
     issues.extend(detect_gender_mismatches(text))
 
     return issues
@@ -459,8 +1002,41 @@ def split_issues(issues: List[str]) -> tuple[list, list]:
     return critical, non_critical
 
 
+# Warnings reported but never repaired on their own: a repair call rarely
+# changes how the model places quotes.
+REPORT_ONLY_ISSUES = ("Niepoprawne cudzyslowy",)
+
+
+def needs_repair(issues: List[str]) -> bool:
+    return any(not issue.startswith(REPORT_ONLY_ISSUES) for issue in issues)
+
+
+ISSUE_CATEGORIES = (
+    ("Pusty wynik", "empty"),
+    ("Brak poprawnego naglowka", "header"),
+    ("Wynik zawiera linie [TITLE]", "title_line"),
+    ("Wynik zawiera linie [NUM]", "num_line"),
+    ("Wynik zawiera znaki Hangul", "hangul"),
+    ("Za malo tresci po tlumaczeniu", "too_short"),
+    ("Za duzo tresci po tlumaczeniu", "too_long"),
+    ("Podejrzana dlugosc tekstu", "length"),
+    ("Wykryto nadmiarowe puste linie", "blank_lines"),
+    ("Niepoprawne cudzyslowy", "quotes"),
+    ("Podejrzenie blednej plci", "gender"),
+)
+
+
+def issue_categories(issues: List[str]) -> List[str]:
+    found = []
+    for issue in issues:
+        category = next((key for prefix, key in ISSUE_CATEGORIES if issue.startswith(prefix)), "other")
+        if category not in found:
+            found.append(category)
+    return found
+
+
 def parse_title(text: str, num: int, fallback: str) -> str:
-    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    lines = parse_chapter(text).non_empty
     for line in lines[:6]:
         m = re.match(r"^\[(\d+)\]\s*(.+)$", line)
         if m and int(m.group(1)) == num:
@@ -477,38 +1053,65 @@ def save_translation(num: int, title: str, text: str) -> str:
     safe_title = sanitize_title_for_filename(title)
     filename = f"Chapter - {num} - {safe_title}.txt"
     (OUT_DIR / filename).write_text(text, encoding='utf-8')
+    refresh_fragment('pl', OUT_DIR / filename)
+    refresh_bundle('pl', OUT_DIR)
     return filename
 
 
 def update_progress(num: int, file_name: str, title: str):
-    data = []
-    if PROGRESS.exists():
-        try:
-            data = json.loads(PROGRESS.read_text(encoding='utf-8'))
-        except Exception:
-            data = []
-    data = [d for d in data if d.get('num') != num]
-    data.append({"num": num, "file": file_name, "title": title})
-    data.sort(key=lambda x: x['num'])
-    PROGRESS.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding='utf-8')
+    PROGRESS_JOURNAL.append({"num": num, "file": file_name, "title": title})
 
 
 def load_progress_data() -> List[dict]:
-    if not PROGRESS.exists():
-        return []
-    try:
-        data = json.loads(PROGRESS.read_text(encoding='utf-8'))
-        if isinstance(data, list):
-            return data
-    except Exception:
-        pass
-    return []
+    return [dict(entry) for entry in PROGRESS_JOURNAL.entries()]
+
+
+def ruleset_version(glossary_text: str) -> str:
+    # Everything that decides what postprocess_translation() and
+    # validate_translation() do; bump REPAIR_RULESET when their code changes.
+    rules = {
+        "ruleset": REPAIR_RULESET,
+        "glossary": glossary_text,
+        "hangul": HANGUL_MAP,
+        "terms": TERM_CANONICAL_MAP,
+        "regex": REGEX_CANONICAL_RULES,
+        "genders": CHARACTER_GENDER,
+        "feminine": sorted(FEMININE_MARKERS),
+        "masculine": sorted(MASCULINE_MARKERS),
+        # validate_translation() reads its ratio bounds from this file.
+        "thresholds": load_thresholds(),
+    }
+    return content_hash(json.dumps(rules, ensure_ascii=False, sort_keys=True))[:16]
 
 
-def repair_existing_range(start: int, end: int):
+def _init_repair_worker(canonical_map: dict) -> None:
+    global GLOSSARY_CANONICAL_MAP
+    GLOSSARY_CANONICAL_MAP = canonical_map
+
+
+def repair_chapter_text(num: int, text: str, src_text: str, fallback_title: str):
+    title = parse_title(text, num, fallback_title)
+    repaired = postprocess_translation(text, src_text, num, title)
+    critical, non_critical = split_issues(validate_translation(repaired, src_text, num))
+    return title, repaired, [str(issue) for issue in critical], [str(issue) for issue in non_critical]
+
+
+def diff_stats(old: str, new: str) -> tuple:
+    added = removed = 0
+    for line in difflib.unified_diff(old.splitlines(), new.splitlines(), lineterm="", n=0):
+        if line.startswith("+") and not line.startswith("+++"):
+            added += 1
+        elif line.startswith("-") and not line.startswith("---"):
+            removed += 1
+    return added, removed
+
+
+def repair_existing_range(start: int, end: int, jobs: int = 1, dry_run: bool = False):
     global GLOSSARY_CANONICAL_MAP
     glossary_text = load_text(GLOSSARY) if GLOSSARY.exists() else ""
     GLOSSARY_CANONICAL_MAP = parse_glossary_canonical_map(glossary_text)
+    rules = ruleset_version(glossary_text)
+    manifest = RepairManifest(REPAIR_MANIFEST)
 
     data = load_progress_data()
     by_num = {
@@ -517,6 +1120,10 @@ def repair_existing_range(start: int, end: int):
         if isinstance(entry, dict) and isinstance(entry.get("num"), int)
     }
 
+    # --dry-run writes nothing, not even the chapter index or cleaned-source caches.
+    src_index = ChapterIndex(LANGUAGE_DIRS[SRC_LANG]) if dry_run else get_index(SRC_LANG)
+    todo = []
+    skipped = 0
     for num in range(start, end + 1):
         entry = by_num.get(num)
         if not entry:
@@ -533,109 +1140,546 @@ def repair_existing_range(start: int, end: int):
             print(f"Brak pliku tlumaczenia dla {num}: {file_name}")
             continue
 
-        src = find_src_file(num)
+        src = src_index.find(num)
         if not src:
             print(f"Brak pliku zrodlowego dla {num}")
             continue
-        src_text = load_text(src)
-
+        src_text = load_source(src, cache=not dry_run)
         text = load_text(path)
-        title = parse_title(text, num, str(entry.get("title") or f"Rozdzial {num}"))
-        repaired = postprocess_translation(text, src_text, num, title)
-        issues = validate_translation(repaired, src_text, num)
-        critical, non_critical = split_issues(issues)
-        if critical:
-            print(f"Pominieto {num}: krytyczne problemy po naprawie: {'; '.join(critical)}")
+        hashes = (content_hash(src_text), content_hash(text))
+        if manifest.is_current(num, hashes[0], hashes[1], rules):
+            skipped += 1
             continue
-        path.write_text(repaired, encoding='utf-8')
-        entry["title"] = title
-        if non_critical:
-            print(f"Naprawiono {num} z ostrzezeniami: {'; '.join(non_critical)}")
+        todo.append((num, entry, path, text, src_text, hashes[0]))
+
+    changed = written = failed = 0
+    added_total = removed_total = 0
+    args = [
+        (num, text, src_text, str(entry.get("title") or f"Rozdzial {num}"))
+        for num, entry, _, text, src_text, _ in todo
+    ]
+    # Postprocessing and validation are pure CPU work, so they run on a process
+    # pool; files, the manifest and the progress journal are only touched here.
+    if jobs > 1 and len(todo) > 1:
+        pool = ProcessPoolExecutor(max_workers=jobs, initializer=_init_repair_worker, initargs=(GLOSSARY_CANONICAL_MAP,))
+        results = pool.map(repair_chapter_text, *zip(*args), chunksize=4)
+    else:
+        pool = None
+        results = (repair_chapter_text(*item) for item in args)
+    try:
+        for (num, entry, path, text, src_text, src_hash), result in zip(todo, results):
+            title, repaired, critical, non_critical = result
+            if critical:
+                failed += 1
+                if not dry_run:
+                    manifest.forget(num)
+                print(f"Pominieto {num}: krytyczne problemy po naprawie: {'; '.join(critical)}")
+                continue
+            title_changed = entry.get("title") != title
+            if repaired != text or title_changed:
+                changed += 1
+                added, removed = diff_stats(text, repaired)
+                added_total += added
+                removed_total += removed
+            if dry_run:
+                if repaired != text or title_changed:
+                    note = f", tytul: {entry.get('title')!r} -> {title!r}" if title_changed else ""
+                    print(f"Zmiana {num}: +{added} -{removed} linii{note}")
+                continue
+            if repaired != text:
+                path.write_text(repaired, encoding='utf-8')
+                refresh_fragment('pl', path)
+                written += 1
+            if title_changed:
+                entry["title"] = title
+                update_progress(num, entry["file"], title)
+            manifest.record(num, src_hash, content_hash(repaired), rules)
+            if repaired == text and not title_changed:
+                continue
+            if non_critical:
+                print(f"Naprawiono {num} z ostrzezeniami: {'; '.join(non_critical)}")
+            else:
+                print(f"Naprawiono {num}")
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        if not dry_run:
+            manifest.save()
+            PROGRESS_JOURNAL.compact()
+            # Once per run: the bundle rescans the whole directory.
+            if written:
+                refresh_bundle('pl', OUT_DIR)
+
+    unchanged = len(todo) - changed - failed
+    if dry_run:
+        print(
+            f"Podsumowanie (--dry-run): {changed} do zmiany (+{added_total} -{removed_total} linii), "
+            f"{unchanged} bez zmian, {failed} z krytycznymi problemami, {skipped} pominietych (bez zmian od ostatniej naprawy)"
+        )
+    else:
+        print(
+            f"Podsumowanie: {changed} naprawionych ({written} zapisanych plikow), {unchanged} bez zmian, "
+            f"{failed} z krytycznymi problemami, {skipped} pominietych (bez zmian od ostatniej naprawy)"
+        )
+
+
+def pop_option(args: List[str], name: str, default=None):
+    if name not in args:
+        return default
+    idx = args.index(name)
+    if idx + 1 >= len(args):
+        print(f"Brak wartosci dla opcji {name}.")
+        sys.exit(1)
+    value = args[idx + 1]
+    del args[idx:idx + 2]
+    return value
+
+
+def split_segments(src_text: str, max_chars: int) -> List[str]:
+    doc = parse_chapter(src_text)
+    lines = doc.lines
+    body_start = 0
+    if doc.header is not None and re.match(r"^\[\d+\]", doc.header[1]):
+        body_start = doc.header[0] + 1
+
+    # Scenes (split at * * *) are packed whole where possible; a scene that
+    # is too long on its own is cut at paragraph boundaries.
+    scenes: List[List[str]] = [[]]
+    for line in lines[body_start:]:
+        if SEPARATOR_RE.match(line) and any(item.strip() for item in scenes[-1]):
+            scenes.append([])
+        scenes[-1].append(line)
+
+    pieces: List[str] = []
+    for scene in scenes:
+        text = "\n".join(scene).strip("\n")
+        if not text.strip():
+            continue
+        if len(text) <= max_chars:
+            pieces.append(text)
+            continue
+        chunk: List[str] = []
+        size = 0
+        for line in scene:
+            if chunk and line.strip() and size + len(line) > max_chars:
+                pieces.append("\n".join(chunk).strip("\n"))
+                chunk, size = [], 0
+            chunk.append(line)
+            size += len(line) + 1
+        if "\n".join(chunk).strip():
+            pieces.append("\n".join(chunk).strip("\n"))
+
+    segments: List[str] = []
+    for piece in pieces:
+        if segments and len(segments[-1]) + len(piece) + 2 <= max_chars:
+            segments[-1] = f"{segments[-1]}\n\n{piece}"
         else:
-            print(f"Naprawiono {num}")
+            segments.append(piece)
+    return segments
+
+
+def segment_output_ok(output: str, segment: str) -> bool:
+    stripped = output.strip()
+    if not stripped or stripped.startswith(("ERROR:", "Warning:")):
+        return False
+    src_lines = count_non_empty_lines(segment)
+    if src_lines == 0:
+        return True
+    out_lines = len([line for line in stripped.splitlines() if line.strip() and not line.lstrip().startswith("[")])
+    # Fragments vary too much for the per-chapter calibrated bounds.
+    low, high = DEFAULT_RATIO_BOUNDS["line_ratio"]
+    return low <= out_lines / src_lines <= high
+
+
+def translate_segment(num, src_title, segment, index, total, glossary, guidelines, genders) -> str:
+    prompt = build_segment_prompt(num, src_title, segment, index, total, glossary, guidelines, genders)
+    for attempt in range(1, SEGMENT_ATTEMPTS + 1):
+        # Retries skip the response cache, which may hold the rejected answer.
+        output = run_codex_checked(prompt, num, f"fragment {index}/{total}", refresh=attempt > 1, source=segment)
+        if segment_output_ok(output, segment):
+            return output.strip()
+        if attempt < SEGMENT_ATTEMPTS:
+            print(f"Uwaga {num}: fragment {index}/{total} odrzucony; ponawiam ({attempt}/{SEGMENT_ATTEMPTS - 1}).")
+    return ""
+
+
+def translate_segmented(num, src_title, src_text, glossary, guidelines, genders) -> str:
+    segments = split_segments(src_text, SEGMENT_MAX_CHARS)
+    total = len(segments)
+    print(f"Rozdzial {num}: tlumaczenie w {total} fragmentach.")
+    with ThreadPoolExecutor(max_workers=min(SEGMENT_JOBS, total) or 1) as pool:
+        futures = [
+            pool.submit(translate_segment, num, src_title, segment, idx, total, glossary, guidelines, genders)
+            for idx, segment in enumerate(segments, start=1)
+        ]
+        outputs = [future.result() for future in futures]
+    failed = [str(idx) for idx, output in enumerate(outputs, start=1) if not output]
+    if failed:
+        print(f"Blad {num}: nie udalo sie przetlumaczyc fragmentow {', '.join(failed)}/{total}.")
+        return ""
+    # normalize_spacing() and clean_headers() fix up the seams afterwards.
+    return "\n\n".join(outputs)
+
+
+def translate_chapter(num: int, glossary: str, guidelines: str):
+    METRICS.start(num)
+    SCHEDULER.failed_nums.discard(num)
+    src = find_src_file(num)
+    if not src:
+        print(f"Brak pliku zrodlowego dla {num}")
+        return None
+    src_title = re.sub(r"^Chapter - \d+ - ", "", src.stem)
+    src_text = load_source(src)
+    genders = None
+    context = build_prompt_context(num, src_text, glossary)
+    if context is not None:
+        glossary, genders = context
+    if SEGMENT_MAX_CHARS and len(src_text) > SEGMENT_MAX_CHARS:
+        translated = translate_segmented(num, src_title, src_text, glossary, guidelines, genders)
+    else:
+        prompt = build_prompt(num, src_title, src_text, glossary, guidelines, genders)
+        translated = run_codex_checked(prompt, num, "tlumaczenie", source=src_text)
+    if not translated:
+        print(f"Brak wyniku dla {num}; pomijam rozdzial.")
+        return None
+    if translated.strip().startswith("ERROR:"):
+        print(f"Blad {num} (tlumaczenie): {translated.strip()}")
+        return None
+    if translated.strip().startswith("Warning:"):
+        print(f"Blad {num} (tlumaczenie): nieprawidlowy output z Codex.")
+        return None
+    fallback_title = f"Rozdzial {num}"
+    title = parse_title(translated, num, fallback_title)
+    with METRICS.timer(num, "postprocess"):
+        translated = postprocess_translation(translated, src_text, num, title)
+
+    with METRICS.timer(num, "validate"):
+        issues = validate_translation(translated, src_text, num)
+    title, translated, issues = repair_translation(
+        num, title, translated, issues, src_title, src_text, glossary, guidelines, genders
+    )
+    return finish_translation(num, title, translated, issues)
+
+
+def repair_translation(num, title, translated, issues, src_title, src_text, glossary, guidelines, genders):
+    # The validate/repair loop: paragraph repair when the issues are
+    # line-local, else a full repair. Returns (title, text, remaining issues).
+    repair_attempt = 0
+    while needs_repair(issues) and repair_attempt < MAX_REPAIR_ATTEMPTS:
+        repair_attempt += 1
+        print(
+            f"Uwaga {num}: wykryto problemy jakosci ({'; '.join(issues)}). "
+            f"Proba automatycznej poprawy {repair_attempt}/{MAX_REPAIR_ATTEMPTS}."
+        )
+        spliced = repair_paragraphs(num, translated, src_text, issues, glossary, guidelines, genders)
+        METRICS.repair(
+            num, repair_attempt, "paragraph" if spliced is not None else "full", issue_categories(issues),
+            measure_chapter(translated, src_text),
+        )
+        if spliced is not None:
+            translated = spliced
+            with METRICS.timer(num, "validate"):
+                issues = validate_translation(translated, src_text, num)
+            continue
+        repair_prompt = build_repair_prompt(
+            num=num,
+            src_title=src_title,
+            src_text=src_text,
+            current_translation=translated,
+            glossary=glossary,
+            guidelines=guidelines,
+            issues=issues,
+            genders=genders,
+        )
+        repaired = run_codex_checked(repair_prompt, num, "naprawa", source=src_text)
+        if not repaired:
+            break
+        title = parse_title(repaired, num, title)
+        with METRICS.timer(num, "postprocess"):
+            translated = postprocess_translation(repaired, src_text, num, title)
+        with METRICS.timer(num, "validate"):
+            issues = validate_translation(translated, src_text, num)
+    return title, translated, issues
+
+
+def finish_translation(num: int, title: str, translated: str, issues: List[str]):
+    critical, non_critical = split_issues(issues)
+    METRICS.update(num, issues=issue_categories(issues))
+    if critical:
+        print(f"Blad {num}: krytyczne problemy po naprawie: {'; '.join(critical)}. Rozdzial nie zostal zapisany.")
+        return None
+    if non_critical:
+        print(f"Uwaga {num}: pozostale ostrzezenia po naprawie: {'; '.join(non_critical)}")
+    return title, translated
+
+
+def plan_batches(nums: List[int]):
+    # Yields lists of consecutive chapter numbers: short chapters packed up to
+    # BATCH_MAX_CHARS of source, anything longer on its own.
+    batch: List[int] = []
+    size = 0
+    for num in nums:
+        src = find_src_file(num)
+        length = len(load_source(src)) if src else None
+        if length is None or length > BATCH_MAX_CHARS:
+            if batch:
+                yield batch
+                batch, size = [], 0
+            yield [num]
+            continue
+        if batch and (
+            size + length > BATCH_MAX_CHARS or len(batch) >= BATCH_MAX_CHAPTERS or num != batch[-1] + 1
+        ):
+            yield batch
+            batch, size = [], 0
+        batch.append(num)
+        size += length
+    if batch:
+        yield batch
+
+
+def split_batch_output(output: str, nums: List[int]):
+    # Returns {num: text} when every chapter is present exactly once, else None.
+    parts = BATCH_MARKER_RE.split(output)
+    found = {}
+    for idx in range(1, len(parts) - 1, 2):
+        num = int(parts[idx])
+        if num in found:
+            return None
+        found[num] = parts[idx + 1].strip()
+    if sorted(found) != sorted(nums) or not all(found.values()):
+        return None
+    return found
+
+
+def translate_batch(nums: List[int], glossary: str, guidelines: str) -> List[tuple]:
+    sources = []
+    for num in nums:
+        METRICS.start(num)
+        src = find_src_file(num)
+        sources.append((num, re.sub(r"^Chapter - \d+ - ", "", src.stem), load_source(src)))
+    genders = None
+    context = None
+    if PROMPT_SUBSET:
+        references = [get_index(REFERENCE_LANG).find(num) for num in nums]
+        if all(references):
+            texts = [src_text for _, _, src_text in sources] + [load_text(ref) for ref in references]
+            context = get_term_index(glossary).select(*texts)
+    batch_glossary = glossary
+    if context is not None:
+        batch_glossary, genders = context
+    prompt = build_batch_prompt(sources, batch_glossary, guidelines, genders)
+    label = f"partia {nums[0]}-{nums[-1]}"
+    output = run_codex_checked(prompt, nums[0], label, source="\n".join(src_text for _, _, src_text in sources))
+    if not output:
+        print(f"Brak wyniku dla {label}; pomijam rozdzialy.")
+        if nums[0] in SCHEDULER.failed_nums:
+            SCHEDULER.failed_nums.update(nums)
+        return [(num, None) for num in nums]
+    parts = split_batch_output(output, nums)
+    if parts is None:
+        print(f"Uwaga {label}: nie udalo sie rozdzielic odpowiedzi; tlumacze rozdzialy osobno.")
+        return [(num, translate_chapter(num, glossary, guidelines)) for num in nums]
+
+    results = []
+    for num, src_title, src_text in sources:
+        translated = parts[num]
+        title = parse_title(translated, num, f"Rozdzial {num}")
+        with METRICS.timer(num, "postprocess"):
+            translated = postprocess_translation(translated, src_text, num, title)
+        with METRICS.timer(num, "validate"):
+            issues = validate_translation(translated, src_text, num)
+        critical, _ = split_issues(issues)
+        if critical:
+            # A broken part is translated again as a chapter of its own
+            # rather than by re-sending the whole batch.
+            METRICS.repair(num, 0, "batch_fallback", issue_categories(issues))
+            print(f"Uwaga {num}: problemy w wyniku partii ({'; '.join(critical)}); tlumacze osobno.")
+            results.append((num, translate_chapter(num, glossary, guidelines)))
+            continue
+        # Warnings go through the same repair loop as a single chapter.
+        METRICS.update(num, batch=label)
+        title, translated, issues = repair_translation(
+            num, title, translated, issues, src_title, src_text, batch_glossary, guidelines, genders
+        )
+        results.append((num, finish_translation(num, title, translated, issues)))
+    return results
+
+
+def translate_unit(unit: List[int], glossary: str, guidelines: str) -> List[tuple]:
+    if len(unit) == 1:
+        return [(unit[0], translate_chapter(unit[0], glossary, guidelines))]
+    return translate_batch(unit, glossary, guidelines)
+
+
+def commit_translation(num: int, result):
+    if result is None:
+        METRICS.finish(num, "failed")
+        return
+    title, translated = result
+    with METRICS.timer(num, "write"):
+        file_name = save_translation(num, title, translated)
+        update_progress(num, file_name, title)
+    METRICS.finish(num, "ok")
+    print(f"OK {num}")
+
+
+def translate_range(nums: List[int], glossary: str, guidelines: str, jobs: int):
+    try:
+        skipped = _translate_range(nums, glossary, guidelines, jobs)
+        # Chapters lost to backend errors get another chance once the rest
+        # of the range is done, when a transient outage has likely passed.
+        for round_no in range(1, SKIPPED_RETRY_ROUNDS + 1):
+            if not skipped or SCHEDULER.exhausted:
+                break
+            print(
+                f"Ponawiam rozdzialy pominiete przez bledy backendu "
+                f"({round_no}/{SKIPPED_RETRY_ROUNDS}): {', '.join(map(str, skipped))}"
+            )
+            skipped = _translate_range(skipped, glossary, guidelines, jobs)
+        if skipped:
+            print(f"Pominiete przez bledy backendu: {', '.join(map(str, skipped))}")
+        if SCHEDULER.exhausted:
+            print(f"Budzet tokenow wyczerpany ({SCHEDULER.tokens_used}/{SCHEDULER.token_budget}); przerwano.")
+    finally:
+        PROGRESS_JOURNAL.compact()
+
+
+def _commit_or_skip(num: int, result, skipped: List[int]) -> None:
+    commit_translation(num, result)
+    if result is None and num in SCHEDULER.failed_nums:
+        skipped.append(num)
+
 
-    PROGRESS.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding='utf-8')
+def _translate_range(nums: List[int], glossary: str, guidelines: str, jobs: int) -> List[int]:
+    # Returns the chapters that failed because of backend errors.
+    skipped: List[int] = []
+    units = plan_batches(nums) if BATCH_MAX_CHARS else ([num] for num in nums)
+    if jobs <= 1:
+        for unit in units:
+            if SCHEDULER.exhausted:
+                break
+            for num, result in translate_unit(unit, glossary, guidelines):
+                _commit_or_skip(num, result, skipped)
+        return skipped
+
+    # Keep at most 2*jobs requests (chapters or batches) in flight and commit
+    # strictly in chapter order, so pl/ and the progress file only ever grow
+    # as a prefix.
+    window = jobs * 2
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        pending = deque()
+        for unit in units:
+            pending.append((unit, pool.submit(translate_unit, unit, glossary, guidelines)))
+            if len(pending) >= window:
+                break
+        while pending:
+            unit, future = pending.popleft()
+            try:
+                results = future.result()
+            except Exception as exc:
+                print(f"Blad {', '.join(map(str, unit))}: {exc}")
+                results = [(num, None) for num in unit]
+            for num, result in results:
+                _commit_or_skip(num, result, skipped)
+            next_unit = None if SCHEDULER.exhausted else next(units, None)
+            if next_unit is not None:
+                pending.append((next_unit, pool.submit(translate_unit, next_unit, glossary, guidelines)))
+    return skipped
+
+
+def refresh_search_index() -> None:
+    # Only when the index was built (tools/search_index.py build pl).
+    stats = refresh_index('pl')
+    if stats and (stats["indexed"] or stats["removed"]):
+        print(f"Indeks wyszukiwania pl: zaktualizowano {stats['indexed']}, usunieto {stats['removed']}")
 
 
 def main():
-    if len(sys.argv) == 4 and sys.argv[1] == "--repair-existing":
-        start = int(sys.argv[2])
-        end = int(sys.argv[3])
+    args = sys.argv[1:]
+    jobs_option = pop_option(args, "--jobs")
+    jobs = int(jobs_option or "1")
+    start_from = pop_option(args, "--from")
+    global SEGMENT_MAX_CHARS
+    SEGMENT_MAX_CHARS = int(pop_option(args, "--segment", "0"))
+    global BATCH_MAX_CHARS
+    BATCH_MAX_CHARS = int(pop_option(args, "--batch", "0"))
+    backend_spec = pop_option(args, "--backend", os.environ.get('CODEX_BACKEND'))
+    SCHEDULER.rpm = int(pop_option(args, "--rpm", "0"))
+    SCHEDULER.tpm = int(pop_option(args, "--tpm", "0"))
+    SCHEDULER.token_budget = int(pop_option(args, "--token-budget", "0"))
+    SCHEDULER.retries = int(pop_option(args, "--retries", str(BACKEND_RETRIES)))
+    global STREAM_GUARD
+    if "--stream" in args:
+        args.remove("--stream")
+        STREAM_GUARD = True
+    global PROMPT_SUBSET
+    if "--full-glossary" in args:
+        args.remove("--full-glossary")
+        PROMPT_SUBSET = False
+    if "--no-cache" in args:
+        args.remove("--no-cache")
+        RESPONSE_CACHE.enabled = False
+    if "--refresh" in args:
+        args.remove("--refresh")
+        RESPONSE_CACHE.refresh = True
+    dry_run = "--dry-run" in args
+    if dry_run:
+        args.remove("--dry-run")
+    if jobs < 1:
+        print("Bledna liczba watkow: --jobs musi byc >= 1.")
+        sys.exit(1)
+
+    if len(args) == 3 and args[0] == "--repair-existing":
+        start = int(args[1])
+        end = int(args[2])
         if start > end:
             print("Bledny zakres: start musi byc <= end.")
             sys.exit(1)
-        repair_existing_range(start, end)
+        # Repair is local CPU work; default to one process per core.
+        repair_existing_range(start, end, int(jobs_option) if jobs_option else (os.cpu_count() or 1), dry_run)
+        if not dry_run:
+            refresh_search_index()
         return
 
-    if len(sys.argv) != 2:
+    try:
+        workers = jobs * (SEGMENT_JOBS if SEGMENT_MAX_CHARS else 1)
+        set_backend(create_backend(backend_spec, size=workers))
+    except ValueError as exc:
+        print(f"Bledny backend: {exc}")
+        sys.exit(1)
+
+    if len(args) != 1:
         print("Uzycie:")
-        print("  python3 tools/translate_with_codex.py <target_chapter>")
-        print("  python3 tools/translate_with_codex.py --repair-existing <start> <end>")
+        print(
+            "  python3 tools/translate_with_codex.py <target_chapter> [--from N] [--jobs N] "
+            "[--segment MAX_CHARS] [--batch MAX_CHARS] [--backend codex[:stream]|worker:CMD|stub[:opcje]] "
+            "[--full-glossary] [--no-cache | --refresh] [--stream] [--retries N] [--rpm N] [--tpm N] [--token-budget N]"
+        )
+        print("  python3 tools/translate_with_codex.py --repair-existing <start> <end> [--jobs N] [--dry-run]")
         sys.exit(1)
-    target = int(sys.argv[1])
+    target = int(args[0])
 
-    last = get_last_translated_num()
+    # --from re-runs already translated chapters; with the response cache
+    # this re-applies postprocessing without calling the backend again.
+    last = int(start_from) - 1 if start_from is not None else get_last_translated_num()
     glossary = load_text(GLOSSARY) if GLOSSARY.exists() else ""
     guidelines = load_text(GUIDELINES) if GUIDELINES.exists() else ""
     global GLOSSARY_CANONICAL_MAP
     GLOSSARY_CANONICAL_MAP = parse_glossary_canonical_map(glossary)
 
-    for num in range(last + 1, target + 1):
-        src = find_src_file(num)
-        if not src:
-            print(f"Brak pliku zrodlowego dla {num}")
-            continue
-        src_title = re.sub(r"^Chapter - \d+ - ", "", src.stem)
-        src_text = load_text(src)
-        prompt = build_prompt(num, src_title, src_text, glossary, guidelines)
-        translated = run_codex_checked(prompt, num, "tlumaczenie")
-        if not translated:
-            print(f"Brak wyniku dla {num}; pomijam rozdzial.")
-            continue
-        if translated.strip().startswith("ERROR:"):
-            print(f"Blad {num} (tlumaczenie): {translated.strip()}")
-            continue
-        if translated.strip().startswith("Warning:"):
-            print(f"Blad {num} (tlumaczenie): nieprawidlowy output z Codex.")
-            continue
-        fallback_title = f"Rozdzial {num}"
-        title = parse_title(translated, num, fallback_title)
-        translated = postprocess_translation(translated, src_text, num, title)
-
-        issues = validate_translation(translated, src_text, num)
-        repair_attempt = 0
-        while issues and repair_attempt < MAX_REPAIR_ATTEMPTS:
-            repair_attempt += 1
-            print(
-                f"Uwaga {num}: wykryto problemy jakosci ({'; '.join(issues)}). "
-                f"Proba automatycznej poprawy {repair_attempt}/{MAX_REPAIR_ATTEMPTS}."
-            )
-            repair_prompt = build_repair_prompt(
-                num=num,
-                src_title=src_title,
-                src_text=src_text,
-                current_translation=translated,
-                glossary=glossary,
-                guidelines=guidelines,
-                issues=issues,
-            )
-            repaired = run_codex_checked(repair_prompt, num, "naprawa")
-            if not repaired:
-                break
-            title = parse_title(repaired, num, title)
-            translated = postprocess_translation(repaired, src_text, num, title)
-            issues = validate_translation(translated, src_text, num)
-
-        critical, non_critical = split_issues(issues)
-        if critical:
-            print(f"Blad {num}: krytyczne problemy po naprawie: {'; '.join(critical)}. Rozdzial nie zostal zapisany.")
-            continue
-        if non_critical:
-            print(f"Uwaga {num}: pozostale ostrzezenia po naprawie: {'; '.join(non_critical)}")
-
-        file_name = save_translation(num, title, translated)
-        update_progress(num, file_name, title)
-        print(f"OK {num}")
+    try:
+        translate_range(list(range(last + 1, target + 1)), glossary, guidelines, jobs)
+    finally:
+        set_backend(None)
+        refresh_search_index()
+    if RESPONSE_CACHE.hits:
+        print(f"Cache odpowiedzi: {RESPONSE_CACHE.hits} trafien, {RESPONSE_CACHE.misses} chybien")
+    if SCHEDULER.retried or SCHEDULER.token_budget:
+        print(
+            f"Backend: {SCHEDULER.requests} zapytan, {SCHEDULER.retried} ponowien, "
+            f"{SCHEDULER.aborted} przerwanych w trakcie, ~{SCHEDULER.tokens_used} tokenow"
+        )
 
 
 if __name__ == '__main__':
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+import json
+import math
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    # Calibration works without NumPy, just slower on large corpora.
+    np = None
+
+from chapter_bundle import open_bundle
+from chapter_index import BASE
+from chapter_text import parse_chapter
+from progress_journal import write_json_atomic
+
+# Bounds validate_translation() checks, calibrated on accepted pl/ <-> source
+# pairs by "calibrate". Per band of source length (non-empty lines):
+#   {"version": 1, "bands": [{"max_src_lines": 140, "samples": 93,
+#     "line_ratio": [lo, hi], "char_ratio": [lo, hi], "paragraph_ratio": [lo, hi],
+#     "separator_delta": [lo, hi]}, ...,
+#    {"max_src_lines": null, ...}]}
+# Without the file the validator keeps its original fixed line-ratio bounds.
+# Calibrated line bounds never fall inside DEFAULT_BOUNDS, so they can only
+# relax the line check. The char_ratio bounds are new: they catch answers
+# with the right number of lines but summarised or padded text, and
+# validate_translation() reports them as a non-critical warning.
+THRESHOLDS_FILE = BASE / 'translation_thresholds.json'
+THRESHOLDS_VERSION = 1
+DEFAULT_BOUNDS = {"line_ratio": (0.55, 1.70)}
+# paragraph_ratio counts prose paragraphs (non-empty lines other than the
+# header and "* * *"); one paragraph per line, so it tracks line_ratio.
+METRICS = ("line_ratio", "char_ratio", "paragraph_ratio", "separator_delta")
+# Enforced by the validator. The rest are recorded for reference only;
+# separator_delta because a lost "* * *" is not worth a repair call.
+CHECKED = ("line_ratio", "char_ratio")
+LOW_Q = 0.005
+HIGH_Q = 0.995
+MARGIN = 0.10
+MIN_BAND_SAMPLES = 50
+
+_THRESHOLDS = None
+_THRESHOLDS_KEY = None
+
+
+def _chars(doc) -> int:
+    return sum(len(line) - line.count(" ") for line in doc.non_empty)
+
+
+def _prose_paragraphs(doc) -> int:
+    return max(0, doc.non_empty_count - len(doc.separators) - (1 if doc.header else 0))
+
+
+def measure(text: str, src_text: str) -> Dict[str, float]:
+    doc = parse_chapter(text)
+    src = parse_chapter(src_text)
+    src_lines = src.non_empty_count
+    src_chars = _chars(src)
+    src_paragraphs = _prose_paragraphs(src)
+    return {
+        "src_lines": src_lines,
+        "line_ratio": doc.non_empty_count / src_lines if src_lines else 0.0,
+        "char_ratio": _chars(doc) / src_chars if src_chars else 0.0,
+        "paragraph_ratio": _prose_paragraphs(doc) / src_paragraphs if src_paragraphs else 0.0,
+        "separator_delta": len(doc.separators) - len(src.separators),
+    }
+
+
+def load_thresholds(path: Path = THRESHOLDS_FILE) -> Optional[dict]:
+    global _THRESHOLDS, _THRESHOLDS_KEY
+    try:
+        key = (str(path), path.stat().st_mtime_ns)
+    except FileNotFoundError:
+        return None
+    if _THRESHOLDS_KEY != key:
+        try:
+            data = json.loads(path.read_text(encoding='utf-8'))
+        except ValueError:
+            data = None
+        _THRESHOLDS = data if isinstance(data, dict) and data.get("version") == THRESHOLDS_VERSION else None
+        _THRESHOLDS_KEY = key
+    return _THRESHOLDS
+
+
+def bounds_for(src_lines: int, thresholds: Optional[dict] = None,
+               names: Tuple[str, ...] = CHECKED) -> Dict[str, Tuple[float, float]]:
+    # Pass {} for the fixed DEFAULT_BOUNDS, names for reference-only metrics.
+    if thresholds is None:
+        thresholds = load_thresholds()
+    defaults = {name: DEFAULT_BOUNDS[name] for name in names if name in DEFAULT_BOUNDS}
+    if not thresholds:
+        return defaults
+    for band in thresholds["bands"]:
+        if band["max_src_lines"] is None or src_lines <= band["max_src_lines"]:
+            return {name: tuple(band[name]) for name in names if name in band}
+    return defaults
+
+
+def violations(measures: Dict[str, float], thresholds: Optional[dict] = None) -> List[Tuple[str, int]]:
+    # (metric, -1 below / +1 above) for every checked bound the chapter misses.
+    out = []
+    for name, (low, high) in bounds_for(int(measures["src_lines"]), thresholds).items():
+        value = measures[name]
+        if value < low:
+            out.append((name, -1))
+        elif value > high:
+            out.append((name, 1))
+    return out
+
+
+def _quantiles(values: List[float], qs: List[float]) -> List[float]:
+    # Linear interpolation, same as numpy.quantile's default.
+    if np is not None:
+        return [float(v) for v in np.quantile(np.asarray(values, dtype=float), qs)]
+    ordered = sorted(values)
+    out = []
+    for q in qs:
+        pos = (len(ordered) - 1) * q
+        low = math.floor(pos)
+        high = min(low + 1, len(ordered) - 1)
+        out.append(ordered[low] + (ordered[high] - ordered[low]) * (pos - low))
+    return out
+
+
+def collect(nums: Optional[List[int]] = None) -> Dict[str, list]:
+    import translate_with_codex as tw
+
+    index = tw.get_index('pl')
+    columns: Dict[str, list] = {"num": [], "src_lines": [], "out_lines": [], "src_chars": [], "out_chars": [],
+                                "src_paragraphs": [], "out_paragraphs": [], "src_separators": [], "out_separators": []}
+    # pl/ through the mmap bundle when it is current; sources go through the
+    # cleaned-source cache, which the bundle does not hold.
+    bundle = open_bundle('pl')
+    try:
+        for num in sorted(index.nums()) if nums is None else nums:
+            path = index.find(num)
+            src = tw.find_src_file(num)
+            if not path or not src:
+                continue
+            doc = parse_chapter(bundle.text(num, path.name) if bundle else tw.load_text(path))
+            src_doc = parse_chapter(tw.load_source(src))
+            if not src_doc.non_empty_count:
+                continue
+            columns["num"].append(num)
+            columns["src_lines"].append(src_doc.non_empty_count)
+            columns["out_lines"].append(doc.non_empty_count)
+            columns["src_chars"].append(_chars(src_doc))
+            columns["out_chars"].append(_chars(doc))
+            columns["src_paragraphs"].append(_prose_paragraphs(src_doc))
+            columns["out_paragraphs"].append(_prose_paragraphs(doc))
+            columns["src_separators"].append(len(src_doc.separators))
+            columns["out_separators"].append(len(doc.separators))
+    finally:
+        if bundle:
+            bundle.close()
+    return columns
+
+
+def derive_metrics(columns: Dict[str, list]) -> Dict[str, list]:
+    if np is not None:
+        arrays = {name: np.asarray(values, dtype=float) for name, values in columns.items()}
+        return {
+            "src_lines": columns["src_lines"],
+            "line_ratio": (arrays["out_lines"] / arrays["src_lines"]).tolist(),
+            "char_ratio": (arrays["out_chars"] / np.maximum(arrays["src_chars"], 1)).tolist(),
+            "paragraph_ratio": (arrays["out_paragraphs"] / np.maximum(arrays["src_paragraphs"], 1)).tolist(),
+            "separator_delta": (arrays["out_separators"] - arrays["src_separators"]).tolist(),
+        }
+    return {
+        "src_lines": columns["src_lines"],
+        "line_ratio": [o / s for o, s in zip(columns["out_lines"], columns["src_lines"])],
+        "char_ratio": [o / max(s, 1) for o, s in zip(columns["out_chars"], columns["src_chars"])],
+        "paragraph_ratio": [o / max(s, 1) for o, s in zip(columns["out_paragraphs"], columns["src_paragraphs"])],
+        "separator_delta": [o - s for o, s in zip(columns["out_separators"], columns["src_separators"])],
+    }
+
+
+def _band_quantiles(metrics: Dict[str, list], edges: List[int]) -> List[tuple]:
+    # (max_src_lines, samples, [(low, high) per metric]) for each non-empty
+    # band; band k holds chapters with edges[k-1] < src_lines <= edges[k].
+    if np is not None:
+        band_ids = np.searchsorted(np.asarray(edges), np.asarray(metrics["src_lines"]), side="left")
+        table = np.column_stack([np.asarray(metrics[name], dtype=float) for name in METRICS])
+        out = []
+        for k, edge in enumerate(edges + [None]):
+            rows = table[band_ids == k]
+            if len(rows):
+                low, high = np.quantile(rows, [LOW_Q, HIGH_Q], axis=0)
+                out.append((edge, len(rows), list(zip(low.tolist(), high.tolist()))))
+        return out
+    out = []
+    lower = -1
+    for edge in edges + [None]:
+        rows = [i for i, lines in enumerate(metrics["src_lines"]) if lines > lower and (edge is None or lines <= edge)]
+        lower = edge
+        if rows:
+            out.append((edge, len(rows), [
+                tuple(_quantiles([metrics[name][i] for i in rows], [LOW_Q, HIGH_Q])) for name in METRICS
+            ]))
+    return out
+
+
+def calibrate(metrics: Dict[str, list], bands: int = 3, margin: float = MARGIN) -> dict:
+    samples = len(metrics["src_lines"])
+    bands = max(1, min(bands, samples // MIN_BAND_SAMPLES))
+    edges = [int(edge) for edge in _quantiles(metrics["src_lines"], [i / bands for i in range(1, bands)])]
+    out = []
+    for edge, count, bounds in _band_quantiles(metrics, edges):
+        band = {"max_src_lines": edge, "samples": count}
+        for name, (low, high) in zip(METRICS, bounds):
+            if name == "separator_delta":
+                band[name] = [math.floor(low), math.ceil(high)]
+            else:
+                low, high = low * (1 - margin), high * (1 + margin)
+                if name in DEFAULT_BOUNDS:
+                    low = min(low, DEFAULT_BOUNDS[name][0])
+                    high = max(high, DEFAULT_BOUNDS[name][1])
+                band[name] = [round(low, 3), round(high, 3)]
+        out.append(band)
+    if out:
+        out[-1]["max_src_lines"] = None
+    return {
+        "version": THRESHOLDS_VERSION,
+        "calibrated": time.strftime("%Y-%m-%d"),
+        "samples": samples,
+        "quantiles": [LOW_Q, HIGH_Q],
+        "margin": margin,
+        "bands": out,
+    }
+
+
+def flagged(metrics: Dict[str, list], thresholds: dict) -> List[int]:
+    # {} checks against DEFAULT_BOUNDS.
+    rows = []
+    for i in range(len(metrics["src_lines"])):
+        measures = {name: metrics[name][i] for name in ("src_lines",) + METRICS}
+        if violations(measures, thresholds):
+            rows.append(i)
+    return rows
+
+
+def history_report(thresholds: dict) -> None:
+    # Past repairs triggered only by a ratio check, from the metrics log,
+    # replayed against the fixed bounds and the new ones.
+    import translate_with_codex as tw
+    from run_metrics import load_records
+
+    ratio_only = {"too_short", "too_long", "length"}
+    total = measured = avoided = added = 0
+    for record in load_records(tw.METRICS_FILE):
+        for repair in record.get("repairs", []):
+            categories = set(repair.get("categories", []))
+            if not categories or not categories <= ratio_only:
+                continue
+            total += 1
+            measures = repair.get("measures")
+            if not measures:
+                continue
+            measured += 1
+            before = bool(violations(measures, {}))
+            after = bool(violations(measures, thresholds))
+            avoided += before and not after
+            added += after and not before
+    if not total:
+        print("Dziennik metryk: brak napraw wywolanych wylacznie przez ratio.")
+        return
+    print(
+        f"Dziennik metryk: {total} napraw tylko z powodu ratio, {measured} z pomiarami; "
+        f"wzgledem stalych progow nowe uniknelyby {avoided}, dodalyby {added}."
+    )
+
+
+def main():
+    import translate_with_codex as tw
+
+    args = sys.argv[1:]
+    if not args or args[0] != "calibrate":
+        print("Uzycie:")
+        print("  python3 tools/validation_thresholds.py calibrate [--bands N] [--margin X] [--dry-run]")
+        sys.exit(1)
+    args = args[1:]
+    bands = int(tw.pop_option(args, "--bands", "3"))
+    margin = float(tw.pop_option(args, "--margin", str(MARGIN)))
+    dry_run = "--dry-run" in args
+    if dry_run:
+        args.remove("--dry-run")
+
+    began = time.perf_counter()
+    metrics = derive_metrics(collect())
+    if not metrics["src_lines"]:
+        print("Brak par pl/zrodlo do kalibracji.")
+        sys.exit(1)
+    thresholds = calibrate(metrics, bands, margin)
+    elapsed = time.perf_counter() - began
+    print(f"Pary: {thresholds['samples']} ({'NumPy' if np is not None else 'bez NumPy'}, {elapsed:.2f}s)")
+    for band in thresholds["bands"]:
+        limit = band["max_src_lines"]
+        label = f"<= {limit} linii" if limit is not None else "reszta"
+        bounds = "  ".join(f"{name} {band[name][0]}-{band[name][1]}" for name in METRICS)
+        print(f"  {label:<14} n={band['samples']:<4} {bounds}")
+
+    # Against the fixed bounds, not the file about to be replaced, so a
+    # recalibration still reports what calibrating saves at all.
+    before = set(flagged(metrics, {}))
+    after = set(flagged(metrics, thresholds))
+    print(
+        f"Zaakceptowane rozdzialy oznaczone: przy stalych progach {len(before)}, po kalibracji {len(after)}; "
+        f"uniknietych napraw {len(before - after)} (do {len(before - after) * tw.MAX_REPAIR_ATTEMPTS} wywolan), "
+        f"nowych {len(after - before)}"
+    )
+    history_report(thresholds)
+    if dry_run:
+        return
+    write_json_atomic(THRESHOLDS_FILE, thresholds)
+    print(f"Zapisano: {THRESHOLDS_FILE}")
+
+
+if __name__ == '__main__':
+    main()